@@ -3,40 +3,87 @@ import os,shutil
 import zipfile
 import xml.etree.ElementTree as ET
 import urllib.parse
-import chardet
 import datetime
+import mimetypes
 from tempfile import TemporaryDirectory
 
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QFileDialog, QSplitter, QTreeWidget,
     QTreeWidgetItem, QTabWidget, QTextEdit, QStatusBar, QMessageBox,
     QInputDialog, QVBoxLayout, QWidget, QGroupBox, QLineEdit,
-    QPushButton, QLabel, QFormLayout
+    QPushButton, QLabel, QFormLayout, QProgressBar, QHBoxLayout, QDialog
 )
-from PyQt6.QtCore import QUrl, Qt, QTimer, QSettings
-from PyQt6.QtGui import QAction, QTextCursor, QTextDocument
+from PyQt6.QtCore import (
+    QUrl, Qt, QTimer, QSettings, QBuffer, QIODevice,
+    QObject, QRunnable, QThreadPool, pyqtSignal
+)
+from PyQt6.QtGui import QAction, QTextCursor, QPixmap
 from PyQt6.QtWebEngineWidgets import QWebEngineView
+from PyQt6.QtWebEngineCore import (
+    QWebEngineUrlScheme, QWebEngineUrlSchemeHandler, QWebEngineUrlRequestJob
+)
+from converter.epubarchive import EpubArchive
 from converter.html2txt import Maindehtml2txt
 from converter.txt2html2 import MaindeTxt2Html
 from converter.HTML2EPUB.GenerateEpubFramework import MaindeGenerateEpubFramework
 from converter.HTML2EPUB.GenerateEPUB import MaindeGenerateEPUB
+from converter.jobs import Cancelled, update_search_index, scan_catalog
+from converter.search import SearchIndex, QUERY_PART, INDEX_NAME
+from converter.catalog import Catalog, CATALOG_NAME
+from converter.encoding import detect_encoding
+from editor.journal import EditJournal, read_journal
+from editor.largeview import LargeTextView
+from editor.findpanel import FindPanel
+from reader.prefetch import ChapterCache, Prefetcher, PREFETCH_AHEAD
+
+
 
 
 
+EPUB_SCHEME = b'epub'
+LARGE_FILE_THRESHOLD = 32 * 1024 * 1024    # 超过该大小的文本以大文件模式打开
+LIBRARY_DIR = os.path.join('primary fileSet', 'epub')
+
+
+def register_epub_scheme():
+    """注册 epub:// 协议，必须在创建 QApplication 之前调用"""
+    scheme = QWebEngineUrlScheme(EPUB_SCHEME)
+    scheme.setSyntax(QWebEngineUrlScheme.Syntax.Host)
+    scheme.setFlags(QWebEngineUrlScheme.Flag.SecureScheme |
+                    QWebEngineUrlScheme.Flag.LocalAccessAllowed)
+    QWebEngineUrlScheme.registerScheme(scheme)
 
 
 class EpubParser:
-    def __init__(self, epub_path):
+    _counter = 0
+
+    def __init__(self, epub_path, lazy=True):
         self.epub_path = epub_path
-        self.temp_dir = TemporaryDirectory()
+        self.lazy = lazy
+        self.temp_dir = None
+        self.archive = None
+        self.prefetcher = None
         self.opf_path = None
         self.spine_items = []
         self.manifest = {}
         self.title = "Untitled"
-        
-        self.extract_epub()
-        self.parse_container()
-        self.parse_opf()
+
+        if lazy:
+            # 懒加载模式：只读取 zip 中央目录、container.xml 和 OPF，
+            # 章节及资源在 load_content 请求时才解压
+            EpubParser._counter += 1
+            self.host = f'book{EpubParser._counter}'
+            self.archive = EpubArchive(epub_path)
+            self.opf_path = self.archive.opf_path
+            self.title = self.archive.title
+            self.manifest = self.archive.manifest
+            self.spine_items = self.archive.spine_paths()
+            self.prefetcher = Prefetcher(self.archive, ChapterCache())
+        else:
+            self.temp_dir = TemporaryDirectory()
+            self.extract_epub()
+            self.parse_container()
+            self.parse_opf()
 
     def extract_epub(self):
         with zipfile.ZipFile(self.epub_path, 'r') as zf:
@@ -83,6 +130,181 @@ class EpubParser:
                 if item['type'] in ['application/xhtml+xml', 'text/html']:
                     self.spine_items.append(item['path'])
 
+    def url_for(self, path):
+        if not self.lazy:
+            return QUrl.fromLocalFile(path)
+        url = QUrl()
+        url.setScheme(EPUB_SCHEME.decode())
+        url.setHost(self.host)
+        url.setPath('/' + path)
+        return url
+
+    def read(self, name):
+        return self.prefetcher.read(name)
+
+    def prefetch_around(self, index):
+        """在后台把第 index 章之后几章和前一章解压进缓存"""
+        if self.prefetcher is None:
+            return
+        after = self.spine_items[index + 1:index + 1 + PREFETCH_AHEAD]
+        before = self.spine_items[max(0, index - 1):index]
+        self.prefetcher.schedule(after[:1] + before + after[1:])
+
+    def media_type(self, name):
+        return (self.archive.media_type(name)
+                or mimetypes.guess_type(name)[0]
+                or 'application/octet-stream')
+
+    def cleanup(self):
+        if self.prefetcher is not None:
+            self.prefetcher.close()
+            self.prefetcher.cache.clear()
+        if self.archive is not None:
+            self.archive.close()
+        if self.temp_dir is not None:
+            self.temp_dir.cleanup()
+
+
+class EpubSchemeHandler(QWebEngineUrlSchemeHandler):
+    """把 epub://<host>/<归档内路径> 请求直接从 zip 中解压返回"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.parser = None
+
+    def requestStarted(self, job):
+        url = job.requestUrl()
+        parser = self.parser
+        name = url.path().lstrip('/')
+        if (parser is None or not parser.lazy or url.host() != parser.host
+                or not parser.archive.exists(name)):
+            job.fail(QWebEngineUrlRequestJob.Error.UrlNotFound)
+            return
+        buffer = QBuffer(job)
+        buffer.setData(parser.read(name))
+        buffer.open(QIODevice.OpenModeFlag.ReadOnly)
+        job.reply(parser.media_type(name).encode(), buffer)
+
+class TaskSignals(QObject):
+    progress = pyqtSignal(int)          # 千分比
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+
+class ConversionTask(QRunnable):
+    """在线程池中运行一个转换函数
+
+    func 需要接受 progress 关键字参数；keys 是该任务占用的框架/输出，
+    同一个 key 同时只允许一个任务运行。
+    """
+    def __init__(self, label, keys, func, **kwargs):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.label = label
+        self.keys = set(keys)
+        self.func = func
+        self.kwargs = kwargs
+        self.signals = TaskSignals()
+        self._cancelled = False
+        self._permille = -1
+
+    def cancel(self):
+        self._cancelled = True
+
+    def _progress(self, done, total):
+        # 在工作线程中调用：检查取消标记，进度有变化时才发信号
+        if self._cancelled:
+            raise Cancelled()
+        permille = done * 1000 // total if total else 0
+        if permille != self._permille:
+            self._permille = permille
+            self.signals.progress.emit(permille)
+
+    def run(self):
+        try:
+            result = self.func(progress=self._progress, **self.kwargs)
+        except Cancelled:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+        else:
+            self.signals.finished.emit(result)
+
+
+class TaskWidget(QWidget):
+    """状态栏中显示单个任务的进度和取消按钮"""
+    def __init__(self, task, parent=None):
+        super().__init__(parent)
+        layout = QHBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 1000)
+        self.progress_bar.setMaximumWidth(120)
+        self.progress_bar.setTextVisible(False)
+        cancel_btn = QPushButton("取消")
+        cancel_btn.clicked.connect(task.cancel)
+        layout.addWidget(QLabel(task.label))
+        layout.addWidget(self.progress_bar)
+        layout.addWidget(cancel_btn)
+        self.setLayout(layout)
+        task.signals.progress.connect(self.progress_bar.setValue)
+
+
+class LibrarySearchDialog(QDialog):
+    """书库全文搜索：查询已建立的索引，双击结果在阅读器中打开对应章节"""
+    def __init__(self, window):
+        super().__init__(window)
+        self.window = window
+        self.setWindowTitle("全文搜索书库")
+        self.resize(640, 480)
+        self.query_edit = QLineEdit()
+        self.query_edit.setPlaceholderText('空格分隔为同时包含，OR 表示或，引号内为短语')
+        self.query_edit.returnPressed.connect(self.run_search)
+        search_btn = QPushButton("搜索")
+        search_btn.clicked.connect(self.run_search)
+        update_btn = QPushButton("更新索引")
+        update_btn.clicked.connect(self.window.update_search_index)
+        top = QHBoxLayout()
+        top.addWidget(self.query_edit)
+        top.addWidget(search_btn)
+        top.addWidget(update_btn)
+        self.results = QTreeWidget()
+        self.results.setHeaderLabels(["书名", "章节", "位置"])
+        self.results.setColumnWidth(0, 240)
+        self.results.setColumnWidth(1, 240)
+        self.results.itemActivated.connect(self.open_hit)
+        self.summary = QLabel()
+        layout = QVBoxLayout()
+        layout.addLayout(top)
+        layout.addWidget(self.results)
+        layout.addWidget(self.summary)
+        self.setLayout(layout)
+
+    def run_search(self):
+        query = self.query_edit.text().strip()
+        if not query:
+            return
+        self.results.clear()
+        # 每次查询单独连接，索引可能正在工作线程中更新
+        with SearchIndex(LIBRARY_DIR) as index:
+            hits = index.search(query)
+        for hit in hits:
+            item = QTreeWidgetItem([hit['book'] or os.path.basename(hit['path']),
+                                    hit['chapter_title'] or os.path.basename(hit['chapter']),
+                                    str(hit['offset'])])
+            item.setData(0, 100, hit)
+            self.results.addTopLevelItem(item)
+        self.summary.setText(f"共 {len(hits)} 处" if hits else "没有找到")
+
+    def open_hit(self, item):
+        # 阅读器中高亮查询里的第一个词或短语
+        first = next((m for m in QUERY_PART.finditer(self.query_edit.text())
+                      if m.group() != 'OR'), None)
+        text = (first.group(1) or first.group(2)) if first else ''
+        self.window.open_search_hit(item.data(0, 100), text)
+
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -91,6 +313,14 @@ class MainWindow(QMainWindow):
         self.epub_parser = None
         self.current_text_file = None
         self.text_saved = True
+        self.journal = None
+        self.large_find_text = None
+        self.thread_pool = QThreadPool(self)
+        self.tasks = {}         # ConversionTask -> TaskWidget
+        self.busy_keys = set()
+        self.search_dialog = None
+        self.pending_highlight = None
+        self.current_chapter = -1
         self.settings = QSettings(QSettings.Format.IniFormat, 
                             QSettings.Scope.UserScope, 
                             "YourCompany", "YourApp")
@@ -113,20 +343,33 @@ class MainWindow(QMainWindow):
         self.toc_tree.setHeaderHidden(True)
         self.toc_tree.itemClicked.connect(self.load_content)
         self.web_view = QWebEngineView()
+        self.scheme_handler = EpubSchemeHandler(self)
+        self.web_view.page().profile().installUrlSchemeHandler(EPUB_SCHEME, self.scheme_handler)
+        self.web_view.loadFinished.connect(self.highlight_pending)
         self.epub_splitter.addWidget(self.toc_tree)
         self.epub_splitter.addWidget(self.web_view)
         self.epub_splitter.setSizes([200, 824])
         epub_tab = QWidget()
         epub_tab.setLayout(QVBoxLayout())
         epub_tab.layout().addWidget(self.epub_splitter)
+        self.epub_tab = epub_tab
         
         # 文本编辑器标签页
         self.text_edit = QTextEdit()
         self.text_edit.setUndoRedoEnabled(True)
         self.text_edit.textChanged.connect(self.mark_unsaved_changes)
+        self.text_edit.document().contentsChange.connect(self.record_edit)
         editor_tab = QWidget()
         editor_layout = QVBoxLayout()
         editor_layout.addWidget(self.text_edit)
+        self.large_view = LargeTextView()
+        self.large_view.modified.connect(self.mark_unsaved_changes)
+        self.large_view.hide()
+        editor_layout.addWidget(self.large_view)
+        self.find_panel = FindPanel(self.text_edit)
+        self.find_panel.status.connect(self.update_status)
+        self.find_panel.hide()
+        editor_layout.addWidget(self.find_panel)
         editor_tab.setLayout(editor_layout)
         
         self.tab_widget.addTab(epub_tab, "EPUB阅读器")
@@ -143,6 +386,7 @@ class MainWindow(QMainWindow):
         # 恢复设置
         self.restore_settings()
         self.setup_conversion_tab()
+        self.setup_library_tab()
 
     def setup_conversion_tab(self):
         conversion_tab = QWidget()
@@ -158,7 +402,7 @@ class MainWindow(QMainWindow):
         epub_browse_btn.clicked.connect(self.select_epub_for_conversion)
         
         self.chapters_edit = QLineEdit()
-        self.chapters_edit.setPlaceholderText("输入章节号（如1,3,5），留空转换全部")
+        self.chapters_edit.setPlaceholderText("章节号或范围（如1,3,5-8）、标题（第*章、re:正则），留空转换全部")
         
         convert_epub_btn = QPushButton("开始转换")
         convert_epub_btn.clicked.connect(self.convert_epub_to_txt)
@@ -231,6 +475,92 @@ class MainWindow(QMainWindow):
         conversion_tab.setLayout(layout)
         self.tab_widget.addTab(conversion_tab, "转换工具")
 
+    def setup_library_tab(self):
+        self.library_tab = QWidget()
+        layout = QVBoxLayout()
+        top = QHBoxLayout()
+        self.library_filter_edit = QLineEdit()
+        self.library_filter_edit.setPlaceholderText("按书名、作者或文件名筛选")
+        # 上万本书时每次重建列表约需零点几秒，输入停顿后再筛选
+        self.library_filter_timer = QTimer(self)
+        self.library_filter_timer.setSingleShot(True)
+        self.library_filter_timer.timeout.connect(self.refresh_library)
+        self.library_filter_edit.textChanged.connect(lambda: self.library_filter_timer.start(200))
+        scan_btn = QPushButton("重新扫描")
+        scan_btn.clicked.connect(self.scan_library)
+        top.addWidget(self.library_filter_edit)
+        top.addWidget(scan_btn)
+
+        self.library_tree = QTreeWidget()
+        self.library_tree.setHeaderLabels(["书名", "作者", "语言", "章节", "文件"])
+        self.library_tree.setColumnWidth(0, 280)
+        self.library_tree.setColumnWidth(1, 140)
+        self.library_tree.setRootIsDecorated(False)
+        self.library_tree.currentItemChanged.connect(self.show_library_cover)
+        self.library_tree.itemActivated.connect(
+            lambda item: self.open_epub_direct(os.path.join(LIBRARY_DIR, item.data(0, 100))))
+        self.cover_label = QLabel()
+        self.cover_label.setFixedWidth(240)
+        self.cover_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        splitter = QSplitter()
+        splitter.addWidget(self.library_tree)
+        splitter.addWidget(self.cover_label)
+
+        layout.addLayout(top)
+        layout.addWidget(splitter)
+        self.library_tab.setLayout(layout)
+        self.tab_widget.addTab(self.library_tab, "书库")
+        self.library_loaded = False
+        self.tab_widget.currentChanged.connect(self._tab_changed)
+
+    def _tab_changed(self, index):
+        # 第一次切换到书库时先显示缓存的目录，再在后台扫描变化
+        if self.tab_widget.widget(index) is self.library_tab and not self.library_loaded:
+            self.library_loaded = True
+            self.scan_library()
+
+    def scan_library(self):
+        os.makedirs(LIBRARY_DIR, exist_ok=True)
+        self.refresh_library()
+        task = ConversionTask("扫描书库", [os.path.join(LIBRARY_DIR, CATALOG_NAME)],
+                              scan_catalog, library=LIBRARY_DIR)
+        task.signals.finished.connect(lambda result: self.refresh_library())
+        self.start_task(task, "书库扫描完成", "扫描书库失败")
+
+    def refresh_library(self):
+        if not os.path.isdir(LIBRARY_DIR):
+            return
+        with Catalog(LIBRARY_DIR) as catalog:
+            books = catalog.books(self.library_filter_edit.text().strip())
+        items = []
+        for book in books:
+            if book['error']:
+                item = QTreeWidgetItem([book['name'], "", "", "", f"无法读取: {book['error']}"])
+            else:
+                item = QTreeWidgetItem([book['title'], book['creator'] or "", book['language'] or "",
+                                        str(book['chapters']), book['name']])
+            item.setData(0, 100, book['name'])
+            items.append(item)
+        self.library_tree.clear()
+        self.library_tree.addTopLevelItems(items)
+        self.update_status(f"书库共 {len(books)} 本")
+
+    def show_library_cover(self, item):
+        self.cover_label.clear()
+        if item is None:
+            return
+        try:
+            with Catalog(LIBRARY_DIR) as catalog:
+                data = catalog.cover(item.data(0, 100))
+        except Exception:
+            data = None
+        pixmap = QPixmap()
+        if data and pixmap.loadFromData(data):
+            self.cover_label.setPixmap(pixmap.scaledToWidth(
+                self.cover_label.width(), Qt.TransformationMode.SmoothTransformation))
+        else:
+            self.cover_label.setText("无封面")
+
     def select_epub_for_conversion(self):
         path, _ = QFileDialog.getOpenFileName(self, "选择EPUB文件", "", "EPUB文件 (*.epub)")
         if path:
@@ -246,33 +576,31 @@ class MainWindow(QMainWindow):
         target_dir = os.path.join("primary fileSet", "epub")
         os.makedirs(target_dir, exist_ok=True)
         
-        # 获取文件名并复制文件
         file_name = os.path.splitext(os.path.basename(epub_path))[0]
         target_path = os.path.join(target_dir, f"{file_name}.epub")
-        
-        try:
-            shutil.copyfile(epub_path, target_path)
-        except Exception as e:
-            QMessageBox.critical(self, "错误", f"文件复制失败: {str(e)}")
-            return
 
         # 处理章节参数
         chapters = self.chapters_edit.text().strip()
         judge = bool(chapters)
-        cypher = []
-        
+        cypher = chapters
+
         if judge:
+            from converter.chapterselect import parse_selection
             try:
-                cypher = [int(c.strip()) for c in chapters.split(",")]
-            except ValueError:
-                QMessageBox.warning(self, "错误", "章节格式错误，请用逗号分隔数字")
+                parse_selection(cypher)
+            except ValueError as e:
+                QMessageBox.warning(self, "错误", f"章节格式错误: {e}")
                 return
 
-        try:
-            Maindehtml2txt(judge=judge, cypher=cypher, name=file_name)
-            QMessageBox.information(self, "成功", "转换完成，结果保存在primary fileSet/txt目录")
-        except Exception as e:
-            QMessageBox.critical(self, "错误", f"转换失败: {str(e)}")
+        def convert(progress):
+            # 复制文件也放在工作线程中，大文件不会卡住界面
+            if os.path.abspath(epub_path) != os.path.abspath(target_path):
+                shutil.copyfile(epub_path, target_path)
+            Maindehtml2txt(judge=judge, cypher=cypher, name=file_name, progress=progress)
+
+        self.start_task(
+            ConversionTask(f"EPUB转TXT: {file_name}", [target_path], convert),
+            "转换完成，结果保存在primary fileSet/txt目录", "转换失败")
 
     def select_txt_for_conversion(self):
         default_dir = os.path.join("primary fileSet", "txt")
@@ -291,19 +619,19 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "错误", "请输入输出目录名")
             return
 
-        try:
-            MaindeTxt2Html(input_file=txt_file, output_file=output_dir)
-            QMessageBox.information(self, "成功", f"转换完成，结果保存在{output_dir}目录")
-        except Exception as e:
-            QMessageBox.critical(self, "错误", f"转换失败: {str(e)}")
+        framework = os.path.join('converter', 'HTML2EPUB', 'Interim Warehouse', output_dir)
+        self.start_task(
+            ConversionTask(f"TXT转HTML: {txt_file}", [framework], MaindeTxt2Html,
+                           input_file=txt_file, output_file=output_dir),
+            f"转换完成，结果保存在{output_dir}目录", "转换失败")
 
     def create_epub_framework(self):
         renamestr = self.framework_name_edit.text().strip() or "第一个"
-        try:
-            MaindeGenerateEpubFramework(renamestr=renamestr)
-            QMessageBox.information(self, "成功", "框架创建成功")
-        except Exception as e:
-            QMessageBox.critical(self, "错误", f"创建失败: {str(e)}")
+        framework = os.path.join('converter', 'HTML2EPUB', 'Interim Warehouse', renamestr)
+        self.start_task(
+            ConversionTask(f"创建框架: {renamestr}", [framework],
+                           MaindeGenerateEpubFramework, renamestr=renamestr),
+            "框架创建成功", "创建失败")
 
     def generate_epub(self):
         pointer = self.source_folder_edit.text().strip() or "第一个"
@@ -312,11 +640,41 @@ class MainWindow(QMainWindow):
         if not renamestr.endswith(".epub"):
             renamestr += ".epub"
 
-        try:
-            MaindeGenerateEPUB(pointer=pointer, renamestr=renamestr)
-            QMessageBox.information(self, "成功", f"EPUB文件已生成: {renamestr}")
-        except Exception as e:
-            QMessageBox.critical(self, "错误", f"生成失败: {str(e)}")
+        framework = os.path.join('converter', 'HTML2EPUB', 'Interim Warehouse', pointer)
+        self.start_task(
+            ConversionTask(f"生成EPUB: {renamestr}", [framework, renamestr],
+                           MaindeGenerateEPUB, pointer=pointer, renamestr=renamestr),
+            f"EPUB文件已生成: {renamestr}", "生成失败")
+
+    def start_task(self, task, success_message, failure_title):
+        """把任务放入线程池，进度显示在状态栏；占用中的框架不能重复提交"""
+        task.keys = {os.path.normcase(os.path.abspath(key)) for key in task.keys}
+        if task.keys & self.busy_keys:
+            QMessageBox.warning(self, "请稍候", f"{task.label} 涉及的文件正在被其他任务处理")
+            return
+        widget = TaskWidget(task)
+        self.status_bar.addPermanentWidget(widget)
+        self.tasks[task] = widget
+        self.busy_keys |= task.keys
+        task.signals.finished.connect(
+            lambda result: self._task_done(task, success_message))
+        task.signals.failed.connect(
+            lambda error: self._task_done(task, None, f"{failure_title}: {error}"))
+        task.signals.cancelled.connect(
+            lambda: self._task_done(task, f"已取消: {task.label}"))
+        self.update_status(f"开始: {task.label}")
+        self.thread_pool.start(task)
+
+    def _task_done(self, task, message, error=None):
+        widget = self.tasks.pop(task)
+        self.status_bar.removeWidget(widget)
+        widget.deleteLater()
+        self.busy_keys -= task.keys
+        if error:
+            self.update_status(error)
+            QMessageBox.critical(self, "错误", error)
+        else:
+            self.update_status(message)
 
 
 
@@ -363,27 +721,60 @@ class MainWindow(QMainWindow):
         
         undo_action = QAction("撤销", self)
         undo_action.setShortcut("Ctrl+Z")
-        undo_action.triggered.connect(self.text_edit.undo)
+        undo_action.triggered.connect(lambda: self.current_editor().undo())
         edit_menu.addAction(undo_action)
         
         redo_action = QAction("重做", self)
         redo_action.setShortcut("Ctrl+Y")
-        redo_action.triggered.connect(self.text_edit.redo)
+        redo_action.triggered.connect(lambda: self.current_editor().redo())
         edit_menu.addAction(redo_action)
         
         find_action = QAction("查找", self)
         find_action.setShortcut("Ctrl+F")
         find_action.triggered.connect(self.show_find_dialog)
         edit_menu.addAction(find_action)
+        
+        find_next_action = QAction("查找下一个", self)
+        find_next_action.setShortcut("F3")
+        find_next_action.triggered.connect(lambda: self.find_step(forward=True))
+        edit_menu.addAction(find_next_action)
+        
+        find_prev_action = QAction("查找上一个", self)
+        find_prev_action.setShortcut("Shift+F3")
+        find_prev_action.triggered.connect(lambda: self.find_step(forward=False))
+        edit_menu.addAction(find_prev_action)
+        
+        library_search_action = QAction("全文搜索书库", self)
+        library_search_action.setShortcut("Ctrl+Shift+F")
+        library_search_action.triggered.connect(self.show_library_search)
+        edit_menu.addAction(library_search_action)
+        
+        # 阅读菜单：快捷键只在阅读器标签页内有效，不影响文本编辑器中的 Ctrl+方向键
+        read_menu = menubar.addMenu('&阅读')
+        
+        next_chapter_action = QAction("下一章", self)
+        next_chapter_action.setShortcuts(["Ctrl+Right", "Ctrl+PgDown"])
+        next_chapter_action.setShortcutContext(Qt.ShortcutContext.WidgetWithChildrenShortcut)
+        next_chapter_action.triggered.connect(self.next_chapter)
+        read_menu.addAction(next_chapter_action)
+        self.epub_tab.addAction(next_chapter_action)
+        
+        prev_chapter_action = QAction("上一章", self)
+        prev_chapter_action.setShortcuts(["Ctrl+Left", "Ctrl+PgUp"])
+        prev_chapter_action.setShortcutContext(Qt.ShortcutContext.WidgetWithChildrenShortcut)
+        prev_chapter_action.triggered.connect(self.previous_chapter)
+        read_menu.addAction(prev_chapter_action)
+        self.epub_tab.addAction(prev_chapter_action)
 
     def open_epub(self):
         path, _ = QFileDialog.getOpenFileName(self, "打开EPUB", "", "EPUB Files (*.epub)")
         if path:
             if self.epub_parser:
-                self.epub_parser.temp_dir.cleanup()
+                self.epub_parser.cleanup()
                 
             try:
                 self.epub_parser = EpubParser(path)
+                self.scheme_handler.parser = self.epub_parser
                 self.setWindowTitle(f"EPUB阅读器 - {self.epub_parser.title}")
                 self.update_status(f"已打开EPUB: {os.path.basename(path)}")
                 self.update_toc()
@@ -393,6 +784,7 @@ class MainWindow(QMainWindow):
 
     def update_toc(self):
         self.toc_tree.clear()
+        self.current_chapter = -1
         for idx, path in enumerate(self.epub_parser.spine_items):
             filename = os.path.basename(path)
             item = QTreeWidgetItem([filename])
@@ -400,11 +792,26 @@ class MainWindow(QMainWindow):
             self.toc_tree.addTopLevelItem(item)
 
     def load_content(self, item):
-        path = item.data(0, 100)
-        self.web_view.setUrl(QUrl.fromLocalFile(path))
+        self.load_chapter(self.toc_tree.indexOfTopLevelItem(item))
+
+    def load_chapter(self, index):
+        if self.epub_parser is None or not 0 <= index < len(self.epub_parser.spine_items):
+            return
+        self.current_chapter = index
+        self.toc_tree.setCurrentItem(self.toc_tree.topLevelItem(index))
+        self.web_view.setUrl(self.epub_parser.url_for(self.epub_parser.spine_items[index]))
+        self.epub_parser.prefetch_around(index)
+
+    def next_chapter(self):
+        self.load_chapter(self.current_chapter + 1)
+
+    def previous_chapter(self):
+        self.load_chapter(self.current_chapter - 1)
 
     def new_text_file(self):
         if self.check_text_save():
+            self.close_journal()
+            self.close_large_file()
             self.text_edit.clear()
             self.current_text_file = None
             self.update_status("新建文本文件")
@@ -418,25 +825,26 @@ class MainWindow(QMainWindow):
         path, _ = QFileDialog.getOpenFileName(self, "打开文本文件", "", "文本文件 (*.txt);;所有文件 (*)")
         if path:
             try:
-                with open(path, 'rb') as f:
-                    rawdata = f.read(1024)
-                    result = chardet.detect(rawdata)
-                    encoding = result['encoding'] or 'utf-8'
-                
+                encoding = detect_encoding(path)
+                self.close_journal()
+                if os.path.getsize(path) >= LARGE_FILE_THRESHOLD and '\n'.encode(encoding).endswith(b'\n'):
+                    self.open_large_file(path, encoding)
+                    return
+                self.close_large_file()
                 with open(path, 'r', encoding=encoding, errors='replace') as f:
                     self.text_edit.setText(f.read())
                 self.current_text_file = path
                 self.update_status(f"已打开: {path}")
                 self.text_saved = True
                 self.tab_widget.setCurrentIndex(1)
+                self.start_journal(path, recover=True)
             except Exception as e:
                 QMessageBox.critical(self, "错误", f"无法打开文件:\n{str(e)}")
 
     def save_text_file(self):
         if self.current_text_file:
             try:
-                with open(self.current_text_file, 'w', encoding='utf-8') as f:
-                    f.write(self.text_edit.toPlainText())
+                self.write_text_file(self.current_text_file)
                 self.update_status(f"已保存到: {self.current_text_file}")
                 self.text_saved = True
             except Exception as e:
@@ -454,26 +862,122 @@ class MainWindow(QMainWindow):
         )
         if path:
             try:
-                with open(path, 'w', encoding='utf-8') as f:
-                    f.write(self.text_edit.toPlainText())
+                self.write_text_file(path)
                 self.current_text_file = path
                 self.update_status(f"已保存到: {path}")
                 self.text_saved = True
             except Exception as e:
                 QMessageBox.critical(self, "错误", f"保存失败:\n{str(e)}")
+    def write_text_file(self, path):
+        """把当前文本写入 path；大文件模式由模型分块写出"""
+        if self.large_view.model is not None:
+            self.large_view.save(path)
+            # 已保存的编辑不再需要重放，以新文件为基准重新开始日志
+            self.close_journal()
+            self.start_large_journal(path)
+            return
+        if self.journal is not None:
+            self.journal.wait()     # 不能与后台检查点同时写文件
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.text_edit.toPlainText())
+        self.start_journal(path)
+
+    def open_large_file(self, path, encoding):
+        """大文件只映射到内存，编辑器按需装载可见部分"""
+        self.find_panel.hide()
+        self.text_edit.clear()
+        self.text_edit.hide()
+        self.close_journal()
+        ops = self.recoverable_edits(path, 'lines')
+        self.start_large_journal(path)
+        self.large_view.open(path, encoding, journal=self.journal, recover=ops)
+        self.large_view.show()
+        self.current_text_file = path
+        self.update_status(f"已打开（大文件模式）: {path}")
+        self.text_saved = not ops
+        self.tab_widget.setCurrentIndex(1)
+
+    def close_large_file(self):
+        if self.large_view.model is not None:
+            self.large_view.close_model()
+            self.large_view.hide()
+            self.text_edit.show()
+
+    def current_editor(self):
+        return self.large_view.editor if self.large_view.model is not None else self.text_edit
+
     def auto_save(self):
-        if self.tab_widget.currentIndex() == 1:  # 仅在文本编辑器标签页生效
-            if self.current_text_file and not self.text_saved:
-                try:
-                    with open(self.current_text_file, 'w', encoding='utf-8') as f:
-                        f.write(self.text_edit.toPlainText())
-                    self.text_saved = True
-                    self.update_status(f"自动保存于 {datetime.datetime.now().strftime('%H:%M:%S')}")
-                except Exception as e:
-                    QMessageBox.critical(self, "自动保存失败", f"错误信息：{str(e)}")
-            elif not self.current_text_file and self.text_edit.toPlainText():
+        if self.journal is not None:
+            # 编辑已实时追加到日志，这里只定期在后台把全文写回文件
+            error = self.journal.take_error()
+            if error is not None:
+                QMessageBox.critical(self, "自动保存失败", f"错误信息：{str(error)}")
+            elif self.large_view.model is not None:
+                # 大文件模式：把窗口中的修改写回模型，按行替换随即追加到日志
+                self.large_view.commit()
+            elif self.journal.due():
+                self.journal.checkpoint(self.text_edit.toPlainText())
+                self.text_saved = True
+                self.update_status(f"自动保存于 {datetime.datetime.now().strftime('%H:%M:%S')}")
+        elif self.tab_widget.currentIndex() == 1:  # 仅在文本编辑器标签页生效
+            if not self.current_text_file and self.text_edit.toPlainText():
                 self.save_text_file()
 
+    def recoverable_edits(self, path, kind='text'):
+        """崩溃遗留在日志中的编辑，用户选择不恢复时返回 []"""
+        ops = read_journal(path, kind)
+        if ops:
+            reply = QMessageBox.question(
+                self, "恢复编辑",
+                f"发现 {os.path.basename(path)} 上次未保存的 {len(ops)} 处编辑，是否恢复？")
+            if reply != QMessageBox.StandardButton.Yes:
+                ops = []
+        return ops
+
+    def start_large_journal(self, path):
+        """大文件模式的按行编辑日志，由 LargeTextView 在写回模型时记录"""
+        self.journal = EditJournal(path, kind='lines')
+        self.journal.start()
+        self.large_view.journal = self.journal
+
+    def start_journal(self, path, recover=False):
+        """以磁盘上的 path 为基准开始编辑日志；recover 时先检查崩溃遗留的编辑"""
+        ops = self.recoverable_edits(path) if recover else []
+        self.close_journal()
+        self.journal = EditJournal(path)
+        self.journal.start()
+        if ops:
+            # 重放的编辑经 contentsChange 重新记入新日志
+            document = self.text_edit.document()
+            cursor = QTextCursor(document)
+            cursor.beginEditBlock()
+            for position, removed, text in ops:
+                last = document.characterCount() - 1
+                cursor.setPosition(min(position, last))
+                cursor.setPosition(min(position + removed, last), QTextCursor.MoveMode.KeepAnchor)
+                cursor.insertText(text)
+            cursor.endEditBlock()
+            self.update_status(f"已恢复 {len(ops)} 处编辑: {path}")
+
+    def close_journal(self):
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+
+    def record_edit(self, position, removed, added):
+        """contentsChange 回调：只把本次编辑追加到日志"""
+        if self.journal is None or self.journal.kind != 'text':
+            return
+        text = ''
+        if added:
+            document = self.text_edit.document()
+            cursor = QTextCursor(document)
+            cursor.setPosition(position)
+            cursor.setPosition(min(position + added, document.characterCount() - 1),
+                               QTextCursor.MoveMode.KeepAnchor)
+            text = cursor.selectedText().replace('\u2029', '\n')
+        self.journal.record(position, removed, text)
+
     def check_text_save(self):
         if not self.text_saved:
             reply = QMessageBox.question(
@@ -497,27 +1001,70 @@ class MainWindow(QMainWindow):
         self.update_status("文本已修改")
 
     def show_find_dialog(self):
+        if self.large_view.model is None:
+            self.tab_widget.setCurrentIndex(1)
+            self.find_panel.open()
+            return
+        # 大文件模式只在映射的文件上向后查找纯文本
         search_text, ok = QInputDialog.getText(
             self, '查找', '输入要查找的内容:')
         if ok and search_text:
-            cursor = self.text_edit.textCursor()
-            document = self.text_edit.document()
-            found = document.find(
-                search_text, 
-                cursor.position(), 
-                QTextDocument.FindFlag.FindCaseSensitively | 
-                QTextDocument.FindFlag.FindBackward
-            )
-            if not found.isNull():
-                self.text_edit.setTextCursor(found)
-                self.update_status(f"找到: {search_text}")
+            self.large_find_text = search_text
+            self.find_step(forward=True)
+
+    def find_step(self, forward=True):
+        if self.large_view.model is None:
+            if not self.find_panel.isVisible():
+                self.find_panel.open()
+            elif forward:
+                self.find_panel.find_next()
             else:
-                found = document.find(search_text, 0)
-                if not found.isNull():
-                    self.text_edit.setTextCursor(found)
-                    self.update_status(f"找到: {search_text}")
-                else:
-                    QMessageBox.information(self, '查找', f'未找到: {search_text}')
+                self.find_panel.find_previous()
+            return
+        if not self.large_find_text:
+            self.show_find_dialog()
+        elif self.large_view.find(self.large_find_text):
+            self.update_status(f"找到: {self.large_find_text}")
+        else:
+            QMessageBox.information(self, '查找', f'未找到: {self.large_find_text}')
+
+    def show_library_search(self):
+        if self.search_dialog is None:
+            self.search_dialog = LibrarySearchDialog(self)
+            # 首次打开时在后台增量更新索引
+            self.update_search_index(quiet=True)
+        self.search_dialog.show()
+        self.search_dialog.raise_()
+        self.search_dialog.query_edit.setFocus()
+
+    def update_search_index(self, quiet=False):
+        os.makedirs(LIBRARY_DIR, exist_ok=True)
+        index_path = os.path.join(LIBRARY_DIR, INDEX_NAME)
+        if os.path.normcase(os.path.abspath(index_path)) in self.busy_keys:
+            if not quiet:
+                self.update_status("书库索引正在更新")
+            return
+        # workers=1：在工作线程中直接解析，界面进程中不启动子进程
+        self.start_task(
+            ConversionTask("更新书库索引", [index_path], update_search_index, library=LIBRARY_DIR,
+                           workers=1),
+            "书库索引已更新", "更新索引失败")
+
+    def open_search_hit(self, hit, text):
+        if self.epub_parser is None or os.path.abspath(self.epub_parser.epub_path) != os.path.abspath(hit['path']):
+            self.open_epub_direct(hit['path'])
+            if self.epub_parser is None or self.epub_parser.epub_path != hit['path']:
+                return
+        if hit['chapter'] not in self.epub_parser.spine_items:
+            return
+        self.tab_widget.setCurrentIndex(0)
+        self.pending_highlight = text or None
+        self.load_chapter(self.epub_parser.spine_items.index(hit['chapter']))
+
+    def highlight_pending(self, ok):
+        if ok and self.pending_highlight:
+            self.web_view.findText(self.pending_highlight)
+        self.pending_highlight = None
 
     def update_status(self, message):
         self.status_bar.showMessage(message)
@@ -527,13 +1074,26 @@ class MainWindow(QMainWindow):
             self.resize(self.settings.value("window/size"))
 
     def closeEvent(self, event):
-        if self.epub_parser:
-            self.epub_parser.temp_dir.cleanup()
-        if self.check_text_save():
-            self.settings.setValue("window/size", self.size())
-            event.accept()
-        else:
+        # 先问完所有问题，确定要关闭之后才取消任务、清理阅读器
+        if not self.check_text_save():
             event.ignore()
+            return
+        if self.tasks:
+            reply = QMessageBox.question(
+                self, '任务进行中', f'还有 {len(self.tasks)} 个转换任务在运行，取消它们并退出吗？',
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
+            if reply != QMessageBox.StandardButton.Yes:
+                event.ignore()
+                return
+            for task in self.tasks:
+                task.cancel()
+            self.thread_pool.waitForDone()
+        if self.epub_parser:
+            self.epub_parser.cleanup()
+        self.close_journal()
+        self.close_large_file()
+        self.settings.setValue("window/size", self.size())
+        event.accept()
 
     def dragEnterEvent(self, event):
         if event.mimeData().hasUrls():
@@ -554,9 +1114,10 @@ class MainWindow(QMainWindow):
 
     def open_epub_direct(self, path):
         if self.epub_parser:
-            self.epub_parser.temp_dir.cleanup()
+            self.epub_parser.cleanup()
         try:
             self.epub_parser = EpubParser(path)
+            self.scheme_handler.parser = self.epub_parser
             self.setWindowTitle(f"EPUB阅读器 - {self.epub_parser.title}")
             self.update_status(f"已打开EPUB: {os.path.basename(path)}")
             self.update_toc()
@@ -567,17 +1128,19 @@ class MainWindow(QMainWindow):
     def open_text_direct(self, path):
         if self.check_text_save():
             try:
-                with open(path, 'rb') as f:
-                    rawdata = f.read(1024)
-                    result = chardet.detect(rawdata)
-                    encoding = result['encoding'] or 'utf-8'
-                
+                encoding = detect_encoding(path)
+                self.close_journal()
+                if os.path.getsize(path) >= LARGE_FILE_THRESHOLD and '\n'.encode(encoding).endswith(b'\n'):
+                    self.open_large_file(path, encoding)
+                    return
+                self.close_large_file()
                 with open(path, 'r', encoding=encoding, errors='replace') as f:
                     self.text_edit.setText(f.read())
                 self.current_text_file = path
                 self.update_status(f"已打开: {path}")
                 self.text_saved = True
                 self.tab_widget.setCurrentIndex(1)
+                self.start_journal(path, recover=True)
             except Exception as e:
                 QMessageBox.warning(self, "打开失败", f"无法打开文件：{path}\n错误信息：{str(e)}")
 
@@ -588,6 +1151,7 @@ if __name__ == '__main__':
     for dir in dir_list:
         if not os.path.dirname(dir):
             os.makedirs(dir)
+    register_epub_scheme()
     app = QApplication(sys.argv)
     app.setStyleSheet("""
     QGroupBox {
@@ -0,0 +1,86 @@
+"""基准套件命令行
+
+    python -m benchmarks run --chapters 2000 --output result.json
+    python -m benchmarks run --baseline baseline.json --threshold 0.1
+    python -m benchmarks compare baseline.json result.json --threshold 0.1
+
+run 输出 JSON 报告；给出 --baseline 时，任一阶段比基线慢超过阈值即以退出码 1 结束。
+"""
+import argparse
+import json
+import sys
+
+from benchmarks import pipelines
+
+
+def _load(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _report_regressions(baseline, result, threshold):
+    if baseline.get('config') != result.get('config'):
+        print("警告: 基线与本次运行的语料配置不同", file=sys.stderr)
+    regressions = pipelines.compare(baseline, result, threshold)
+    for r in regressions:
+        print(f"回退: {r['stage']} {r['baseline_s']:.3f}s -> {r['current_s']:.3f}s "
+              f"(x{r['ratio']:.2f})", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks',
+                                     description='epubManager 流水线基准')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    run = sub.add_parser('run', help='运行基准')
+    defaults = pipelines.DEFAULT_CONFIG
+    run.add_argument('--stages', nargs='+', choices=pipelines.STAGES, default=list(pipelines.STAGES))
+    run.add_argument('--chapters', type=int, default=defaults['chapters'])
+    run.add_argument('--chapter-kb', type=int, default=defaults['chapter_kb'])
+    run.add_argument('--cjk-ratio', type=float, default=defaults['cjk_ratio'],
+                     help='汉字占正文字符的比例（0~1）')
+    run.add_argument('--images', type=int, default=defaults['images'])
+    run.add_argument('--image-kb', type=int, default=defaults['image_kb'])
+    run.add_argument('--frameworks', type=int, default=defaults['frameworks'],
+                     help='framework 阶段创建的框架数')
+    run.add_argument('--workers', type=int, default=defaults['workers'],
+                     help='epub2txt 阶段的并行进程数')
+    run.add_argument('--seed', type=int, default=defaults['seed'])
+    run.add_argument('--repeat', type=int, default=1, help='每个阶段重复次数，取最快一次')
+    run.add_argument('--output', help='把 JSON 报告写入文件')
+    run.add_argument('--baseline', help='与基线报告比较')
+    run.add_argument('--threshold', type=float, default=0.1, help='允许的变慢比例')
+
+    cmp_parser = sub.add_parser('compare', help='比较两份报告')
+    cmp_parser.add_argument('baseline')
+    cmp_parser.add_argument('current')
+    cmp_parser.add_argument('--threshold', type=float, default=0.1)
+
+    child = sub.add_parser('_child')
+    child.add_argument('stage', choices=pipelines.STAGES)
+    child.add_argument('config')
+
+    args = parser.parse_args(argv)
+
+    if args.command == '_child':
+        print(json.dumps(pipelines.run_child(args.stage, json.loads(args.config))))
+        return 0
+
+    if args.command == 'compare':
+        return _report_regressions(_load(args.baseline), _load(args.current), args.threshold)
+
+    config = {key: getattr(args, key) for key in pipelines.DEFAULT_CONFIG}
+    result = pipelines.run_suite(config, args.stages, args.repeat)
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    print(text)
+    if args.baseline:
+        return _report_regressions(_load(args.baseline), result, args.threshold)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,61 @@
+"""EPUB→TXT 解析引擎对比基准
+
+生成合成 EPUB，分别用 lxml 单次流式引擎和原 BeautifulSoup 路径转换，
+比较耗时并校验两者输出逐字节一致；--workers 大于 1 时再加测并行转换。
+
+用法（在仓库根目录执行）:
+    python -m benchmarks.bench_html2txt --chapters 2000 --chapter-kb 16 --workers 4
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.corpus import write_epub
+
+
+def run_engine(engine, epub_path, output_path, workers=None):
+    from converter.html2txt import EpubToTextConverter
+
+    start = time.perf_counter()
+    EpubToTextConverter(epub_path, engine=engine).convert(output_path=output_path,
+                                                          workers=workers)
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--chapters', type=int, default=2000)
+    parser.add_argument('--chapter-kb', type=int, default=16, help='每章大小（KB）')
+    parser.add_argument('--workers', type=int, default=1, help='并行转换的进程数')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        epub_path = os.path.join(tmp, 'bench.epub')
+        write_epub(epub_path, args.chapters, args.chapter_kb)
+
+        results = {}
+        outputs = {}
+        runs = [('bs4', 'bs4', None), ('lxml', 'lxml', None)]
+        if args.workers > 1:
+            runs.append((f'lxml_x{args.workers}', 'lxml', args.workers))
+        for key, engine, workers in runs:
+            output_path = os.path.join(tmp, f'{key}.txt')
+            results[key] = run_engine(engine, epub_path, output_path, workers)
+            with open(output_path, 'rb') as f:
+                outputs[key] = f.read()
+
+    identical = all(output == outputs['bs4'] for output in outputs.values())
+    report = {'chapters': args.chapters}
+    for key, seconds in results.items():
+        report[f'{key}_s'] = seconds
+        report[f'{key}_speedup'] = results['bs4'] / seconds
+    report['identical'] = identical
+    print(json.dumps(report, indent=2))
+    return 0 if identical else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""书库全文索引基准
+
+生成若干本合成 EPUB，测量建立索引、无变化时增量更新和查询的耗时，
+并用逐章节子串查找校验查询结果。
+
+用法（在仓库根目录执行）:
+    python -m benchmarks.bench_search --books 1000 --chapters 20 --chapter-kb 8 --workers 4
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from benchmarks.corpus import write_epub
+
+
+def brute_force(library, query):
+    """逐章节查找子串，返回 {(路径, 章节序号, 偏移)}"""
+    from converter.epubarchive import EpubArchive
+    from converter.html2txt import extract_chapter
+
+    hits = set()
+    for name in os.listdir(library):
+        if not name.endswith('.epub'):
+            continue
+        path = os.path.join(library, name)
+        with EpubArchive(path) as archive:
+            for seq, chapter in enumerate(archive.spine_paths()):
+                with archive.open(chapter) as f:
+                    text = extract_chapter(f)[1]
+                pos = text.find(query)
+                while pos >= 0:
+                    hits.add((path, seq, pos))
+                    pos = text.find(query, pos + 1)
+    return hits
+
+
+def main(argv=None):
+    from converter.search import SearchIndex
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--books', type=int, default=200)
+    parser.add_argument('--chapters', type=int, default=20, help='每本书的章节数')
+    parser.add_argument('--chapter-kb', type=int, default=8, help='每章大小（KB）')
+    parser.add_argument('--workers', type=int, help='建立索引的进程数')
+    parser.add_argument('--queries', type=int, default=50)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as library:
+        for n in range(args.books):
+            write_epub(os.path.join(library, f'book{n:05}.epub'), args.chapters,
+                       args.chapter_kb, seed=n)
+        report = {'books': args.books, 'chapters': args.books * args.chapters}
+
+        with SearchIndex(library) as index:
+            start = time.perf_counter()
+            index.update(workers=args.workers)
+            report['build_s'] = time.perf_counter() - start
+            start = time.perf_counter()
+            index.update(workers=args.workers)
+            report['noop_update_s'] = time.perf_counter() - start
+            report['index_mb'] = os.path.getsize(index.db_path) / 1024 / 1024
+
+            # 查询取自语料的随机汉字串，长度 1~4
+            terms = [term for term, in index.conn.execute(
+                "SELECT DISTINCT term FROM postings WHERE length(term) = 2 LIMIT 5000")
+                if not term.isascii()]
+            rng = random.Random(0)
+            queries = []
+            for _ in range(args.queries):
+                query = rng.choice(terms)
+                length = rng.choice((1, 2, 4))
+                queries.append(query[:1] if length == 1 else query if length == 2
+                               else query + rng.choice(terms))
+            timings = []
+            for query in queries:
+                start = time.perf_counter()
+                index.search(query, limit=1000)
+                timings.append(time.perf_counter() - start)
+            timings.sort()
+            report['query_median_ms'] = timings[len(timings) // 2] * 1000
+            report['query_max_ms'] = timings[-1] * 1000
+
+            check = queries[0]
+            expected = brute_force(library, check)
+            found = {(hit['path'], hit['seq'], hit['offset'])
+                     for hit in index.search(check, limit=len(expected) + 1)}
+            report['identical'] = found == expected
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    return 0 if report['identical'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,66 @@
+"""Txt2Html.parse 峰值内存基准
+
+生成不同大小的合成手稿，每个大小在独立子进程中转换并记录峰值 RSS。
+流式实现下峰值内存只取决于最大的一章，不应随手稿总大小增长。
+
+用法（在仓库根目录执行）:
+    python -m benchmarks.bench_txt2html --sizes 8 32 128 --chapter-kb 64
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.corpus import write_manuscript
+from benchmarks.pipelines import peak_rss_kb
+
+
+def run_child(input_file, output_dir):
+    from converter.txt2html2 import Txt2Html
+
+    start = time.perf_counter()
+    Txt2Html(input_file, output_dir, os.path.basename(input_file)).parse()
+    wall = time.perf_counter() - start
+    print(json.dumps({'wall_s': wall, 'peak_rss_kb': peak_rss_kb()}))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[8, 32, 128],
+                        help='手稿大小（MB）')
+    parser.add_argument('--chapter-kb', type=int, default=64, help='每章大小（KB）')
+    parser.add_argument('--child', nargs=2, metavar=('INPUT', 'OUTPUT_DIR'),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        run_child(*args.child)
+        return 0
+
+    results = []
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            input_file = os.path.join(tmp, 'manuscript.txt')
+            chapters = max(1, size * 1024 // args.chapter_kb)
+            write_manuscript(input_file, chapters, args.chapter_kb)
+            out = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.bench_txt2html',
+                 '--child', input_file, os.path.join(tmp, 'text')],
+                check=True, capture_output=True, text=True
+            )
+            result = json.loads(out.stdout.strip().splitlines()[-1])
+            result.update({'input_mb': size, 'chapters': chapters,
+                           'mb_per_s': size / result['wall_s']})
+            results.append(result)
+            print(f"{size:>6} MB  {chapters:>6} 章  {result['wall_s']:8.2f} s  "
+                  f"峰值RSS {result['peak_rss_kb']} KB", file=sys.stderr)
+
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
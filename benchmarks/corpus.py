@@ -0,0 +1,150 @@
+"""合成基准语料：手稿 TXT、框架图片和完整 EPUB
+
+所有生成函数都是确定性的（由 seed 决定），只依赖标准库。
+"""
+import os
+import random
+import zipfile
+from xml.sax.saxutils import escape
+
+
+ASCII_WORDS = ('the quick brown fox jumps over lazy dog epub chapter novel '
+               'manager reader text build stream index').split()
+
+JPEG_HEADER = b'\xff\xd8\xff\xe0\x00\x10JFIF\x00'
+
+
+def paragraph_pool(cjk_ratio=0.8, seed=0, count=64, length=120):
+    """生成一组段落，cjk_ratio 为汉字占字符数的比例"""
+    rng = random.Random(seed)
+    pool = []
+    for _ in range(count):
+        parts = []
+        size = 0
+        while size < length:
+            if rng.random() < cjk_ratio:
+                run = ''.join(chr(rng.randint(0x4E00, 0x9FA5))
+                              for _ in range(rng.randint(4, 16)))
+                parts.append(run + '，')
+            else:
+                run = ' '.join(rng.choice(ASCII_WORDS) for _ in range(rng.randint(2, 6)))
+                parts.append(run + '. ')
+            size += len(run) + 1
+        pool.append(''.join(parts).rstrip())
+    return pool
+
+
+def chapter_paragraphs(pool, chapter_kb, seed):
+    """按 utf-8 字节数截取约 chapter_kb 的段落列表"""
+    rng = random.Random(seed)
+    target = chapter_kb * 1024
+    paragraphs = []
+    size = 0
+    while size < target:
+        paragraph = rng.choice(pool)
+        paragraphs.append(paragraph)
+        size += len(paragraph.encode('utf-8')) + 1
+    return paragraphs
+
+
+def write_manuscript(path, chapters, chapter_kb, cjk_ratio=0.8, seed=0):
+    """写入 "=== 标题 ===" 格式的手稿，返回写入字节数"""
+    pool = paragraph_pool(cjk_ratio, seed)
+    with open(path, 'w', encoding='utf-8') as f:
+        for n in range(1, chapters + 1):
+            f.write(f'=== 第{n}章 ===\n\n')
+            for i, paragraph in enumerate(chapter_paragraphs(pool, chapter_kb, seed + n)):
+                if i % 20 == 19:
+                    f.write(f'• {paragraph[:40]}\n')
+                f.write(paragraph)
+                f.write('\n')
+    return os.path.getsize(path)
+
+
+def image_bytes(image_kb, seed):
+    """伪 JPEG 数据：JPEG 文件头加随机字节，不可压缩，接近真实图片"""
+    rng = random.Random(seed)
+    return JPEG_HEADER + rng.randbytes(max(0, image_kb * 1024 - len(JPEG_HEADER)))
+
+
+def write_images(images_dir, count, image_kb, seed=0):
+    """向框架的 images 目录写入图片，返回文件名列表"""
+    os.makedirs(images_dir, exist_ok=True)
+    names = []
+    for n in range(1, count + 1):
+        name = f'img{n:04d}.jpg'
+        with open(os.path.join(images_dir, name), 'wb') as f:
+            f.write(image_bytes(image_kb, seed + n))
+        names.append(name)
+    return names
+
+
+CHAPTER_TEMPLATE = '''<?xml version="1.0" encoding="utf-8"?>
+<html xmlns="http://www.w3.org/1999/xhtml">
+<head><title>第{n}章</title>
+<style>p {{ text-indent: 2em; }}</style>
+<link rel="stylesheet" href="../styles/style.css"/></head>
+<body>
+    <section class="chapter">
+        <h1>第{n}章</h1>
+        {body}
+    </section>
+</body>
+</html>'''
+
+LIST_BLOCK = '''<ul>
+            <li>列表项一</li>
+            <li>列表项二<ul><li>嵌套项</li></ul></li>
+        </ul>
+        <!-- 注释 -->
+        <h2>小节 &amp; 实体</h2>'''
+
+
+def chapter_xhtml(n, paragraphs, image=None):
+    parts = [f'<p>{escape(paragraph)}</p>' for paragraph in paragraphs]
+    parts.insert(len(parts) // 2, LIST_BLOCK)
+    if image:
+        parts.insert(1, f'<p><img src="../images/{image}" alt=""/></p>')
+    return CHAPTER_TEMPLATE.format(n=n, body='\n        '.join(parts))
+
+
+def write_epub(path, chapters, chapter_kb, cjk_ratio=0.8, images=0, image_kb=64, seed=0):
+    """写入一个最小可用的合成 EPUB，返回文件大小"""
+    pool = paragraph_pool(cjk_ratio, seed)
+    manifest = []
+    spine = []
+    with zipfile.ZipFile(path, 'w') as z:
+        z.writestr('mimetype', 'application/epub+zip', compress_type=zipfile.ZIP_STORED)
+        z.writestr('META-INF/container.xml', '''<?xml version="1.0"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+    <rootfiles>
+        <rootfile full-path="OEBPS/package.opf" media-type="application/oebps-package+xml"/>
+    </rootfiles>
+</container>''')
+        image_names = [f'img{n:04d}.jpg' for n in range(1, images + 1)]
+        for n, name in enumerate(image_names, 1):
+            z.writestr(f'OEBPS/images/{name}', image_bytes(image_kb, seed + n))
+            manifest.append(f'<item id="img{n:04d}" href="images/{name}" media-type="image/jpeg"/>')
+        for n in range(1, chapters + 1):
+            image = image_names[(n - 1) % images] if images else None
+            xhtml = chapter_xhtml(n, chapter_paragraphs(pool, chapter_kb, seed + n), image)
+            z.writestr(f'OEBPS/text/c{n:05d}.xhtml', xhtml, compress_type=zipfile.ZIP_DEFLATED)
+            manifest.append(f'<item id="c{n:05d}" href="text/c{n:05d}.xhtml" '
+                            f'media-type="application/xhtml+xml"/>')
+            spine.append(f'<itemref idref="c{n:05d}"/>')
+        z.writestr('OEBPS/package.opf', f'''<?xml version="1.0" encoding="utf-8"?>
+<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="uid">
+    <metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
+        <dc:identifier id="uid">urn:uuid:bench-{seed}</dc:identifier>
+        <dc:title>基准</dc:title>
+        <dc:creator>benchmarks</dc:creator>
+        <dc:language>zh-CN</dc:language>
+    </metadata>
+    <manifest>
+        {"".join(manifest)}
+    </manifest>
+    <spine>
+        {"".join(spine)}
+    </spine>
+</package>''')
+    return os.path.getsize(path)
@@ -0,0 +1,200 @@
+"""四条 Mainde* 流水线的无界面基准
+
+每个阶段在独立子进程、独立临时工作目录中运行（Mainde* 函数使用相对于
+当前目录的路径），准备工作不计时，只测量流水线调用本身。
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks import corpus
+
+
+STAGES = ('framework', 'txt2html', 'build', 'epub2txt')
+
+DEFAULT_CONFIG = {
+    'chapters': 500,
+    'chapter_kb': 16,
+    'cjk_ratio': 0.8,
+    'images': 20,
+    'image_kb': 128,
+    'frameworks': 50,
+    'workers': None,
+    'seed': 0
+}
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WAREHOUSE = os.path.join('converter', 'HTML2EPUB', 'Interim Warehouse')
+
+
+def peak_rss_kb():
+    """当前进程的峰值常驻内存（KB），无法获取时返回 None"""
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return None
+        return psutil.Process().memory_info().peak_wset // 1024
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+
+def tree_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for file in files:
+            total += os.path.getsize(os.path.join(root, file))
+    return total
+
+
+def _make_framework(name):
+    from converter.HTML2EPUB.GenerateEpubFramework import MaindeGenerateEpubFramework
+    MaindeGenerateEpubFramework(renamestr=name)
+    return os.path.join(WAREHOUSE, name)
+
+
+def _write_manuscript(config):
+    txt_dir = os.path.join('primary fileSet', 'txt')
+    os.makedirs(txt_dir, exist_ok=True)
+    return corpus.write_manuscript(os.path.join(txt_dir, 'bench.txt'), config['chapters'],
+                                   config['chapter_kb'], config['cjk_ratio'], config['seed'])
+
+
+def stage_framework(config):
+    from converter.HTML2EPUB.GenerateEpubFramework import MaindeGenerateEpubFramework
+
+    count = config['frameworks']
+    start = time.perf_counter()
+    cpu = time.process_time()
+    for n in range(count):
+        MaindeGenerateEpubFramework(renamestr=f'bench{n}')
+    return time.perf_counter() - start, time.process_time() - cpu, {
+        'bytes': tree_size(WAREHOUSE),
+        'items': count
+    }
+
+
+def stage_txt2html(config):
+    from converter.txt2html2 import MaindeTxt2Html
+
+    _make_framework('bench')
+    size = _write_manuscript(config)
+    start = time.perf_counter()
+    cpu = time.process_time()
+    MaindeTxt2Html('bench.txt', 'bench')
+    return time.perf_counter() - start, time.process_time() - cpu, {
+        'bytes': size,
+        'items': config['chapters']
+    }
+
+
+def stage_build(config):
+    from converter.txt2html2 import MaindeTxt2Html
+    from converter.HTML2EPUB.GenerateEPUB import MaindeGenerateEPUB
+
+    framework = _make_framework('bench')
+    _write_manuscript(config)
+    MaindeTxt2Html('bench.txt', 'bench')
+    corpus.write_images(os.path.join(framework, 'OEBPS', 'images'),
+                        config['images'], config['image_kb'], config['seed'])
+    size = tree_size(framework)
+    start = time.perf_counter()
+    cpu = time.process_time()
+    MaindeGenerateEPUB(pointer='bench', renamestr='bench.epub')
+    return time.perf_counter() - start, time.process_time() - cpu, {
+        'bytes': size,
+        'items': config['chapters']
+    }
+
+
+def stage_epub2txt(config):
+    from converter.html2txt import Maindehtml2txt
+
+    epub_dir = os.path.join('primary fileSet', 'epub')
+    os.makedirs(epub_dir, exist_ok=True)
+    os.makedirs(os.path.join('primary fileSet', 'txt'), exist_ok=True)
+    size = corpus.write_epub(os.path.join(epub_dir, 'bench.epub'), config['chapters'],
+                             config['chapter_kb'], config['cjk_ratio'], config['images'],
+                             config['image_kb'], config['seed'])
+    start = time.perf_counter()
+    cpu = time.process_time()
+    Maindehtml2txt(False, [], 'bench', workers=config['workers'])
+    return time.perf_counter() - start, time.process_time() - cpu, {
+        'bytes': size,
+        'items': config['chapters']
+    }
+
+
+STAGE_FUNCS = {
+    'framework': stage_framework,
+    'txt2html': stage_txt2html,
+    'build': stage_build,
+    'epub2txt': stage_epub2txt
+}
+
+
+def run_child(stage, config):
+    """在子进程中执行：当前目录为该阶段独享的临时工作目录"""
+    wall, cpu, info = STAGE_FUNCS[stage](config)
+    if any(name.startswith('PyQt') for name in sys.modules):
+        raise RuntimeError(f"阶段 {stage} 导入了 PyQt")
+    mb = info['bytes'] / (1024 * 1024)
+    return {
+        'wall_s': wall,
+        'cpu_s': cpu,
+        'mb': mb,
+        'mb_per_s': mb / wall if wall else None,
+        'chapters': info['items'],
+        'chapters_per_s': info['items'] / wall if wall else None,
+        'peak_rss_kb': peak_rss_kb()
+    }
+
+
+def run_stage(stage, config):
+    """在新的子进程与临时目录中运行单个阶段，返回结果字典"""
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [REPO_ROOT, env.get('PYTHONPATH')]))
+    with tempfile.TemporaryDirectory() as workdir:
+        out = subprocess.run(
+            [sys.executable, '-m', 'benchmarks', '_child', stage, json.dumps(config)],
+            cwd=workdir, env=env, check=True, capture_output=True, text=True,
+            encoding='utf-8'
+        )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def run_suite(config, stages=STAGES, repeat=1):
+    """运行所选阶段，每个阶段重复 repeat 次取最快的一次"""
+    results = {}
+    for stage in stages:
+        runs = [run_stage(stage, config) for _ in range(repeat)]
+        results[stage] = min(runs, key=lambda r: r['wall_s'])
+    return {
+        'config': config,
+        'python': sys.version.split()[0],
+        'platform': sys.platform,
+        'stages': results
+    }
+
+
+def compare(baseline, current, threshold):
+    """返回比基线慢超过 threshold（比例）的阶段列表"""
+    regressions = []
+    for stage, result in current['stages'].items():
+        base = baseline.get('stages', {}).get(stage)
+        if not base or not base.get('wall_s'):
+            continue
+        ratio = result['wall_s'] / base['wall_s']
+        if ratio > 1 + threshold:
+            regressions.append({
+                'stage': stage,
+                'baseline_s': base['wall_s'],
+                'current_s': result['wall_s'],
+                'ratio': ratio
+            })
+    return regressions
@@ -0,0 +1,163 @@
+import os
+import sqlite3
+import hashlib
+import xml.etree.ElementTree as ET
+
+
+# 框架根目录下的点文件是构建缓存，不会被打包进 EPUB
+INDEX_NAME = '.index.sqlite'
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS chapters (
+    filename  TEXT PRIMARY KEY,   -- OEBPS/text 下的相对路径（posix）
+    id        TEXT NOT NULL,      -- manifest / spine 使用的 id
+    title     TEXT,               -- 第一个 <h1> 的文本
+    has_h1    INTEGER NOT NULL,
+    order_key TEXT NOT NULL,
+    hash      TEXT NOT NULL,
+    size      INTEGER NOT NULL,
+    mtime_ns  INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS chapters_order ON chapters(order_key);
+'''
+
+
+def find_first_h1(chap_path):
+    """流式解析章节，读到第一个 <h1> 的结束标签即停止并返回该元素
+
+    没有 <h1> 时返回 None。
+    """
+    h1_element = None
+    with open(chap_path, 'rb') as f:
+        for event, elem in ET.iterparse(f, events=('start', 'end')):
+            if event == 'start':
+                if h1_element is None and elem.tag.rpartition('}')[2] == 'h1':
+                    h1_element = elem
+            elif elem is h1_element:
+                return elem
+    return None
+
+
+def file_digest(file_path):
+    h = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class ChapterIndex:
+    """单个 EPUB 框架的章节索引，保存在 <框架>/.index.sqlite
+
+    记录每章的 id、标题、排序键、内容哈希、大小和 mtime。Txt2Html 写章节时
+    直接登记；手动修改的文件由 reconcile() 按 stat 结果发现并重新登记。
+    """
+
+    def __init__(self, framework_path):
+        self.framework_path = framework_path
+        self.text_dir = os.path.join(framework_path, 'OEBPS', 'text')
+        self.conn = sqlite3.connect(os.path.join(framework_path, INDEX_NAME))
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+        # 本次会话中已经核对过 stat 的章节，lookup 时不再重复 stat
+        self._fresh = set()
+
+    def _filename(self, chap_path):
+        return os.path.relpath(chap_path, self.text_dir).replace(os.path.sep, '/')
+
+    def _row(self, row):
+        item = dict(row)
+        item['path'] = os.path.join(self.text_dir, *item['filename'].split('/'))
+        return item
+
+    def _upsert(self, filename, title, has_h1, digest, st):
+        item_id = os.path.splitext(os.path.basename(filename))[0]
+        self.conn.execute(
+            'INSERT OR REPLACE INTO chapters '
+            '(filename, id, title, has_h1, order_key, hash, size, mtime_ns) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (filename, item_id, title, int(has_h1), filename, digest,
+             st.st_size, st.st_mtime_ns)
+        )
+        self._fresh.add(filename)
+
+    def _refresh(self, chap_path, filename, st):
+        """重新读取标题和哈希"""
+        h1_element = find_first_h1(chap_path)
+        title = h1_element.text if h1_element is not None else None
+        self._upsert(filename, title, h1_element is not None, file_digest(chap_path), st)
+
+    def record(self, chap_path, title):
+        """登记刚写出的章节，title 为其 <h1> 文本，无需再解析文件"""
+        filename = self._filename(chap_path)
+        if not title or '<' in title or '&' in title:
+            # 标题为空或含有标记、实体时以实际解析结果为准，留给构建时的 reconcile 处理
+            self.conn.execute('DELETE FROM chapters WHERE filename = ?', (filename,))
+            self._fresh.discard(filename)
+        else:
+            st = os.stat(chap_path)
+            self._upsert(filename, title, True, file_digest(chap_path), st)
+        self.conn.commit()
+
+    def lookup(self, chap_path):
+        """取单个章节的索引记录，文件有变化时先重新登记"""
+        filename = self._filename(chap_path)
+        row = self.conn.execute('SELECT * FROM chapters WHERE filename = ?',
+                                (filename,)).fetchone()
+        if row is not None and filename in self._fresh:
+            return self._row(row)
+        st = os.stat(chap_path)
+        if row is None or row['size'] != st.st_size or row['mtime_ns'] != st.st_mtime_ns:
+            self._refresh(chap_path, filename, st)
+            self.conn.commit()
+            row = self.conn.execute('SELECT * FROM chapters WHERE filename = ?',
+                                    (filename,)).fetchone()
+        self._fresh.add(filename)
+        return self._row(row)
+
+    def reconcile(self):
+        """按 stat 结果同步索引与磁盘，返回新增/变更/删除的章节数"""
+        known = {row['filename']: (row['size'], row['mtime_ns'])
+                 for row in self.conn.execute('SELECT filename, size, mtime_ns FROM chapters')}
+        seen = set()
+        changed = 0
+        stack = [self.text_dir]
+        while stack:
+            try:
+                entries = list(os.scandir(stack.pop()))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                if entry.is_dir():
+                    stack.append(entry.path)
+                    continue
+                if not entry.name.endswith('.xhtml'):
+                    continue
+                filename = self._filename(entry.path)
+                seen.add(filename)
+                st = entry.stat()
+                if known.get(filename) != (st.st_size, st.st_mtime_ns):
+                    self._refresh(entry.path, filename, st)
+                    changed += 1
+                self._fresh.add(filename)
+
+        removed = [(filename,) for filename in known if filename not in seen]
+        if removed:
+            self.conn.executemany('DELETE FROM chapters WHERE filename = ?', removed)
+            changed += len(removed)
+        self.conn.commit()
+        return changed
+
+    def chapters(self):
+        """按排序键返回全部章节记录"""
+        rows = self.conn.execute('SELECT * FROM chapters ORDER BY order_key')
+        return [self._row(row) for row in rows]
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
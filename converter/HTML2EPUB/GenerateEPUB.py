@@ -1,9 +1,24 @@
 import os
+import json
 import zipfile
 import xml.etree.ElementTree as ET
 
+from converter import instrument
+from converter.epubpack import collect_entries, make_policy, policy_signature, write_entries
+from converter.HTML2EPUB.ChapterIndex import ChapterIndex, file_digest
 
-def update_nav_xhtml(input_path, chapters):
+
+BUILD_MANIFEST_SUFFIX = '.build.json'
+BUILD_MANIFEST_VERSION = 2
+
+
+def update_nav_xhtml(input_path, chapters, index=None):
+    with instrument.span('nav.update', items=len(chapters)) as s:
+        _update_nav_xhtml(input_path, chapters, index)
+        s.add(bytes_out=os.path.getsize(os.path.join(input_path, 'OEBPS', 'nav.xhtml')))
+
+
+def _update_nav_xhtml(input_path, chapters, index=None):
     nav_path = os.path.join(input_path, 'OEBPS', 'nav.xhtml')
     namespaces = {
         'xhtml': 'http://www.w3.org/1999/xhtml',
@@ -23,17 +38,17 @@ def update_nav_xhtml(input_path, chapters):
     for child in list(ol_element):
         ol_element.remove(child)
     
+    # 章节标题取自框架的章节索引，未变化的章节不会再被打开
+    own_index = index is None
+    if own_index:
+        index = ChapterIndex(input_path)
+
     # 添加新目录项
     for idx, chap_path in enumerate(chapters, 1):
         # 提取章节信息
         chap_filename = os.path.basename(chap_path)
-        with open(chap_path, 'r', encoding='utf-8') as f:
-            chap_content = f.read()
-        
-        # 使用ElementTree解析章节标题
-        chap_root = ET.fromstring(chap_content)
-        h1_element = chap_root.find('.//{*}h1')
-        title = h1_element.text if h1_element is not None else f"章节 {idx}"
+        row = index.lookup(chap_path)
+        title = row['title'] if row['has_h1'] else f"章节 {idx}"
         
         # 创建列表项
         li = ET.Element('{http://www.w3.org/1999/xhtml}li')
@@ -44,6 +59,9 @@ def update_nav_xhtml(input_path, chapters):
         
         ol_element.append(li)
     
+    if own_index:
+        index.close()
+
     # 保持XML声明和格式
     tree.write(nav_path, 
               encoding='utf-8', 
@@ -51,21 +69,62 @@ def update_nav_xhtml(input_path, chapters):
               method='xml', 
               short_empty_elements=False)
 
-def folder_to_epub(input_path, output_epub_path):
+def folder_to_epub(input_path, output_epub_path, incremental=False, progress=None,
+                   policy=None, workers=None):
+    """把框架目录打包为 EPUB，返回按条目类型统计的 PackStats
+
+    policy 为 converter.epubpack 的压缩策略（默认文本 DEFLATE、图片直接存储），
+    条目在 workers 个线程中并行压缩；progress(已写条目数, 条目总数) 在每写入
+    一个条目后调用。
+    """
     # 确保输入路径存在
     if not os.path.isdir(input_path):
         raise ValueError("输入路径不存在或不是目录")
 
-    # 收集章节文件
-    text_dir = os.path.join(input_path, 'OEBPS', 'text')
-    chapters = []
-    for root, dirs, files in os.walk(text_dir):
-        for file in files:
-            if file.endswith('.xhtml'):
-                chapters.append(os.path.join(root, file))
-    # 按文件名排序
-    chapters.sort()
+    with instrument.span('build', framework=input_path, incremental=incremental):
+        # 从章节索引读取章节（先按 stat 同步手动修改过的文件），已按文件名排序
+        index = ChapterIndex(input_path)
+        try:
+            with instrument.span('build.index') as s:
+                index.reconcile()
+                rows = index.chapters()
+                s.add(items=len(rows))
+            chapters = [row['path'] for row in rows]
+            with instrument.span('build.opf', items=len(rows)):
+                _update_package(input_path, rows)
+            # 处理导航文件nav.xhtml
+            update_nav_xhtml(input_path, chapters, index=index)
+        finally:
+            index.close()
+
+        # 打包为EPUB文件
+        if policy is None:
+            policy = make_policy()
+        entries = collect_entries(input_path)
+        with instrument.span('build.pack', items=len(entries)) as s:
+            if incremental:
+                stats = _pack_incremental(entries, output_epub_path, policy, workers, progress)
+            else:
+                stats = _pack(entries, output_epub_path, policy, workers, progress)
+            s.add(bytes_in=sum(row[1] for row in stats.kinds.values()),
+                  bytes_out=os.path.getsize(output_epub_path), copied=stats.copied)
+        return stats
+
 
+def _pack(entries, output_epub_path, policy, workers=None, progress=None):
+    try:
+        with zipfile.ZipFile(output_epub_path, 'w') as zipf:
+            return write_entries(zipf, [(file_path, arcname, None) for file_path, arcname in entries],
+                                 policy, workers, progress)
+    except BaseException:
+        # 不留下写了一半的 EPUB
+        if os.path.exists(output_epub_path):
+            os.remove(output_epub_path)
+        raise
+
+
+def _update_package(input_path, rows):
+    """按章节索引重写 package.opf 的 manifest 与 spine"""
     # 处理OPF文件
     opf_path = os.path.join(input_path, 'OEBPS', 'package.opf')
     namespaces = {
@@ -85,12 +144,10 @@ def folder_to_epub(input_path, output_epub_path):
         if href.startswith('text/') and href.endswith('.xhtml'):
             manifest.remove(item)
     # 添加新章节到manifest
-    for chap_path in chapters:
-        rel_path = os.path.relpath(chap_path, os.path.dirname(opf_path))
-        rel_path = rel_path.replace(os.path.sep, '/')
-        item_id = os.path.splitext(os.path.basename(chap_path))[0]
+    for row in rows:
+        rel_path = 'text/' + row['filename']
         item = ET.SubElement(manifest, '{http://www.idpf.org/2007/opf}item', {
-            'id': item_id,
+            'id': row['id'],
             'href': rel_path,
             'media-type': 'application/xhtml+xml'
         })
@@ -101,35 +158,97 @@ def folder_to_epub(input_path, output_epub_path):
     for itemref in list(spine):
         spine.remove(itemref)
     # 添加新章节到spine
-    for chap_path in chapters:
-        item_id = os.path.splitext(os.path.basename(chap_path))[0]
+    for row in rows:
         ET.SubElement(spine, '{http://www.idpf.org/2007/opf}itemref', {
-            'idref': item_id
+            'idref': row['id']
         })
 
     # 保存修改后的OPF文件
     tree.write(opf_path, encoding='utf-8', xml_declaration=True)
 
-    # 处理导航文件nav.xhtml
-    update_nav_xhtml(input_path, chapters)
 
-    # 打包为EPUB文件
-    with zipfile.ZipFile(output_epub_path, 'w') as zipf:
-        # 首先添加mimetype（必须无压缩）
-        mimetype_path = os.path.join(input_path, 'mimetype')
-        zipf.write(mimetype_path, 'mimetype', compress_type=zipfile.ZIP_STORED)
-        
-        # 添加其他文件
-        for root_dir, _, files in os.walk(input_path):
-            for file in files:
-                file_path = os.path.join(root_dir, file)
-                if file == 'mimetype':
-                    continue  # 已单独处理
-                # 计算相对路径
-                arcname = os.path.relpath(file_path, input_path)
-                arcname = arcname.replace(os.path.sep, '/')
-                # 写入ZIP
-                zipf.write(file_path, arcname)
+def _load_build_manifest(manifest_path, output_epub_path, policy):
+    """读取上一次构建的清单；清单与现有 EPUB 或压缩策略对不上时视为无清单"""
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        st = os.stat(output_epub_path)
+    except (OSError, ValueError):
+        return {}
+    if (manifest.get('version') != BUILD_MANIFEST_VERSION or
+            manifest.get('epub_size') != st.st_size or
+            manifest.get('epub_mtime_ns') != st.st_mtime_ns or
+            manifest.get('policy') != policy_signature(policy)):
+        return {}
+    return manifest.get('entries', {})
+
+
+def _pack_incremental(entries, output_epub_path, policy, workers=None, progress=None):
+    """增量打包：内容哈希未变的条目直接从上一次的 EPUB 中原样复制
+
+    旁边的 <输出>.build.json 记录每个条目的哈希、大小和 mtime；
+    大小和 mtime 都没变的文件不再重新计算哈希。
+    """
+    manifest_path = output_epub_path + BUILD_MANIFEST_SUFFIX
+    old_entries = _load_build_manifest(manifest_path, output_epub_path, policy)
+    previous = None
+    if old_entries:
+        try:
+            previous = zipfile.ZipFile(output_epub_path, 'r')
+        except (OSError, zipfile.BadZipFile):
+            previous = None
+
+    new_entries = {}
+    items = []
+    tmp_path = output_epub_path + '.tmp'
+    try:
+        for file_path, arcname in entries:
+            st = os.stat(file_path)
+            old = old_entries.get(arcname)
+            if old and old['size'] == st.st_size and old['mtime_ns'] == st.st_mtime_ns:
+                digest = old['hash']
+            else:
+                digest = file_digest(file_path)
+
+            info = None
+            if previous is not None and old and old['hash'] == digest:
+                try:
+                    info = previous.getinfo(arcname)
+                except KeyError:
+                    info = None
+            if info is not None and info.file_size == st.st_size:
+                items.append((file_path, arcname, (previous, info)))
+            else:
+                items.append((file_path, arcname, None))
+
+            new_entries[arcname] = {
+                'hash': digest,
+                'size': st.st_size,
+                'mtime_ns': st.st_mtime_ns
+            }
+        with zipfile.ZipFile(tmp_path, 'w') as zipf:
+            stats = write_entries(zipf, items, policy, workers, progress)
+    except BaseException:
+        if previous is not None:
+            previous.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    if previous is not None:
+        previous.close()
+    os.replace(tmp_path, output_epub_path)
+
+    st = os.stat(output_epub_path)
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'version': BUILD_MANIFEST_VERSION,
+            'epub_size': st.st_size,
+            'epub_mtime_ns': st.st_mtime_ns,
+            'policy': policy_signature(policy),
+            'entries': new_entries
+        }, f, ensure_ascii=False)
+    return stats
 
 def endwith(string):
     root, ext = os.path.splitext(str)
@@ -138,7 +257,7 @@ def endwith(string):
     else:
         return False
 
-def MaindeGenerateEPUB(pointer=None,renamestr=None):
+def MaindeGenerateEPUB(pointer=None,renamestr=None,incremental=False,progress=None,policy=None):
     basepath2 = os.path.join('primary fileSet','epub')
     if not os.path.exists(basepath2):
         os.makedirs(basepath2)
@@ -151,7 +270,8 @@ def MaindeGenerateEPUB(pointer=None,renamestr=None):
     # if pointer == "" or pointer is None:
     #     pointer = "第一个"
     epub_path = os.path.join('converter', 'HTML2EPUB', 'Interim Warehouse', str(pointer))
-    folder_to_epub(epub_path, renamestr)
+    return folder_to_epub(epub_path, renamestr, incremental=incremental, progress=progress,
+                          policy=policy)
 
 
 
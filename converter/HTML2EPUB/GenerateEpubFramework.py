@@ -1,88 +1,30 @@
 import os
+import stat
 import zipfile,shutil
 from tempfile import TemporaryDirectory
+from xml.sax.saxutils import escape
 
-def create_epub(output_path, new_title,new_autho,cover_image_path=None, output_dir=None):
-    # 如果指定了输出路径，则结合输出路径和文件名
-    if output_dir:
-        output_path = os.path.join(output_dir, output_path)
-    
-    with TemporaryDirectory() as temp_dir:
-        # 创建目录结构
-        meta_inf_dir = os.path.join(temp_dir, 'META-INF')
-        oebps_dir = os.path.join(temp_dir, 'OEBPS')
-        text_dir = os.path.join(oebps_dir, 'text')
-        styles_dir = os.path.join(oebps_dir, 'styles')
-        images_dir = os.path.join(oebps_dir, 'images')
-        os.makedirs(meta_inf_dir, exist_ok=True)
-        os.makedirs(text_dir, exist_ok=True)
-        os.makedirs(styles_dir, exist_ok=True)
-        os.makedirs(images_dir, exist_ok=True)
-
-        # 创建mimetype文件（必须无压缩）
-        with open(os.path.join(temp_dir, 'mimetype'), 'w', encoding='utf-8') as f:
-            f.write('application/epub+zip')
-
-        # 创建container.xml
-        container_content = '''<?xml version="1.0"?>
+from converter.epubpack import pack_folder
+
+
+# 框架模板直接以内存中的文件集合写入目标目录，不再经过 example.epub 打包再解压
+TEMPLATE_DIRS = ('META-INF', 'OEBPS/text', 'OEBPS/styles', 'OEBPS/images')
+SHARED_DIR = '.template'    # 仓库下静态文件共享副本所在目录，框架中的同名文件可硬链接到这里
+
+CONTAINER_XML = '''<?xml version="1.0"?>
 <container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
     <rootfiles>
         <rootfile full-path="OEBPS/package.opf" media-type="application/oebps-package+xml"/>
     </rootfiles>
 </container>'''
-        with open(os.path.join(meta_inf_dir, 'container.xml'), 'w', encoding='utf-8') as f:
-            f.write(container_content)
-
-        # 创建package.opf文件
-        opf_manifest = []
-        opf_spine = []
-        
-        # 核心文件清单
-        files_to_add = [
-            ('nav.xhtml', 'application/xhtml+xml', 'nav'),
-            ('styles/style.css', 'text/css', None),
-            ('text/cover.xhtml', 'application/xhtml+xml', None)
-        ]
-        
-        # 如果提供封面图片
-        if cover_image_path and os.path.exists(cover_image_path):
-            cover_dest = os.path.join(images_dir, 'cover.jpg')
-            shutil.copy(cover_image_path, cover_dest)
-            files_to_add.append(('images/cover.jpg', 'image/jpeg', 'cover-image'))
-        
-        # 生成manifest内容
-        opf_manifest = '\n'.join(
-            f'<item id="{item_id}" href="{path}" media-type="{mtype}"{" properties=\""+item_id+"\"" if item_id else ""}/>'
-            for path, mtype, item_id in files_to_add
-        )
-
-        opf_content = f'''<?xml version="1.0" encoding="utf-8"?>
-<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="uid">
-    <metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
-        <dc:identifier id="uid">urn:uuid:12345678-1234-5678-1234-567812345678</dc:identifier>
-        <dc:title>{new_title}</dc:title>
-        <dc:creator>{new_autho}</dc:creator>
-        <dc:language>zh-CN</dc:language>
-        <meta property="dcterms:modified">2024-01-01T00:00:00Z</meta>
-    </metadata>
-    <manifest>
-        {opf_manifest}
-        <item id="chapter1" href="text/chapter1.xhtml" media-type="application/xhtml+xml"/>
-    </manifest>
-    <spine>
-        <itemref idref="cover"/>
-        <itemref idref="nav"/>
-        <itemref idref="chapter1"/>
-    </spine>
-    <guide>
-        <reference type="cover" title="封面" href="text/cover.xhtml"/>
-    </guide>
-</package>'''
-        with open(os.path.join(oebps_dir, 'package.opf'), 'w', encoding='utf-8') as f:
-            f.write(opf_content)
 
-        # 创建导航文件
-        nav_content = '''<?xml version="1.0" encoding="utf-8"?>
+# 默认样式表
+STYLE_CSS = '''body { font-family: serif; margin: 1em; }
+h1 { font-size: 2em; text-align: center; }
+.chapter p { text-indent: 2em; }'''
+
+# 导航文件（打包时按章节索引重写）
+NAV_XHTML = '''<?xml version="1.0" encoding="utf-8"?>
 <html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops">
 <head><title>目录</title></head>
 <body>
@@ -95,33 +37,9 @@ def create_epub(output_path, new_title,new_autho,cover_image_path=None, output_d
     </nav>
 </body>
 </html>'''
-        with open(os.path.join(oebps_dir, 'nav.xhtml'), 'w', encoding='utf-8') as f:
-            f.write(nav_content)
 
-        # 创建默认样式表
-        css_content = '''body { font-family: serif; margin: 1em; }
-h1 { font-size: 2em; text-align: center; }
-.chapter p { text-indent: 2em; }'''
-        with open(os.path.join(styles_dir, 'style.css'), 'w', encoding='utf-8') as f:
-            f.write(css_content)
-
-        # 创建空白封面页
-        cover_content = f'''<?xml version="1.0" encoding="utf-8"?>
-<html xmlns="http://www.w3.org/1999/xhtml">
-<head><title>封面</title>
-<link rel="stylesheet" href="../styles/style.css"/></head>
-<body>
-    <section class="cover">
-        <h1>{new_title}</h1>
-        <p>{new_autho}</p>
-    </section>
-</body>
-</html>'''
-        with open(os.path.join(text_dir, 'cover.xhtml'), 'w', encoding='utf-8') as f:
-            f.write(cover_content)
-
-        # 创建示例章节
-        chapter_content = '''<?xml version="1.0" encoding="utf-8"?>
+# 示例章节
+CHAPTER_XHTML = '''<?xml version="1.0" encoding="utf-8"?>
 <html xmlns="http://www.w3.org/1999/xhtml">
 <head><title>第一章</title>
 <link rel="stylesheet" href="../styles/style.css"/></head>
@@ -136,65 +54,229 @@ h1 { font-size: 2em; text-align: center; }
     </section>
 </body>
 </html>'''
-        with open(os.path.join(text_dir, 'chapter1.xhtml'), 'w', encoding='utf-8') as f:
-            f.write(chapter_content)
-
-        # 打包EPUB文件
-        with zipfile.ZipFile(output_path, 'w') as epub:
-            # 首先添加mimetype（必须无压缩）
-            epub.write(
-                os.path.join(temp_dir, 'mimetype'),
-                'mimetype',
-                compress_type=zipfile.ZIP_STORED
-            )
-            
-            # 添加其他文件
-            for root, dirs, files in os.walk(temp_dir):
-                for file in files:
-                    if file == 'mimetype':
-                        continue
-                    full_path = os.path.join(root, file)
-                    arcname = os.path.relpath(full_path, temp_dir)
-                    epub.write(full_path, arcname)
+
+OPF_TEMPLATE = '''<?xml version="1.0" encoding="utf-8"?>
+<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="uid">
+    <metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
+        <dc:identifier id="uid">urn:uuid:12345678-1234-5678-1234-567812345678</dc:identifier>
+        <dc:title>{title}</dc:title>
+        <dc:creator>{author}</dc:creator>
+        <dc:language>zh-CN</dc:language>
+        <meta property="dcterms:modified">2024-01-01T00:00:00Z</meta>
+    </metadata>
+    <manifest>
+        {manifest}
+        <item id="chapter1" href="text/chapter1.xhtml" media-type="application/xhtml+xml"/>
+    </manifest>
+    <spine>
+        <itemref idref="cover"/>
+        <itemref idref="nav"/>
+        <itemref idref="chapter1"/>
+    </spine>
+    <guide>
+        <reference type="cover" title="封面" href="text/cover.xhtml"/>
+    </guide>
+</package>'''
+
+# 空白封面页
+COVER_TEMPLATE = '''<?xml version="1.0" encoding="utf-8"?>
+<html xmlns="http://www.w3.org/1999/xhtml">
+<head><title>封面</title>
+<link rel="stylesheet" href="../styles/style.css"/></head>
+<body>
+    <section class="cover">
+        <h1>{title}</h1>
+        <p>{author}</p>
+    </section>
+</body>
+</html>'''
+
+# 与书名无关、框架生成后不会被程序改写的文件，可以共享同一份副本
+STATIC_FILES = {
+    'mimetype': b'application/epub+zip',
+    'META-INF/container.xml': CONTAINER_XML.encode('utf-8'),
+    'OEBPS/styles/style.css': STYLE_CSS.encode('utf-8'),
+}
+
+
+def template_files(new_title, new_autho, has_cover=False):
+    """框架模板的全部文件 {归档内路径: 内容}，封面图片除外"""
+    title = escape(new_title)
+    author = escape(new_autho)
+
+    # 核心文件清单
+    files_to_add = [
+        ('nav.xhtml', 'application/xhtml+xml', 'nav'),
+        ('styles/style.css', 'text/css', None),
+        ('text/cover.xhtml', 'application/xhtml+xml', None)
+    ]
+    if has_cover:
+        files_to_add.append(('images/cover.jpg', 'image/jpeg', 'cover-image'))
+
+    # 生成manifest内容
+    manifest = []
+    for path, mtype, item_id in files_to_add:
+        properties = f' properties="{item_id}"' if item_id else ''
+        manifest.append(f'<item id="{item_id}" href="{path}" media-type="{mtype}"{properties}/>')
+
+    files = dict(STATIC_FILES)
+    files['OEBPS/package.opf'] = OPF_TEMPLATE.format(
+        title=title, author=author, manifest='\n'.join(manifest)).encode('utf-8')
+    files['OEBPS/nav.xhtml'] = NAV_XHTML.encode('utf-8')
+    files['OEBPS/text/cover.xhtml'] = COVER_TEMPLATE.format(title=title, author=author).encode('utf-8')
+    files['OEBPS/text/chapter1.xhtml'] = CHAPTER_XHTML.encode('utf-8')
+    return files
+
+
+def prepare_shared(shared_dir):
+    """确保 shared_dir 中有最新的静态文件共享副本，返回 shared_dir
+
+    副本保持可写：Windows 上只读文件既不能被替换也不能被删除，而硬链接
+    共用同一个只读属性，会让链接到它的框架也删不掉。因此共享副本不受
+    文件系统保护，修改某个框架中链接过来的文件之前必须先断开链接（删除
+    后重新写入），否则所有共享它的框架会一起改变。
+    """
+    for name, data in STATIC_FILES.items():
+        path = os.path.join(shared_dir, *name.split('/'))
+        try:
+            mode = os.stat(path).st_mode
+        except OSError:
+            pass
+        else:
+            if not mode & stat.S_IWRITE:
+                os.chmod(path, mode | stat.S_IWRITE)    # 旧版本留下的只读副本
+        try:
+            with open(path, 'rb') as f:
+                if f.read() == data:
+                    continue
+        except OSError:
+            pass
+        # 先写临时文件再替换：已链接到旧副本的框架保留旧内容
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    return shared_dir
+
+
+def _remove(path):
+    """删除文件；旧版本留下的只读文件在 Windows 上不能直接删除，先改为可写"""
+    try:
+        os.remove(path)
+    except PermissionError:
+        os.chmod(path, stat.S_IREAD | stat.S_IWRITE)
+        os.remove(path)
+
+
+def _link(source, path):
+    """把 path 换成指向 source 的硬链接；文件系统不支持时返回 False"""
+    try:
+        if os.path.lexists(path):
+            _remove(path)
+        os.link(source, path)
+    except OSError:
+        return False
+    return True
+
+
+def materialize(target_dir, new_title, new_autho, cover_image_path=None, shared_dir=None):
+    """把框架模板直接写入 target_dir，已有的同名文件被覆盖，返回 target_dir
+
+    shared_dir 为 prepare_shared 准备好的目录时，静态文件以硬链接指向其中的
+    共享副本；不能建立硬链接（跨文件系统等）时退回普通写入。
+    """
+    for name in TEMPLATE_DIRS:
+        os.makedirs(os.path.join(target_dir, *name.split('/')), exist_ok=True)
+
+    # 如果提供封面图片
+    has_cover = bool(cover_image_path) and os.path.exists(cover_image_path)
+    for name, data in template_files(new_title, new_autho, has_cover).items():
+        path = os.path.join(target_dir, *name.split('/'))
+        if name in STATIC_FILES:
+            if shared_dir and _link(os.path.join(shared_dir, *name.split('/')), path):
+                continue
+            if os.path.lexists(path):
+                _remove(path)       # 可能是指向共享副本的硬链接，不能原地覆盖
+        with open(path, 'wb') as f:
+            f.write(data)
+    if has_cover:
+        shutil.copy(cover_image_path, os.path.join(target_dir, 'OEBPS', 'images', 'cover.jpg'))
+    return target_dir
+
+
+def create_frameworks(specs, warehouse, link_static=False, progress=None):
+    """批量创建框架，返回框架目录列表
+
+    specs 中每一项为 (名称, 书名, 作者, 封面图片路径或 None)；link_static 为
+    True 时各框架的静态文件硬链接到 warehouse/.template 中的同一份副本（修改
+    前先断开链接，见 prepare_shared）。
+    progress(已创建数, 总数) 在每个框架创建后调用。
+    """
+    specs = list(specs)
+    names = set()
+    for name, *_ in specs:
+        if not name or name != os.path.basename(name) or name in ('.', '..', SHARED_DIR):
+            raise ValueError(f"无效的框架名称: {name!r}")
+        if name in names:
+            raise ValueError(f"框架名称重复: {name}")
+        names.add(name)
+
+    os.makedirs(warehouse, exist_ok=True)
+    shared_dir = prepare_shared(os.path.join(warehouse, SHARED_DIR)) if link_static else None
+    frameworks = []
+    for done, (name, title, author, cover) in enumerate(specs, 1):
+        frameworks.append(materialize(os.path.join(warehouse, name), title, author, cover, shared_dir))
+        if progress is not None:
+            progress(done, len(specs))
+    return frameworks
+
+
+def create_epub(output_path, new_title,new_autho,cover_image_path=None, output_dir=None, policy=None):
+    # 如果指定了输出路径，则结合输出路径和文件名
+    if output_dir:
+        output_path = os.path.join(output_dir, output_path)
+
+    with TemporaryDirectory() as temp_dir:
+        materialize(temp_dir, new_title, new_autho, cover_image_path)
+        # 打包EPUB文件（mimetype 在最前且无压缩，其余按策略压缩）
+        pack_folder(temp_dir, output_path, policy=policy)
 
 
 def extract_epub(epub_path, rename_string):
     # 获取EPUB文件的绝对路径及其所在目录
     epub_abs_path = os.path.abspath(epub_path)
     epub_dir = os.path.dirname(epub_abs_path)
-    
+
     # 构建目标文件夹路径
     target_dir = os.path.join(epub_dir, rename_string)
-    
+
     # 确保目标文件夹存在
     os.makedirs(target_dir, exist_ok=True)
-    
+
     # 解压EPUB文件到目标文件夹
     with zipfile.ZipFile(epub_abs_path, 'r') as zip_ref:
         zip_ref.extractall(target_dir)
-    
+
     # 返回解压后的文件夹路径
     return target_dir
 
 
 
-def MaindeGenerateEpubFramework(renamestr=None):
+def MaindeGenerateEpubFramework(renamestr=None, progress=None):
     basepath1 = os.path.join('converter','HTML2EPUB','Interim Warehouse')
     if not os.path.exists(basepath1):
         os.makedirs(basepath1)
     if renamestr == "" or renamestr is None:
         renamestr = "第一个"
-    output_path = os.path.join('converter', 'HTML2EPUB', 'Interim Warehouse')
-    epub_path = os.path.join('converter', 'HTML2EPUB', 'Interim Warehouse', 'example.epub')
-    create_epub('example.epub', "新标题", "新作者", output_dir=output_path)
-    extract_epub(epub_path, str(renamestr))
-    
+    materialize(os.path.join(basepath1, str(renamestr)), "新标题", "新作者")
+    if progress is not None:
+        progress(1, 1)
+
 
 
 if __name__ == '__main__':
-    #epub_path = os.path.join('converter', 'HTML2EPUB', 'Interim Warehouse', 'example.epub')
     # 示例调用，指定输出路径
     # create_epub('example.epub', "新标题", "新作者", output_dir=r'converter\HTML2EPUB\Interim Warehouse')
-    #extract_epub(epub_path, "第三个")
     MaindeGenerateEpubFramework()
-    # extract_epub(r'D:\python\epubManager\converter\HTML2EPUB\Interim Warehouse\example.epub', "第三个")
\ No newline at end of file
+    # extract_epub(r'D:\python\epubManager\converter\HTML2EPUB\Interim Warehouse\example.epub', "第三个")
@@ -0,0 +1,235 @@
+"""epubManager 命令行入口（不加载任何界面模块）
+
+    python -m converter framework 第一个 --warehouse out/frameworks --title 书名 --author 作者
+    python -m converter frameworks 系列.csv --warehouse out/frameworks --link
+    python -m converter txt2html 手稿.txt out/frameworks/第一个
+    python -m converter build out/frameworks/第一个 out/书名.epub --incremental --level 9
+    python -m converter epub2txt 书名.epub 书名.txt --workers 4
+    python -m converter epub2txt 书名.epub 节选.txt --chapters "1,3,100-120,re:^番外"
+    python -m converter edit 书名.epub --title 新书名 --remove 3 --append 番外.txt
+    python -m converter merge 合集.epub 上册.epub 下册.epub --title 合集
+    python -m converter split 长篇.epub out/分卷 --chapters 500
+    python -m converter daemon --port 8765 --workers 2
+    python -m converter search "关键词 OR keyword" --library "primary fileSet/epub"
+    python -m converter catalog --library "primary fileSet/epub" --filter 作者
+    python -m converter --trace trace.jsonl --profile prof build out/frameworks/第一个 out/书名.epub
+
+每个子命令只导入自己需要的模块，bs4/lxml 只在真正解析时才加载。
+"""
+import argparse
+import os
+import sys
+
+
+def _framework(args):
+    from converter import jobs
+    return jobs.create_framework(args.name, warehouse=args.warehouse, title=args.title,
+                                 author=args.author, cover=args.cover)
+
+
+def _frameworks(args):
+    import csv
+    from converter import jobs
+
+    # 每行: 名称,书名,作者[,封面图片路径]
+    with open(args.specs, 'r', encoding='utf-8-sig', newline='') as f:
+        rows = [row for row in csv.reader(f) if row and row[0].strip()]
+    specs = []
+    for row in rows:
+        if len(row) < 3:
+            raise ValueError(f"行格式应为 名称,书名,作者[,封面]: {','.join(row)}")
+        name, title, author = (cell.strip() for cell in row[:3])
+        cover = row[3].strip() if len(row) > 3 and row[3].strip() else None
+        specs.append((name, title, author, cover))
+    frameworks = jobs.create_frameworks(specs, warehouse=args.warehouse, link_static=args.link)
+    return f"已创建 {len(frameworks)} 个框架"
+
+
+def _txt2html(args):
+    from converter import jobs
+    return jobs.txt_to_html(args.input, args.framework)
+
+
+def _build(args):
+    from converter import jobs
+    return jobs.build_epub(args.framework, args.output, incremental=args.incremental,
+                           level=args.level, workers=args.workers,
+                           report=lambda stats: print(stats.report()))
+
+
+def _edit(args):
+    from converter import jobs
+    return jobs.edit_epub(args.epub, output=args.output, title=args.title, creator=args.creator,
+                          append=args.append or (), remove=args.remove or (),
+                          remove_cover=args.remove_cover)
+
+
+def _merge(args):
+    from converter import jobs
+    return jobs.merge_epubs(args.inputs, args.output, title=args.title, creator=args.creator,
+                            level=args.level)
+
+
+def _split(args):
+    from converter import jobs
+    volumes = jobs.split_epub(args.epub, args.output_dir, chapters=args.chapters, level=args.level)
+    return f"已拆分为 {len(volumes)} 卷"
+
+
+def _epub2txt(args):
+    from converter import jobs
+    return jobs.epub_to_txt(args.epub, args.output, titles=args.titles,
+                            workers=args.workers, engine=args.engine, chapters=args.chapters)
+
+
+def _daemon(args):
+    from converter import daemon
+    daemon.serve(port=args.port, workers=args.workers, db_path=args.db,
+                 token=args.token or os.environ.get('EPUBMANAGER_TOKEN'))
+
+
+def _search(args):
+    from converter import jobs
+    from converter.search import SearchIndex, snippet
+
+    jobs.update_search_index(args.library, workers=args.workers)
+    with SearchIndex(args.library) as index:
+        hits = index.search(args.query, limit=args.limit)
+    cache = {}
+    for hit in hits:
+        print(f"{hit['book']} / {hit['chapter_title'] or hit['chapter']} @{hit['offset']}: "
+              f"{snippet(hit, cache=cache)}")
+    return f"共 {len(hits)} 处" + ("（已截断）" if len(hits) >= args.limit else "")
+
+
+def _catalog(args):
+    from converter import jobs
+    from converter.catalog import Catalog
+
+    jobs.scan_catalog(args.library, workers=args.workers)
+    with Catalog(args.library) as catalog:
+        books = catalog.books(args.filter)
+    for book in books:
+        if book['error']:
+            print(f"{book['name']}\t无法读取: {book['error']}")
+        else:
+            print(f"{book['title']}\t{book['creator'] or ''}\t{book['language'] or ''}\t"
+                  f"{book['chapters']}章\t{book['name']}")
+    return f"共 {len(books)} 本"
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m converter',
+                                     description='epubManager 批处理命令行')
+    parser.add_argument('--trace', metavar='FILE',
+                        help='把各阶段的耗时、字节数等记录以 JSON Lines 追加到 FILE（"-" 为 stderr）')
+    parser.add_argument('--trace-memory', action='store_true', help='记录中加入各阶段的峰值内存')
+    parser.add_argument('--profile', metavar='DIR', help='每个操作的 cProfile 结果保存到 DIR')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('framework', help='创建 EPUB 框架')
+    p.add_argument('name', help='框架名称')
+    p.add_argument('--warehouse', default='.', help='框架所在目录（默认当前目录）')
+    p.add_argument('--title', default='新标题')
+    p.add_argument('--author', default='新作者')
+    p.add_argument('--cover', help='封面图片路径')
+    p.set_defaults(func=_framework)
+
+    p = sub.add_parser('frameworks', help='按 CSV 清单批量创建 EPUB 框架')
+    p.add_argument('specs', help='CSV 文件，每行: 名称,书名,作者[,封面图片路径]')
+    p.add_argument('--warehouse', default='.', help='框架所在目录（默认当前目录）')
+    p.add_argument('--link', action='store_true',
+                   help='静态文件硬链接到仓库中的同一份共享副本')
+    p.set_defaults(func=_frameworks)
+
+    p = sub.add_parser('txt2html', help='TXT 手稿转换为框架章节')
+    p.add_argument('input', help='TXT 文件')
+    p.add_argument('framework', help='框架目录')
+    p.set_defaults(func=_txt2html)
+
+    p = sub.add_parser('build-epub', aliases=['build'], help='把框架打包为 EPUB')
+    p.add_argument('framework', help='框架目录')
+    p.add_argument('output', help='输出 EPUB 路径')
+    p.add_argument('--incremental', action='store_true', help='复用上一次构建中未变化的条目')
+    p.add_argument('--level', type=int, choices=range(10), metavar='0-9',
+                   help='文本条目的 DEFLATE 级别（默认 6，0 为不压缩）；图片始终直接存储')
+    p.add_argument('--workers', type=int, help='并行压缩的线程数')
+    p.set_defaults(func=_build)
+
+    p = sub.add_parser('epub2txt', help='EPUB 转换为 TXT')
+    p.add_argument('epub', help='EPUB 文件')
+    p.add_argument('output', help='输出 TXT 路径')
+    p.add_argument('--titles', nargs='+', help='只转换这些标题的章节')
+    p.add_argument('--chapters', help='章节选择：序号和范围（1,3,5-8）、标题通配符（第*章）或 re:正则')
+    p.add_argument('--workers', type=int, help='并行转换的进程数')
+    p.add_argument('--engine', choices=('lxml', 'bs4'), default='lxml')
+    p.set_defaults(func=_epub2txt)
+
+    p = sub.add_parser('edit', help='直接修改 EPUB（未变化的条目原样复制）')
+    p.add_argument('epub', help='EPUB 文件')
+    p.add_argument('-o', '--output', help='输出路径（默认覆盖原文件）')
+    p.add_argument('--title', help='新书名')
+    p.add_argument('--creator', help='新作者')
+    p.add_argument('--append', nargs='+', metavar='FILE',
+                   help='追加章节：TXT（按 "=== 标题 ===" 分章）或 XHTML 文件')
+    p.add_argument('--remove', nargs='+', type=int, metavar='N', help='删除的章节序号（从 1 开始）')
+    p.add_argument('--remove-cover', action='store_true', help='删除封面图片和封面页')
+    p.set_defaults(func=_edit)
+
+    p = sub.add_parser('merge', help='按顺序合并多本 EPUB（章节和资源原样复制）')
+    p.add_argument('output', help='输出 EPUB 路径')
+    p.add_argument('inputs', nargs='+', help='要合并的 EPUB 文件')
+    p.add_argument('--title', help='书名（默认取第一本）')
+    p.add_argument('--creator', help='作者（默认取第一本）')
+    p.add_argument('--level', type=int, choices=range(10), metavar='0-9',
+                   help='重新生成的 OPF/目录的 DEFLATE 级别（默认 6）')
+    p.set_defaults(func=_merge)
+
+    p = sub.add_parser('split', help='按章节数把 EPUB 拆分为多本')
+    p.add_argument('epub', help='EPUB 文件')
+    p.add_argument('output_dir', help='输出目录')
+    p.add_argument('--chapters', type=int, default=100, help='每卷章节数（默认 100）')
+    p.add_argument('--level', type=int, choices=range(10), metavar='0-9',
+                   help='重新生成的 OPF/目录的 DEFLATE 级别（默认 6）')
+    p.set_defaults(func=_split)
+
+    p = sub.add_parser('daemon', help='启动后台转换守护进程（本机 HTTP 接口）')
+    p.add_argument('--port', type=int, default=8765)
+    p.add_argument('--workers', type=int, default=2, help='工作线程数')
+    p.add_argument('--db', default='epubmanager-jobs.sqlite', help='任务队列数据库')
+    p.add_argument('--token', help='请求令牌（默认取 EPUBMANAGER_TOKEN，都没有时随机生成）')
+    p.set_defaults(func=_daemon)
+
+    p = sub.add_parser('search', help='全文搜索书库（先增量更新索引）')
+    p.add_argument('query', help='空格分隔为 AND，OR 连接多组，引号内为短语')
+    p.add_argument('--library', default=os.path.join('primary fileSet', 'epub'), help='书库目录')
+    p.add_argument('--limit', type=int, default=50)
+    p.add_argument('--workers', type=int, help='建立索引的进程数')
+    p.set_defaults(func=_search)
+
+    p = sub.add_parser('catalog', help='列出书库中的书（先增量更新元数据缓存）')
+    p.add_argument('--library', default=os.path.join('primary fileSet', 'epub'), help='书库目录')
+    p.add_argument('--filter', help='只列出书名、作者或文件名包含该文本的书')
+    p.add_argument('--workers', type=int, help='读取元数据的进程数')
+    p.set_defaults(func=_catalog)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.trace or args.trace_memory or args.profile:
+        from converter import instrument
+        instrument.enable(args.trace or '-', memory=args.trace_memory, profile_dir=args.profile)
+    try:
+        result = args.func(args)
+    except Exception as e:
+        print(f"错误: {e}", file=sys.stderr)
+        return 1
+    if result:
+        print(result)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
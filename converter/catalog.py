@@ -0,0 +1,233 @@
+"""EPUB 书库目录
+
+只读取每本书的 zip 中央目录、container.xml 和 OPF（书名、作者、语言、
+章节数、封面路径），不解压正文。结果缓存在书库目录下的 .catalog.sqlite
+中，以 (文件名, 大小, 修改时间) 判断是否需要重新读取，没有变化的书
+重新扫描时只需要一次 stat。
+
+读取时不经过 zipfile.ZipFile：它会为每个条目建立 ZipInfo，章节多的书
+大部分时间花在这里。这里直接在中央目录的原始字节中查找需要的两个条目，
+遇到 zip64 等少见情况时退回 EpubArchive。
+"""
+import os
+import posixpath
+import sqlite3
+import struct
+import urllib.parse
+import zlib
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+
+from converter.epubarchive import (
+    EpubArchive, CHAPTER_TYPES, CONTAINER_NS, OPF_NS, parse_metadata, is_cover_item
+)
+
+
+CATALOG_NAME = '.catalog.sqlite'
+DEFAULT_LIBRARY = os.path.join('primary fileSet', 'epub')
+CHUNK_SIZE = 64     # 每个进程任务处理的书数，避免逐本提交的进程间开销
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS books (
+    name      TEXT PRIMARY KEY,     -- 相对书库目录的文件名
+    size      INTEGER,
+    mtime_ns  INTEGER,
+    title     TEXT,
+    creator   TEXT,
+    language  TEXT,
+    chapters  INTEGER,
+    cover     TEXT,                 -- 封面图片的归档内路径
+    error     TEXT                  -- 无法读取时的错误信息
+) WITHOUT ROWID;
+'''
+FIELDS = ('name', 'size', 'mtime_ns', 'title', 'creator', 'language', 'chapters', 'cover', 'error')
+
+
+EOCD_SIGNATURE = b'PK\x05\x06'
+CENTRAL_SIGNATURE = b'PK\x01\x02'
+LOCAL_SIGNATURE = b'PK\x03\x04'
+TAIL_SIZE = 64 * 1024 + 22      # 目录结束记录加上最长的注释
+
+
+class _Fallback(Exception):
+    """快速路径无法处理，改用 EpubArchive"""
+
+
+def _central_directory(f):
+    f.seek(0, os.SEEK_END)
+    size = f.tell()
+    f.seek(max(0, size - TAIL_SIZE))
+    tail = f.read()
+    pos = tail.rfind(EOCD_SIGNATURE)
+    if pos < 0:
+        raise _Fallback()
+    cd_size, cd_offset = struct.unpack_from('<II', tail, pos + 12)
+    if cd_offset == 0xFFFFFFFF or cd_size == 0xFFFFFFFF:
+        raise _Fallback()   # zip64
+    f.seek(cd_offset)
+    directory = f.read(cd_size)
+    if len(directory) != cd_size:
+        raise _Fallback()
+    return directory
+
+
+def _read_entry(f, directory, name):
+    """在中央目录中找到 name 并读出解压后的内容"""
+    encoded = name.encode('utf-8')
+    pos = directory.find(encoded)
+    while pos >= 0:
+        header = pos - 46
+        if (header >= 0 and directory.startswith(CENTRAL_SIGNATURE, header)
+                and struct.unpack_from('<H', directory, header + 28)[0] == len(encoded)):
+            break
+        pos = directory.find(encoded, pos + 1)
+    else:
+        raise _Fallback()
+    flags, method = struct.unpack_from('<HH', directory, header + 8)
+    compressed_size, size = struct.unpack_from('<II', directory, header + 20)
+    offset = struct.unpack_from('<I', directory, header + 42)[0]
+    if flags & 0x01 or method not in (0, 8) or 0xFFFFFFFF in (compressed_size, size, offset):
+        raise _Fallback()
+    f.seek(offset)
+    local = f.read(30)
+    if not local.startswith(LOCAL_SIGNATURE):
+        raise _Fallback()
+    f.seek(sum(struct.unpack_from('<HH', local, 26)), os.SEEK_CUR)
+    data = f.read(compressed_size)
+    return zlib.decompress(data, -15) if method == 8 else data
+
+
+def _read_fast(path):
+    with open(path, 'rb') as f:
+        directory = _central_directory(f)
+        container = ET.fromstring(_read_entry(f, directory, 'META-INF/container.xml'))
+        rootfile = container.find('.//ns:rootfile', CONTAINER_NS)
+        if rootfile is None:
+            raise ValueError("container.xml 中找不到 rootfile")
+        opf_path = urllib.parse.unquote(rootfile.attrib['full-path'])
+        root = ET.fromstring(_read_entry(f, directory, opf_path))
+
+    title, creator, language, cover_id = parse_metadata(root)
+    types = {}
+    cover_href = None
+    for item in root.find('opf:manifest', OPF_NS).findall('opf:item', OPF_NS):
+        types[item.attrib['id']] = item.attrib.get('media-type', '')
+        if is_cover_item(item) or (cover_href is None and item.attrib['id'] == cover_id):
+            cover_href = item.attrib['href']
+    chapters = sum(1 for itemref in root.find('opf:spine', OPF_NS).findall('opf:itemref', OPF_NS)
+                   if types.get(itemref.attrib['idref']) in CHAPTER_TYPES)
+    cover = None
+    if cover_href is not None:
+        href = urllib.parse.unquote(cover_href.split('#', 1)[0])
+        cover = posixpath.normpath(posixpath.join(posixpath.dirname(opf_path), href))
+    return title or "Untitled", creator, language, chapters, cover
+
+
+def read_metadata(path):
+    """进程池任务：读取一本书的元数据，返回 (书名, 作者, 语言, 章节数, 封面, 错误)"""
+    try:
+        try:
+            return (*_read_fast(path), None)
+        except (_Fallback, zlib.error, struct.error):
+            with EpubArchive(path) as archive:
+                return (archive.title, archive.creator, archive.language,
+                        len(archive.spine_paths()), archive.cover, None)
+    except Exception as e:
+        return None, None, None, 0, None, f"{type(e).__name__}: {e}"
+
+
+def escape_like(text):
+    """LIKE 模式中按字面匹配 text（配合 ESCAPE '\\'）"""
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+class Catalog:
+    def __init__(self, library=DEFAULT_LIBRARY, db_path=None):
+        self.library = library
+        self.db_path = db_path or os.path.join(library, CATALOG_NAME)
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _scan(self):
+        books = {}
+        if os.path.isdir(self.library):
+            for entry in os.scandir(self.library):
+                if entry.is_file() and entry.name.lower().endswith('.epub'):
+                    st = entry.stat()
+                    books[entry.name] = (st.st_size, st.st_mtime_ns)
+        return books
+
+    def scan(self, workers=None, progress=None):
+        """更新目录，返回 (重新读取的书数, 删除的书数)
+
+        progress(已完成, 总数) 在每本书读取后调用；取消时已读取的书会保存。
+        """
+        current = self._scan()
+        cached = {name: (size, mtime_ns) for name, size, mtime_ns
+                  in self.conn.execute('SELECT name, size, mtime_ns FROM books')}
+        removed = [name for name in cached if name not in current]
+        changed = [name for name, stat in current.items() if cached.get(name) != stat]
+        with self.conn:
+            self.conn.executemany('DELETE FROM books WHERE name = ?', [(name,) for name in removed])
+
+        total = len(changed)
+        if progress is not None:
+            progress(0, total)
+        paths = [os.path.join(self.library, name) for name in changed]
+        rows = []
+        try:
+            if workers == 1 or total <= CHUNK_SIZE:
+                results = map(read_metadata, paths)
+                self._collect(changed, current, results, rows, progress)
+            else:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    results = pool.map(read_metadata, paths, chunksize=CHUNK_SIZE)
+                    try:
+                        self._collect(changed, current, results, rows, progress)
+                    except BaseException:
+                        pool.shutdown(wait=False, cancel_futures=True)
+                        raise
+        finally:
+            with self.conn:
+                self.conn.executemany(
+                    f'INSERT OR REPLACE INTO books VALUES ({", ".join("?" * len(FIELDS))})', rows)
+        return total, len(removed)
+
+    @staticmethod
+    def _collect(names, stats, results, rows, progress):
+        total = len(names)
+        for done, (name, metadata) in enumerate(zip(names, results), 1):
+            rows.append((name, *stats[name], *metadata))
+            if progress is not None:
+                progress(done, total)
+
+    def books(self, text=None):
+        """目录中的书（字典列表，按书名排序），text 不为空时只返回书名、作者或文件名包含它的书"""
+        query = f'SELECT {", ".join(FIELDS)} FROM books'
+        params = ()
+        if text:
+            # 文件名中常见的 _ 与 % 按字面匹配
+            query += (" WHERE title LIKE ?1 ESCAPE '\\' OR creator LIKE ?1 ESCAPE '\\'"
+                      " OR name LIKE ?1 ESCAPE '\\'")
+            params = (f'%{escape_like(text)}%',)
+        query += ' ORDER BY title, name'
+        return [dict(zip(FIELDS, row)) for row in self.conn.execute(query, params)]
+
+    def cover(self, name):
+        """读取封面图片数据，没有封面时返回 None"""
+        row = self.conn.execute('SELECT cover FROM books WHERE name = ?', (name,)).fetchone()
+        if row is None or not row[0]:
+            return None
+        with EpubArchive(os.path.join(self.library, name)) as archive:
+            return archive.read(row[0]) if archive.exists(row[0]) else None
@@ -0,0 +1,190 @@
+"""章节选择：在读取任何章节正文之前，从 spine 中挑出要处理的章节
+
+选择表达式由逗号（半角或全角）分隔的若干项组成，各项取并集，结果按
+阅读顺序排列：
+
+    3           第 3 章（从 1 开始，按 spine 中的 HTML 文档计数）
+    5-8 / 5~8   第 5 至 8 章；省略一端表示从头或到尾（"-3"、"100-"）
+    第*章       含 * ? [ ] 的项按通配符匹配章节标题
+    re:^第.+卷$ 正则表达式匹配（search）章节标题；re: 之后直到末尾都属于该正则
+    其他文本    与章节标题完全相同
+
+表达式中的标题优先取目录（nav.xhtml 或 NCX）中指向该文件的第一个条目；
+目录中没有的章节只解压文件开头、读出 <title> 为止。只用序号选择时不读取
+任何章节内容。
+
+HeadTitle（EpubToTextConverter.convert 的 target_titles 参数）不看目录，
+始终与章节文件中的 <title> 比较，即输出的 TXT 中每章标题行所用的标题；
+目录标签与 <title> 不同的书中，两种写法选中的章节可能不同。
+"""
+import fnmatch
+import html
+import re
+import zlib
+import xml.etree.ElementTree as ET
+
+from converter.epubarchive import read_navigation
+
+
+SEPARATORS = re.compile(r'[,，]')
+RANGE = re.compile(r'^(\d*)\s*[-~～]\s*(\d*)$')
+TITLE = re.compile(rb'<title[^>]*>(.*?)</title\s*>', re.S | re.I)
+HEAD_END = re.compile(rb'</head\s*>|<body[\s>]', re.I)
+HEAD_CHUNK = 4 * 1024
+HEAD_LIMIT = 64 * 1024      # <title> 之前的内容超过这个长度就放弃
+
+
+def _head_title(archive, path):
+    """只解压文件开头读取 <title>，找不到时返回空字符串"""
+    head = b''
+    with archive.open(path) as f:
+        while len(head) < HEAD_LIMIT:
+            chunk = f.read(HEAD_CHUNK)
+            if not chunk:
+                break
+            head += chunk
+            match = TITLE.search(head)
+            if match is not None:
+                return html.unescape(match.group(1).decode('utf-8', 'replace')).strip()
+            if HEAD_END.search(head):
+                break
+    return ''
+
+
+class SpineIndex:
+    """书中 HTML 章节的阅读顺序和标题，标题在第一次需要时才读取"""
+
+    def __init__(self, archive):
+        self.archive = archive
+        self.paths = archive.spine_paths(types=('application/xhtml+xml',))
+        self._titles = None
+        self._heads = {}        # {序号: 文件中的 <title>}
+
+    def __len__(self):
+        return len(self.paths)
+
+    def head_title(self, n):
+        """第 n 章文件中的 <title>，读不出时为空字符串"""
+        title = self._heads.get(n)
+        if title is None:
+            try:
+                title = _head_title(self.archive, self.paths[n])
+            except (KeyError, OSError, zlib.error):
+                title = ''
+            self._heads[n] = title
+        return title
+
+    def titles(self):
+        """各章在目录中的标题（目录中没有时为 <title>），与 paths 一一对应"""
+        if self._titles is None:
+            toc_titles = {}
+            try:
+                toc = read_navigation(self.archive) or []
+            except ET.ParseError:
+                toc = []        # 目录损坏时所有章节都从文件开头读取标题
+            stack = list(reversed(toc))
+            while stack:
+                title, target, children = stack.pop()
+                if target is not None and title:
+                    toc_titles.setdefault(target.partition('#')[0], title)
+                stack.extend(reversed(children))
+            self._titles = [toc_titles[path] if path in toc_titles else self.head_title(n)
+                            for n, path in enumerate(self.paths)]
+        return self._titles
+
+    def select(self, selection):
+        """按选择表达式返回章节序号（从 0 开始，按阅读顺序，不重复）
+
+        selection 可以是表达式字符串，也可以是各项组成的列表（列表中的
+        字符串不再按逗号拆分，整数为章节号）。序号超出范围时抛出 ValueError。
+        """
+        chosen = set()
+        for item in parse_selection(selection):
+            if isinstance(item, range):
+                if item.start >= len(self.paths):
+                    raise ValueError(f"章节序号超出范围: {item.start + 1}（共 {len(self.paths)} 章）")
+                chosen.update(range(item.start, min(item.stop, len(self.paths))))
+            elif isinstance(item, HeadTitle):
+                chosen.update(n for n in range(len(self.paths)) if item(self.head_title(n)))
+            else:
+                chosen.update(n for n, title in enumerate(self.titles()) if item(title))
+        return sorted(chosen)
+
+
+def _title_matcher(token):
+    if token.startswith('re:'):
+        try:
+            pattern = re.compile(token[3:])
+        except re.error as e:
+            raise ValueError(f"无效的正则表达式 {token[3:]!r}: {e}") from None
+        return lambda title: pattern.search(title) is not None
+    if any(ch in token for ch in '*?['):
+        pattern = re.compile(fnmatch.translate(token))
+        return lambda title: pattern.match(title) is not None
+    return title_equals(token)
+
+
+def title_equals(text):
+    """与 text 完全相同的标题"""
+    return lambda title: title == text
+
+
+class HeadTitle:
+    """选择章节文件中 <title> 与 text 完全相同的章节（不看目录）"""
+
+    def __init__(self, text):
+        self.text = text
+
+    def __call__(self, title):
+        return title == self.text
+
+
+def _parse_item(item):
+    """单个选择项 -> range（从 0 开始）或 标题匹配函数；已解析的项原样返回"""
+    if isinstance(item, range) or callable(item):
+        return item
+    if isinstance(item, int):
+        if item < 1:
+            raise ValueError(f"章节序号从 1 开始: {item}")
+        return range(item - 1, item)
+    token = item.strip()
+    if token.isdigit():
+        return _parse_item(int(token))
+    match = RANGE.match(token)
+    if match is not None and any(match.groups()):
+        start = int(match.group(1) or 1)
+        stop = int(match.group(2)) if match.group(2) else None
+        if start < 1 or (stop is not None and stop < start):
+            raise ValueError(f"无效的章节范围: {token}")
+        return range(start - 1, stop if stop is not None else 1 << 62)
+    return _title_matcher(token)
+
+
+def parse_selection(selection):
+    """把选择表达式解析为 range / 标题匹配函数 的列表"""
+    if isinstance(selection, (str, int)):
+        selection = [selection] if isinstance(selection, int) else _split(selection)
+    items = [item for item in selection if not isinstance(item, str) or item.strip()]
+    if not items:
+        raise ValueError("章节选择为空")
+    return [_parse_item(item) for item in items]
+
+
+def _split(text):
+    # re: 之后的全部内容属于正则，其中的逗号不作分隔
+    head, sep, pattern = text.partition('re:')
+    tokens = SEPARATORS.split(head)
+    if sep:
+        if tokens[-1].strip():
+            # "re:" 出现在某一项中间（如标题本身含有 re:），整段按普通文本处理
+            return SEPARATORS.split(text)
+        tokens[-1] = sep + pattern
+    return tokens
+
+
+def chapter_paths(archive, selection=None):
+    """按选择表达式返回章节的归档内路径，selection 为空时返回全部章节"""
+    index = SpineIndex(archive)
+    if selection is None or selection == '' or selection == []:
+        return list(index.paths)
+    return [index.paths[n] for n in index.select(selection)]
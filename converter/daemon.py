@@ -0,0 +1,344 @@
+"""后台转换守护进程：持久化任务队列 + 本机 HTTP 接口
+
+    python -m converter daemon --port 8765 --workers 2
+
+接口（只监听 127.0.0.1，请求与响应均为 JSON）:
+    POST   /jobs        {"type": "build", "params": {"framework": "...", "output": "..."}}
+    GET    /jobs        最近的任务列表，可带 ?status=queued|running|done|failed|cancelled
+    GET    /jobs/<id>   单个任务的状态、进度、结果或错误
+    DELETE /jobs/<id>   取消排队中或运行中的任务
+
+每个请求都必须带 X-EpubManager-Token 头，值为启动时打印的令牌（每次启动随机
+生成，也可用 --token 指定）；POST 的 Content-Type 必须是 application/json。
+带 Origin 头的请求（来自浏览器中的网页）和 Host 不是 127.0.0.1/localhost 的
+请求（DNS rebinding）一律拒绝，网页无法借用户的浏览器提交任务。
+
+任务类型与参数和 converter.jobs 中的函数一一对应。任务保存在 SQLite 中，
+守护进程重启后未完成的任务会重新排队。同一框架的任务串行执行，不同框架
+的任务在有限大小的工作线程池中并行执行；工作线程常驻，lxml、bs4 等模块
+只在启动时加载一次。
+"""
+import hmac
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+from converter import jobs
+from converter.catalog import CATALOG_NAME
+from converter.HTML2EPUB.GenerateEpubFramework import SHARED_DIR
+from converter.search import INDEX_NAME
+
+
+JOB_TYPES = {
+    'framework': jobs.create_framework,
+    'frameworks': jobs.create_frameworks,
+    'txt2html': jobs.txt_to_html,
+    'build': jobs.build_epub,
+    'epub2txt': jobs.epub_to_txt,
+    'edit': jobs.edit_epub,
+    'merge': jobs.merge_epubs,
+    'split': jobs.split_epub,
+    'search-index': jobs.update_search_index,
+    'catalog': jobs.scan_catalog
+}
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS jobs (
+    id        INTEGER PRIMARY KEY AUTOINCREMENT,
+    type      TEXT NOT NULL,
+    params    TEXT NOT NULL,
+    key       TEXT,               -- 串行化键（路径）的 JSON 列表，键有重叠的任务串行执行
+    status    TEXT NOT NULL,
+    done      INTEGER,
+    total     INTEGER,
+    result    TEXT,
+    error     TEXT,
+    created   REAL NOT NULL,
+    started   REAL,
+    finished  REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status, id);
+'''
+
+
+TOKEN_HEADER = 'X-EpubManager-Token'
+LOCAL_HOSTS = ('127.0.0.1', 'localhost')
+
+
+def job_keys(job_type, params):
+    """串行化键：写同一个框架目录或同一个输出文件的任务不能同时运行"""
+    if job_type == 'framework':
+        paths = [os.path.join(params.get('warehouse', jobs.DEFAULT_WAREHOUSE), params['name'])]
+    elif job_type == 'frameworks':
+        warehouse = params.get('warehouse', jobs.DEFAULT_WAREHOUSE)
+        paths = [os.path.join(warehouse, spec[0]) for spec in params['specs']]
+        if params.get('link_static'):
+            # 共享副本由 prepare_shared 原子替换
+            paths.append(os.path.join(warehouse, SHARED_DIR))
+    elif job_type == 'txt2html':
+        paths = [params['framework']]
+    elif job_type == 'build':
+        # 不同框架打包到同一个输出时共用 <输出>.tmp
+        paths = [params['framework'], params['output']]
+    elif job_type == 'edit':
+        paths = [params.get('output') or params['epub_path']]
+    elif job_type == 'epub2txt':
+        paths = [params['output']]
+    elif job_type == 'merge':
+        paths = [params['output']]
+    elif job_type == 'split':
+        paths = [params['output_dir']]
+    elif job_type == 'search-index':
+        paths = [os.path.join(params['library'], INDEX_NAME)]
+    elif job_type == 'catalog':
+        paths = [os.path.join(params['library'], CATALOG_NAME)]
+    else:
+        return []
+    return [os.path.normcase(os.path.abspath(path)) for path in paths]
+
+
+def _row_keys(key):
+    if key is None:
+        return []
+    if key.startswith('['):
+        return json.loads(key)
+    return [key]    # 旧版本数据库中的单个路径
+
+
+def preload():
+    """预先加载转换模块及其依赖，避免每个任务重复付出导入开销"""
+    import converter.txt2html2
+    import converter.html2txt
+    import converter.HTML2EPUB.GenerateEPUB
+    import converter.HTML2EPUB.GenerateEpubFramework
+    for name in ('lxml.etree', 'bs4'):
+        try:
+            __import__(name)
+        except ImportError:
+            pass
+
+
+class JobQueue:
+    def __init__(self, db_path, workers=2):
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+        # 上次退出时仍在运行的任务重新排队
+        self.conn.execute("UPDATE jobs SET status = 'queued', started = NULL "
+                          "WHERE status = 'running'")
+        self.conn.commit()
+        self.lock = threading.Condition()
+        self.busy_keys = set()
+        self.progress = {}
+        self.cancelled = set()
+        self.stopping = False
+        self.threads = [threading.Thread(target=self._worker, daemon=True)
+                        for _ in range(workers)]
+
+    def start(self):
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        with self.lock:
+            self.stopping = True
+            self.lock.notify_all()
+
+    def submit(self, job_type, params):
+        if job_type not in JOB_TYPES:
+            raise ValueError(f"未知的任务类型: {job_type}")
+        keys = job_keys(job_type, params)
+        key = json.dumps(keys, ensure_ascii=False) if keys else None
+        with self.lock:
+            cur = self.conn.execute(
+                "INSERT INTO jobs (type, params, key, status, created) VALUES (?, ?, ?, 'queued', ?)",
+                (job_type, json.dumps(params, ensure_ascii=False), key, time.time()))
+            self.conn.commit()
+            self.lock.notify()
+            return cur.lastrowid
+
+    def cancel(self, job_id):
+        with self.lock:
+            row = self.conn.execute('SELECT status FROM jobs WHERE id = ?', (job_id,)).fetchone()
+            if row is None:
+                return False
+            if row['status'] == 'queued':
+                self.conn.execute("UPDATE jobs SET status = 'cancelled', finished = ? WHERE id = ?",
+                                  (time.time(), job_id))
+                self.conn.commit()
+            elif row['status'] == 'running':
+                self.cancelled.add(job_id)
+            return True
+
+    def _row(self, row):
+        job = dict(row)
+        job['params'] = json.loads(job['params'])
+        if job['id'] in self.progress:
+            job['done'], job['total'] = self.progress[job['id']]
+        return job
+
+    def get(self, job_id):
+        with self.lock:
+            row = self.conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+            return self._row(row) if row is not None else None
+
+    def list(self, status=None, limit=100):
+        with self.lock:
+            if status:
+                rows = self.conn.execute('SELECT * FROM jobs WHERE status = ? ORDER BY id DESC LIMIT ?',
+                                         (status, limit))
+            else:
+                rows = self.conn.execute('SELECT * FROM jobs ORDER BY id DESC LIMIT ?', (limit,))
+            return [self._row(row) for row in rows]
+
+    def _claim(self):
+        """取出最早的、其串行化键都空闲的排队任务；没有时等待"""
+        with self.lock:
+            while not self.stopping:
+                for row in self.conn.execute("SELECT * FROM jobs WHERE status = 'queued' ORDER BY id"):
+                    keys = _row_keys(row['key'])
+                    if self.busy_keys.isdisjoint(keys):
+                        self.busy_keys.update(keys)
+                        self.conn.execute("UPDATE jobs SET status = 'running', started = ? WHERE id = ?",
+                                          (time.time(), row['id']))
+                        self.conn.commit()
+                        return dict(row)
+                self.lock.wait()
+            return None
+
+    def _finish(self, job, status, result=None, error=None):
+        with self.lock:
+            done, total = self.progress.pop(job['id'], (None, None))
+            self.cancelled.discard(job['id'])
+            self.conn.execute(
+                'UPDATE jobs SET status = ?, result = ?, error = ?, done = ?, total = ?, finished = ? '
+                'WHERE id = ?',
+                (status, result, error, done, total, time.time(), job['id']))
+            self.conn.commit()
+            self.busy_keys.difference_update(_row_keys(job['key']))
+            self.lock.notify_all()
+
+    def _worker(self):
+        while True:
+            job = self._claim()
+            if job is None:
+                return
+            job_id = job['id']
+
+            def progress(done, total):
+                # 进度只保存在内存中，任务结束时才写入数据库
+                self.progress[job_id] = (done, total)
+                if job_id in self.cancelled:
+                    raise jobs.Cancelled()
+
+            try:
+                result = JOB_TYPES[job['type']](progress=progress, **json.loads(job['params']))
+            except jobs.Cancelled:
+                self._finish(job, 'cancelled')
+            except Exception as e:
+                self._finish(job, 'failed', error=f"{type(e).__name__}: {e}")
+            else:
+                self._finish(job, 'done', result=None if result is None else str(result))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    queue = None
+    token = None
+
+    def _send(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _job_id(self, path):
+        parts = path.strip('/').split('/')
+        if len(parts) == 2 and parts[0] == 'jobs' and parts[1].isdigit():
+            return int(parts[1])
+        return None
+
+    def _authorized(self):
+        """拒绝来自网页的请求、非本机 Host 和令牌不符的请求；拒绝时已发送响应"""
+        host = self.headers.get('Host', '')
+        hostname = urlsplit(f'//{host}').hostname if host else None
+        if self.headers.get('Origin') is not None or hostname not in LOCAL_HOSTS:
+            self._send(403, {'error': '只接受本机命令行客户端的请求'})
+            return False
+        token = self.headers.get(TOKEN_HEADER, '')
+        if not hmac.compare_digest(token.encode('utf-8'), self.token.encode('utf-8')):
+            self._send(401, {'error': f'缺少或错误的 {TOKEN_HEADER}'})
+            return False
+        return True
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        url = urlsplit(self.path)
+        if url.path.rstrip('/') == '/jobs':
+            status = parse_qs(url.query).get('status', [None])[0]
+            self._send(200, self.queue.list(status))
+            return
+        job_id = self._job_id(url.path)
+        job = self.queue.get(job_id) if job_id is not None else None
+        if job is None:
+            self._send(404, {'error': '任务不存在'})
+        else:
+            self._send(200, job)
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        content_type = self.headers.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type != 'application/json':
+            self._send(415, {'error': 'Content-Type 必须是 application/json'})
+            return
+        if urlsplit(self.path).path.rstrip('/') != '/jobs':
+            self._send(404, {'error': '未知的接口'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length) or b'{}')
+            job_id = self.queue.submit(request['type'], request.get('params', {}))
+        except (ValueError, KeyError, TypeError) as e:
+            self._send(400, {'error': str(e)})
+            return
+        self._send(201, {'id': job_id})
+
+    def do_DELETE(self):
+        if not self._authorized():
+            return
+        job_id = self._job_id(urlsplit(self.path).path)
+        if job_id is None or not self.queue.cancel(job_id):
+            self._send(404, {'error': '任务不存在'})
+        else:
+            self._send(200, self.queue.get(job_id))
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port=8765, workers=2, db_path='epubmanager-jobs.sqlite', token=None):
+    """启动守护进程并阻塞，直到 Ctrl+C；token 为空时随机生成"""
+    if not token:
+        token = secrets.token_urlsafe(24)
+    preload()
+    queue = JobQueue(db_path, workers)
+    queue.start()
+    handler = type('Handler', (_Handler,), {'queue': queue, 'token': token})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    print(f"守护进程已启动: http://127.0.0.1:{server.server_address[1]}/jobs")
+    print(f"请求头: {TOKEN_HEADER}: {token}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        queue.stop()
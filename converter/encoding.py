@@ -0,0 +1,98 @@
+"""文本文件编码检测，编辑器与 TXT 转换共用
+
+依次尝试：
+1. BOM（utf-8-sig / utf-16 / utf-32）
+2. 严格 UTF-8 校验整个文件（分块增量解码，绝大多数手稿到此结束）
+3. chardet 的 UniversalDetector，输入从文件头、中间到末尾均匀抽取的样本块，
+   而不只是开头——很多 GBK 小说的前 1KB 全是 ASCII
+
+GB2312/GBK 统一按其超集 GB18030 解码。结果按 (路径, 大小, 修改时间) 缓存。
+"""
+import codecs
+import os
+from functools import lru_cache
+
+
+CHUNK_SIZE = 1024 * 1024
+SAMPLE_SIZE = 64 * 1024
+SAMPLE_COUNT = 16
+FALLBACK_ENCODING = 'gb18030'
+
+BOMS = (
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+
+# chardet 的结果映射到能正确解码的 Python 编码名
+ALIASES = {
+    'gb2312': 'gb18030',
+    'gbk': 'gb18030',
+    'ascii': 'utf-8',
+    'utf-8': 'utf-8',
+    'big5': 'big5hkscs',
+}
+
+
+def _is_utf8(f):
+    decoder = codecs.getincrementaldecoder('utf-8')('strict')
+    try:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                decoder.decode(b'', final=True)
+                return True
+            decoder.decode(chunk)
+    except UnicodeDecodeError:
+        return False
+
+
+def _sample_offsets(size):
+    if size <= SAMPLE_SIZE * SAMPLE_COUNT:
+        return range(0, size, SAMPLE_SIZE)
+    step = (size - SAMPLE_SIZE) // (SAMPLE_COUNT - 1)
+    return [n * step for n in range(SAMPLE_COUNT)]
+
+
+def _statistical(f, size):
+    try:
+        from chardet.universaldetector import UniversalDetector
+    except ImportError:
+        return FALLBACK_ENCODING
+    detector = UniversalDetector()
+    for offset in _sample_offsets(size):
+        f.seek(offset)
+        sample = f.read(SAMPLE_SIZE)
+        if offset:
+            # 从下一行开始，避免样本以半个多字节字符开头让多字节探测器出错
+            sample = sample[sample.find(b'\n') + 1:]
+        detector.feed(sample)
+        if detector.done:
+            break
+    detector.close()
+    encoding = (detector.result.get('encoding') or '').lower()
+    if not encoding:
+        return FALLBACK_ENCODING
+    return ALIASES.get(encoding, encoding)
+
+
+@lru_cache(maxsize=256)
+def _detect(path, size, mtime_ns):
+    with open(path, 'rb') as f:
+        head = f.read(4)
+        for bom, encoding in BOMS:
+            if head.startswith(bom):
+                return encoding
+        f.seek(0)
+        if _is_utf8(f):
+            return 'utf-8'
+        return _statistical(f, size)
+
+
+def detect_encoding(path):
+    """返回适合用 open(path, encoding=...) 读取该文件的编码名"""
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    return _detect(path, st.st_size, st.st_mtime_ns)
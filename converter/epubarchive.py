@@ -0,0 +1,277 @@
+import posixpath
+import struct
+import zipfile
+import urllib.parse
+import xml.etree.ElementTree as ET
+
+
+CONTAINER_NS = {'ns': 'urn:oasis:names:tc:opendocument:xmlns:container'}
+OPF_NS = {
+    'opf': 'http://www.idpf.org/2007/opf',
+    'dc': 'http://purl.org/dc/elements/1.1/'
+}
+CHAPTER_TYPES = ('application/xhtml+xml', 'text/html')
+XHTML_NS = {'xhtml': 'http://www.w3.org/1999/xhtml'}
+NCX_NS = {'ncx': 'http://www.daisy.org/z3986/2005/ncx/'}
+EPUB_TYPE = '{http://www.idpf.org/2007/ops}type'
+NCX_TYPE = 'application/x-dtbncx+xml'
+
+
+def parse_metadata(root):
+    """OPF 根元素中的 (书名, 作者, 语言, 封面条目 id)；封面 id 来自 EPUB 2 的 meta"""
+    title = creator = language = cover_id = None
+    metadata = root.find('opf:metadata', OPF_NS)
+    if metadata is not None:
+        title_elem = metadata.find('dc:title', OPF_NS)
+        if title_elem is not None:
+            title = title_elem.text
+        creator_elem = metadata.find('dc:creator', OPF_NS)
+        if creator_elem is not None:
+            creator = creator_elem.text
+        language_elem = metadata.find('dc:language', OPF_NS)
+        if language_elem is not None:
+            language = language_elem.text
+        # EPUB 2：<meta name="cover" content="封面条目 id"/>
+        for meta in metadata.findall('opf:meta', OPF_NS):
+            if meta.attrib.get('name') == 'cover':
+                cover_id = meta.attrib.get('content')
+    return title, creator, language, cover_id
+
+
+def is_cover_item(item):
+    """EPUB 3：properties 含 cover-image 的 manifest 条目"""
+    return 'cover-image' in item.attrib.get('properties', '').split()
+
+
+# 导航文件中的目录是 [(标题, 目标, 子目录)] 的树，目标为归档内路径（可带 #片段），
+# 没有链接的分组标题目标为 None。
+
+def _target(archive, href, base_dir):
+    path, sep, fragment = href.partition('#')
+    return archive.resolve(path, base_dir) + sep + fragment
+
+
+def _nav_list(archive, ol, base_dir):
+    toc = []
+    for li in ol.findall('xhtml:li', XHTML_NS):
+        label = li.find('xhtml:a', XHTML_NS)
+        if label is None:
+            label = li.find('xhtml:span', XHTML_NS)
+        title = ''.join(label.itertext()).strip() if label is not None else ''
+        href = label.get('href') if label is not None else None
+        sub = li.find('xhtml:ol', XHTML_NS)
+        toc.append((title, _target(archive, href, base_dir) if href else None,
+                    _nav_list(archive, sub, base_dir) if sub is not None else []))
+    return toc
+
+
+def _ncx_points(archive, parent, base_dir):
+    toc = []
+    for point in parent.findall('ncx:navPoint', NCX_NS):
+        text = point.find('ncx:navLabel/ncx:text', NCX_NS)
+        content = point.find('ncx:content', NCX_NS)
+        src = content.get('src') if content is not None else None
+        toc.append(((text.text or '').strip() if text is not None else '',
+                    _target(archive, src, base_dir) if src else None,
+                    _ncx_points(archive, point, base_dir)))
+    return toc
+
+
+def navigation_ids(archive):
+    """书中导航文件（nav.xhtml、NCX）的 manifest id，合并/拆分时由新生成的替代"""
+    return {item_id for item_id, item in archive.manifest.items()
+            if 'nav' in item['properties'].split() or item['type'] == NCX_TYPE
+            or item_id == archive.toc_id}
+
+
+def read_navigation(archive):
+    """读取 EPUB 3 导航文件或 NCX 中的目录，书中两者都没有时返回 None"""
+    for item_id in navigation_ids(archive):
+        item = archive.manifest[item_id]
+        if 'nav' not in item['properties'].split() or not archive.exists(item['path']):
+            continue
+        root = ET.fromstring(archive.read(item['path']))
+        for nav in root.iter('{%s}nav' % XHTML_NS['xhtml']):
+            if 'toc' in nav.get(EPUB_TYPE, '').split():
+                ol = nav.find('xhtml:ol', XHTML_NS)
+                if ol is not None:
+                    return _nav_list(archive, ol, posixpath.dirname(item['path']))
+    for item_id in navigation_ids(archive):
+        item = archive.manifest[item_id]
+        if item['type'] == NCX_TYPE and archive.exists(item['path']):
+            nav_map = ET.fromstring(archive.read(item['path'])).find('ncx:navMap', NCX_NS)
+            if nav_map is not None:
+                return _ncx_points(archive, nav_map, posixpath.dirname(item['path']))
+    return None
+
+
+class EpubArchive:
+    """直接基于 zip 中央目录读取 EPUB，不解压到磁盘
+
+    container.xml 和 OPF 在打开时解析，其余条目在 read() 时才解压。
+    所有路径均为归档内的 posix 路径（如 OEBPS/text/chapter1.xhtml）。
+    """
+
+    def __init__(self, epub_path):
+        self.epub_path = epub_path
+        self.zip = zipfile.ZipFile(epub_path, 'r')
+        self.opf_path = None
+        self.opf_dir = ''
+        self.title = "Untitled"
+        self.creator = None
+        self.language = None
+        self.cover = None       # 封面图片的归档内路径
+        self.manifest = {}
+        self.spine = []
+        self.nonlinear = set()  # linear="no" 的 spine 条目 id
+        self.toc_id = None      # spine 的 toc 属性（EPUB 2 的 NCX 条目 id）
+        self._types = {}
+
+        try:
+            self._parse_container()
+            self._parse_opf()
+        except Exception:
+            self.zip.close()
+            raise
+
+    def _parse_container(self):
+        """解析 container.xml 获取 OPF 路径"""
+        root = ET.fromstring(self.zip.read('META-INF/container.xml'))
+        rootfile = root.find('.//ns:rootfile', CONTAINER_NS)
+        if rootfile is None:
+            raise ValueError("container.xml 中找不到 rootfile")
+        self.opf_path = urllib.parse.unquote(rootfile.attrib['full-path'])
+        self.opf_dir = posixpath.dirname(self.opf_path)
+
+    def _parse_opf(self):
+        """解析 OPF 的 metadata / manifest / spine"""
+        root = ET.fromstring(self.zip.read(self.opf_path))
+
+        title, self.creator, self.language, cover_id = parse_metadata(root)
+        if title:
+            self.title = title
+
+        manifest = root.find('opf:manifest', OPF_NS)
+        for item in manifest.findall('opf:item', OPF_NS):
+            path = self.resolve(item.attrib['href'])
+            media_type = item.attrib.get('media-type', '')
+            self.manifest[item.attrib['id']] = {
+                'path': path,
+                'type': media_type,
+                'properties': item.attrib.get('properties', ''),
+                'fallback': item.attrib.get('fallback')
+            }
+            self._types[path] = media_type
+            if is_cover_item(item):
+                self.cover = path
+        if self.cover is None and cover_id in self.manifest:
+            self.cover = self.manifest[cover_id]['path']
+
+        spine = root.find('opf:spine', OPF_NS)
+        self.toc_id = spine.attrib.get('toc')
+        for itemref in spine.findall('opf:itemref', OPF_NS):
+            self.spine.append(itemref.attrib['idref'])
+            if itemref.attrib.get('linear') == 'no':
+                self.nonlinear.add(itemref.attrib['idref'])
+
+    def resolve(self, href, base_dir=None):
+        """把相对 href 转换为归档内路径"""
+        if base_dir is None:
+            base_dir = self.opf_dir
+        href = href.split('#', 1)[0]
+        if href and base_dir and '%' not in href:
+            # 最常见的 "text/c001.xhtml"：已是规范路径时不必解码和规范化（上万章的书逐条调用）
+            path = f'{base_dir}/{href}'
+            if path[0] != '/' and path[-1] != '/' and '/.' not in '/' + path and '//' not in path:
+                return path
+        href = urllib.parse.unquote(href)
+        return posixpath.normpath(posixpath.join(base_dir, href))
+
+    def spine_paths(self, types=CHAPTER_TYPES):
+        """按阅读顺序返回指定类型的 spine 条目路径"""
+        paths = []
+        for item_id in self.spine:
+            item = self.manifest.get(item_id)
+            if item and item['type'] in types:
+                paths.append(item['path'])
+        return paths
+
+    def media_type(self, name):
+        return self._types.get(name)
+
+    def exists(self, name):
+        try:
+            self.zip.getinfo(name)
+        except KeyError:
+            return False
+        return True
+
+    def read(self, name):
+        return self.zip.read(name)
+
+    def open(self, name):
+        return self.zip.open(name)
+
+    def close(self):
+        self.zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# zipfile 没有公开"原样复制已压缩条目"的接口，下面两个函数直接读写
+# 本地文件头，配合 ZipFile 的内部状态完成条目级别的原始拷贝。
+_MASK_ENCRYPTED = 0x01
+_MASK_COMPRESS_OPTION_1 = 0x02
+
+
+def clone_info(info, arcname=None):
+    """复制条目元信息（不含 extra 字段），可选重命名"""
+    zinfo = zipfile.ZipInfo(arcname or info.filename, info.date_time)
+    zinfo.compress_type = info.compress_type
+    zinfo.flag_bits = info.flag_bits & _MASK_COMPRESS_OPTION_1
+    zinfo.CRC = info.CRC
+    zinfo.file_size = info.file_size
+    zinfo.compress_size = info.compress_size
+    zinfo.external_attr = info.external_attr
+    return zinfo
+
+
+def read_raw_entry(zf, info):
+    """读取条目的原始（仍处于压缩状态的）数据"""
+    if info.flag_bits & _MASK_ENCRYPTED:
+        raise ValueError(f"不支持加密条目: {info.filename}")
+    fp = zf.fp
+    fp.seek(info.header_offset)
+    header = fp.read(zipfile.sizeFileHeader)
+    if len(header) != zipfile.sizeFileHeader or header[:4] != zipfile.stringFileHeader:
+        raise zipfile.BadZipFile(f"本地文件头损坏: {info.filename}")
+    name_len, extra_len = struct.unpack('<HH', header[26:30])
+    fp.seek(name_len + extra_len, 1)
+    return fp.read(info.compress_size)
+
+
+def write_raw_entry(zout, zinfo, data):
+    """把已压缩的数据写入 zout，zinfo 中的 CRC 与大小必须已经正确"""
+    if zout._writing:
+        raise ValueError("ZipFile 正在写入其他条目")
+    zip64 = (zinfo.file_size > zipfile.ZIP64_LIMIT or
+             zinfo.compress_size > zipfile.ZIP64_LIMIT)
+    if zout._seekable:
+        zout.fp.seek(zout.start_dir)
+    zinfo.header_offset = zout.fp.tell()
+    zout._writecheck(zinfo)
+    zout._didModify = True
+    zout.fp.write(zinfo.FileHeader(zip64))
+    zout.fp.write(data)
+    zout.start_dir = zout.fp.tell()
+    zout.filelist.append(zinfo)
+    zout.NameToInfo[zinfo.filename] = zinfo
+
+
+def copy_raw_entry(src, zout, info, arcname=None):
+    """不解压、不重新压缩，把 src 中的条目复制到 zout"""
+    write_raw_entry(zout, clone_info(info, arcname), read_raw_entry(src, info))
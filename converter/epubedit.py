@@ -0,0 +1,390 @@
+"""直接修改已有的 EPUB：追加章节、修改书名/作者、删除章节或封面
+
+只重新生成 package.opf、导航文件（nav.xhtml / toc.ncx）和新增的条目，其余
+条目从原归档中原样复制（不解压、不重新压缩），写入输出目录下的临时文件
+后原子替换。修改一个元数据字段的计算量约等于解析并写回一次 OPF，其余只
+是一次顺序拷贝。
+
+    with EpubEditor('书名.epub') as editor:
+        editor.set_metadata(title='新书名')
+        editor.remove_chapter(3)
+        editor.save()
+"""
+import os
+import posixpath
+import time
+import zipfile
+
+from lxml import etree
+
+from converter.epubarchive import (EpubArchive, OPF_NS, CHAPTER_TYPES, NCX_TYPE, is_cover_item,
+                                   copy_raw_entry)
+from converter.epubpack import write_data
+
+
+XHTML_NS = 'http://www.w3.org/1999/xhtml'
+OPS_NS = 'http://www.idpf.org/2007/ops'
+NCX_NS = 'http://www.daisy.org/z3986/2005/ncx/'
+MODIFIED = 'dcterms:modified'
+
+
+def _q(namespace, tag):
+    return f'{{{namespace}}}{tag}'
+
+
+def parse(data):
+    """用 lxml 解析 OPF/导航文件，写回时保留原有的命名空间前缀、注释和 DOCTYPE"""
+    return etree.fromstring(data, etree.XMLParser(huge_tree=True, resolve_entities=False))
+
+
+def serialize(root):
+    return etree.tostring(root.getroottree(), xml_declaration=True, encoding='utf-8')
+
+
+def append_child(parent, tag, attrib=None):
+    """追加子元素并沿用兄弟元素的缩进"""
+    elem = etree.Element(tag, attrib or {})
+    if len(parent):
+        last = parent[-1]
+        elem.tail = last.tail
+        last.tail = parent.text
+    parent.append(elem)
+    return elem
+
+
+def remove_child(parent, elem):
+    """删除子元素；删除的是最后一个子元素时把它的尾部空白交给前一个，保持缩进"""
+    if elem.getnext() is None:
+        previous = elem.getprevious()
+        if previous is not None:
+            previous.tail = elem.tail
+    parent.remove(elem)
+
+
+class EpubEditor:
+    """在已有 EPUB 上累积修改，save() 时一次写出
+
+    章节用 spine 中的序号（从 0 开始，只计 XHTML/HTML 文档）或归档内路径指定。
+    """
+
+    def __init__(self, epub_path):
+        self.archive = EpubArchive(epub_path)
+        try:
+            self.opf_path = self.archive.opf_path
+            self.opf = parse(self.archive.read(self.opf_path))
+        except Exception:
+            self.archive.close()
+            raise
+        self.metadata = self.opf.find('opf:metadata', OPF_NS)
+        self.manifest = self.opf.find('opf:manifest', OPF_NS)
+        self.spine = self.opf.find('opf:spine', OPF_NS)
+        self._documents = {}    # 已解析的导航文件 {路径: 根元素}
+        self._dirty = set()     # 需要重新生成的条目
+        self._removed = set()
+        self._added = {}        # 新增条目 {路径: 数据}，按追加顺序写出
+
+        toc_id = self.spine.get('toc')
+        self.nav_path = self._find_path(
+            lambda item: 'nav' in item.get('properties', '').split())
+        self.ncx_path = self._find_path(
+            lambda item: item.get('id') == toc_id or item.get('media-type') == NCX_TYPE)
+
+    def close(self):
+        self.archive.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---- manifest / spine ----
+
+    def _path(self, item):
+        return self.archive.resolve(item.get('href', ''))
+
+    def _find_path(self, predicate):
+        for item in self.manifest.findall('opf:item', OPF_NS):
+            if predicate(item):
+                return self._path(item)
+        return None
+
+    def _item(self, path):
+        for item in self.manifest.findall('opf:item', OPF_NS):
+            if self._path(item) == path:
+                return item
+        return None
+
+    def _href(self, path, base_dir):
+        return posixpath.relpath(path, base_dir or '.')
+
+    def _unique_id(self, stem):
+        ids = {item.get('id') for item in self.manifest.findall('opf:item', OPF_NS)}
+        n = len(ids) + 1
+        while f'{stem}{n}' in ids:
+            n += 1
+        return f'{stem}{n}'
+
+    def chapters(self):
+        """当前 spine 中按阅读顺序排列的章节路径"""
+        items = {item.get('id'): item for item in self.manifest.findall('opf:item', OPF_NS)}
+        paths = []
+        for itemref in self.spine.findall('opf:itemref', OPF_NS):
+            item = items.get(itemref.get('idref'))
+            if item is not None and item.get('media-type') in CHAPTER_TYPES:
+                paths.append(self._path(item))
+        return paths
+
+    def _resolve_chapter(self, ref):
+        chapters = self.chapters()
+        if isinstance(ref, int):
+            if not 0 <= ref < len(chapters):
+                raise ValueError(f"章节序号超出范围: {ref}（共 {len(chapters)} 章）")
+            return chapters[ref]
+        if ref not in chapters:
+            raise ValueError(f"spine 中没有该章节: {ref}")
+        return ref
+
+    # ---- 修改 ----
+
+    def set_metadata(self, title=None, creator=None):
+        """修改 dc:title / dc:creator，为 None 的字段保持不变"""
+        for tag, value in (('title', title), ('creator', creator)):
+            if value is None:
+                continue
+            elem = self.metadata.find(f'dc:{tag}', OPF_NS)
+            if elem is None:
+                elem = append_child(self.metadata, _q(OPF_NS['dc'], tag))
+            elem.text = value
+            self._dirty.add(self.opf_path)
+
+    def append_chapter(self, title, content, filename=None):
+        """在 spine 末尾追加一章并加入目录，返回其归档内路径
+
+        content 为完整的 XHTML 文档；章节放在最后一章所在的目录中，
+        filename 为空或重名时自动命名。
+        """
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        chapters = self.chapters()
+        base = posixpath.dirname(chapters[-1]) if chapters else \
+            posixpath.join(self.archive.opf_dir, 'text')
+        taken = set(self.archive.zip.namelist()) | set(self._added)
+        stem, ext = posixpath.splitext(filename or f'chapter{len(chapters) + 1}.xhtml')
+        path = posixpath.join(base, stem + ext)
+        n = 1
+        while path in taken:
+            n += 1
+            path = posixpath.join(base, f'{stem}_{n}{ext}')
+
+        item_id = self._unique_id('chapter')
+        append_child(self.manifest, _q(OPF_NS['opf'], 'item'), {
+            'id': item_id,
+            'href': self._href(path, self.archive.opf_dir),
+            'media-type': 'application/xhtml+xml'
+        })
+        append_child(self.spine, _q(OPF_NS['opf'], 'itemref'), {'idref': item_id})
+        self._added[path] = content
+        self._dirty.add(self.opf_path)
+        self._nav_append(path, title)
+        return path
+
+    def remove_chapter(self, ref):
+        """从 manifest、spine、目录中删除一章并删除其条目，返回其路径"""
+        path = self._resolve_chapter(ref)
+        if path == self.nav_path:
+            raise ValueError("不能删除导航文件")
+        self._remove_item(path)
+        return path
+
+    def remove_cover(self):
+        """删除封面图片及封面页（guide / landmarks 中标为 cover 的文档），返回删除的路径"""
+        cover_id = None
+        for meta in self.metadata.findall('opf:meta', OPF_NS):
+            if meta.get('name') == 'cover':
+                cover_id = meta.get('content')
+                remove_child(self.metadata, meta)
+                self._dirty.add(self.opf_path)
+        targets = [self._path(item) for item in self.manifest.findall('opf:item', OPF_NS)
+                   if is_cover_item(item) or item.get('id') == cover_id]
+
+        guide = self.opf.find('opf:guide', OPF_NS)
+        if guide is not None:
+            targets += [self.archive.resolve(ref.get('href', ''))
+                        for ref in guide.findall('opf:reference', OPF_NS)
+                        if ref.get('type') == 'cover']
+        if self.nav_path:
+            root = self._document(self.nav_path)
+            base = posixpath.dirname(self.nav_path)
+            targets += [self.archive.resolve(a.get('href', ''), base)
+                        for a in root.iter(_q(XHTML_NS, 'a'))
+                        if 'cover' in a.get(_q(OPS_NS, 'type'), '').split()]
+
+        removed = []
+        for path in targets:
+            if path not in removed and path != self.nav_path and self._item(path) is not None:
+                self._remove_item(path)
+                removed.append(path)
+        if not removed:
+            raise ValueError("这本书没有封面")
+        return removed
+
+    def _remove_item(self, path):
+        item = self._item(path)
+        if item is not None:
+            item_id = item.get('id')
+            remove_child(self.manifest, item)
+            for itemref in self.spine.findall('opf:itemref', OPF_NS):
+                if itemref.get('idref') == item_id:
+                    remove_child(self.spine, itemref)
+            # EPUB 3 中修饰该条目的 <meta refines="#id">
+            for meta in self.metadata.findall('opf:meta', OPF_NS):
+                if meta.get('refines') == f'#{item_id}':
+                    remove_child(self.metadata, meta)
+        guide = self.opf.find('opf:guide', OPF_NS)
+        if guide is not None:
+            for ref in guide.findall('opf:reference', OPF_NS):
+                if self.archive.resolve(ref.get('href', '')) == path:
+                    remove_child(guide, ref)
+            if not len(guide):     # 空的 <guide> 不合规范
+                remove_child(self.opf, guide)
+        self._nav_remove(path)
+        self._added.pop(path, None)
+        self._removed.add(path)
+        self._dirty.add(self.opf_path)
+
+    # ---- 导航文件 ----
+
+    def _document(self, path):
+        if path not in self._documents:
+            self._documents[path] = parse(self.archive.read(path))
+        return self._documents[path]
+
+    def _nav_append(self, path, title):
+        if self.nav_path:
+            root = self._document(self.nav_path)
+            for nav in root.iter(_q(XHTML_NS, 'nav')):
+                if 'toc' in nav.get(_q(OPS_NS, 'type'), '').split():
+                    ol = nav.find(_q(XHTML_NS, 'ol'))
+                    if ol is None:
+                        ol = append_child(nav, _q(XHTML_NS, 'ol'))
+                    li = append_child(ol, _q(XHTML_NS, 'li'))
+                    a = etree.SubElement(li, _q(XHTML_NS, 'a'), {
+                        'href': self._href(path, posixpath.dirname(self.nav_path))
+                    })
+                    a.text = title
+                    self._dirty.add(self.nav_path)
+                    break
+        if self.ncx_path:
+            root = self._document(self.ncx_path)
+            nav_map = root.find(_q(NCX_NS, 'navMap'))
+            if nav_map is not None:
+                ids = {point.get('id') for point in root.iter(_q(NCX_NS, 'navPoint'))}
+                n = len(ids) + 1
+                while f'navPoint-{n}' in ids:
+                    n += 1
+                point = append_child(nav_map, _q(NCX_NS, 'navPoint'),
+                                     {'id': f'navPoint-{n}', 'playOrder': '0'})
+                label = etree.SubElement(point, _q(NCX_NS, 'navLabel'))
+                etree.SubElement(label, _q(NCX_NS, 'text')).text = title
+                etree.SubElement(point, _q(NCX_NS, 'content'), {
+                    'src': self._href(path, posixpath.dirname(self.ncx_path))
+                })
+                self._renumber_ncx(root)
+                self._dirty.add(self.ncx_path)
+
+    def _nav_remove(self, path):
+        """删除目录中指向 path 的链接；带子目录的条目只去掉链接，保留子目录"""
+        if self.nav_path and self.nav_path != path:
+            root = self._document(self.nav_path)
+            base = posixpath.dirname(self.nav_path)
+            parents = {child: parent for parent in root.iter() for child in parent}
+            for a in list(root.iter(_q(XHTML_NS, 'a'))):
+                href = a.get('href')
+                if not href or self.archive.resolve(href, base) != path:
+                    continue
+                li = parents.get(a)
+                if li is not None and li.tag == _q(XHTML_NS, 'li') and \
+                        li.find(_q(XHTML_NS, 'ol')) is None:
+                    remove_child(parents[li], li)
+                else:
+                    a.tag = _q(XHTML_NS, 'span')
+                    del a.attrib['href']
+                self._dirty.add(self.nav_path)
+        if self.ncx_path and self.ncx_path != path:
+            root = self._document(self.ncx_path)
+            base = posixpath.dirname(self.ncx_path)
+            parents = {child: parent for parent in root.iter() for child in parent}
+            changed = False
+            for point in list(root.iter(_q(NCX_NS, 'navPoint'))):
+                content = point.find(_q(NCX_NS, 'content'))
+                if content is None or self.archive.resolve(content.get('src', ''), base) != path:
+                    continue
+                parent = parents[point]
+                index = list(parent).index(point)
+                remove_child(parent, point)
+                # 子目录项上移到被删除项的位置
+                for offset, child in enumerate(point.findall(_q(NCX_NS, 'navPoint'))):
+                    parent.insert(index + offset, child)
+                    parents[child] = parent
+                changed = True
+            if changed:
+                self._renumber_ncx(root)
+                self._dirty.add(self.ncx_path)
+
+    @staticmethod
+    def _renumber_ncx(root):
+        for order, point in enumerate(root.iter(_q(NCX_NS, 'navPoint')), 1):
+            point.set('playOrder', str(order))
+
+    # ---- 写出 ----
+
+    def _touch_modified(self):
+        """把 <meta property="dcterms:modified"> 更新为当前 UTC 时间；EPUB 2 中没有时不添加"""
+        stamp = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+        for meta in self.metadata.findall('opf:meta', OPF_NS):
+            if meta.get('property') == MODIFIED and not meta.get('refines'):
+                meta.text = stamp
+                return
+        if self.opf.get('version', '').startswith('3'):
+            append_child(self.metadata, _q(OPF_NS['opf'], 'meta'), {'property': MODIFIED}).text = stamp
+
+    def rendered(self):
+        """需要重新生成的条目 {路径: 数据}"""
+        if self.opf_path in self._dirty:
+            self._touch_modified()
+        return {path: serialize(self.opf if path == self.opf_path else self._documents[path])
+                for path in self._dirty - self._removed}
+
+    def save(self, output_path=None, policy=None):
+        """写出修改后的 EPUB（默认覆盖原文件），返回输出路径
+
+        新生成的条目按 converter.epubpack 的压缩策略压缩，其余条目原样复制。
+        覆盖原文件时编辑器随之关闭。
+        """
+        source = self.archive.zip
+        output_path = output_path or self.archive.epub_path
+        replaced = self.rendered()
+        tmp_path = output_path + '.tmp'
+        try:
+            with zipfile.ZipFile(tmp_path, 'w') as zout:
+                zout.comment = source.comment
+                for info in source.infolist():
+                    name = info.filename
+                    if name in self._removed or name in self._added:
+                        continue
+                    if name in replaced:
+                        write_data(zout, name, replaced[name], policy)
+                    else:
+                        copy_raw_entry(source, zout, info)
+                for name, data in self._added.items():
+                    write_data(zout, name, data, policy)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        if os.path.exists(output_path) and os.path.samefile(output_path, self.archive.epub_path):
+            self.close()
+        os.replace(tmp_path, output_path)
+        return output_path
@@ -0,0 +1,435 @@
+"""EPUB 合并与拆分
+
+合并：把多本书（例如一个系列的各卷）合成一本。第 n 卷的文件放进
+OEBPS/v00n/，卷内文件之间的相对位置不变，章节、图片、样式之间的相对
+链接都不必改写；manifest id 加上卷前缀避免冲突。目录按卷分组，每卷
+下面是该卷原有的目录。
+
+拆分：按 spine 每 N 章拆成一卷，路径保持原样，每卷只带上本卷章节（递归）
+引用到的资源；样式表、字体和封面图片每卷都带。目录取原书目录中指向本卷
+章节的部分。
+
+两者都只新生成 OPF、nav.xhtml 和 toc.ncx，章节与资源条目从原归档原样
+复制（不解压、不重新压缩），耗时主要是顺序读写文件。拆分时如果书中有
+图片等需要按引用分配的资源，会解压章节查找引用，但不会重新压缩。
+"""
+import os
+import posixpath
+import re
+import time
+import urllib.parse
+import uuid
+import zipfile
+from xml.sax.saxutils import escape, quoteattr
+
+from converter.epubarchive import (EpubArchive, CHAPTER_TYPES, NCX_TYPE, copy_raw_entry,
+                                   navigation_ids, read_navigation)
+from converter.epubpack import write_data
+
+
+CONTENT_DIR = 'OEBPS'
+
+# 章节、样式表、SVG 中对其他条目的引用
+REFERENCE = re.compile(rb'''(?:(?:src|href)\s*=\s*["']|url\(\s*["']?|@import\s+["'])([^"'#?)\s]+)''')
+SKIP_SCHEMES = (b'http:', b'https:', b'data:', b'mailto:', b'javascript:')
+SCANNED_TYPES = CHAPTER_TYPES + ('text/css', 'image/svg+xml')
+
+CONTAINER_TEMPLATE = '''<?xml version="1.0"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+    <rootfiles>
+        <rootfile full-path={opf_path} media-type="application/oebps-package+xml"/>
+    </rootfiles>
+</container>'''
+
+OPF_TEMPLATE = '''<?xml version="1.0" encoding="utf-8"?>
+<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="uid">
+    <metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
+        <dc:identifier id="uid">urn:uuid:{identifier}</dc:identifier>
+        <dc:title>{title}</dc:title>{creator}
+        <dc:language>{language}</dc:language>
+        <meta property="dcterms:modified">{modified}</meta>{cover}
+    </metadata>
+    <manifest>
+        {manifest}
+    </manifest>
+    <spine toc={ncx_id}>
+        {spine}
+    </spine>
+</package>'''
+
+NAV_TEMPLATE = '''<?xml version="1.0" encoding="utf-8"?>
+<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops">
+<head><title>{title}</title></head>
+<body>
+    <nav epub:type="toc">
+        <h1>目录</h1>
+{toc}
+    </nav>
+</body>
+</html>'''
+
+NCX_TEMPLATE = '''<?xml version="1.0" encoding="utf-8"?>
+<ncx xmlns="http://www.daisy.org/z3986/2005/ncx/" version="2005-1">
+    <head>
+        <meta name="dtb:uid" content="urn:uuid:{identifier}"/>
+    </head>
+    <docTitle><text>{title}</text></docTitle>
+    <navMap>
+{points}
+    </navMap>
+</ncx>'''
+
+
+# ---- 目录 ----
+# 目录是 [(标题, 目标, 子目录)] 的树，目标为归档内路径（可带 #片段），
+# 没有链接的分组标题目标为 None。
+
+def read_toc(archive):
+    """读取书的目录：优先 EPUB 3 导航文件，其次 NCX，都没有时按 spine 以文件名为标题"""
+    toc = read_navigation(archive)
+    return toc if toc is not None else spine_toc(archive.spine_paths())
+
+
+def spine_toc(paths):
+    return [(posixpath.splitext(posixpath.basename(path))[0], path, []) for path in paths]
+
+
+def map_toc(toc, mapping):
+    """按 {旧路径: 新路径} 改写目录；目标不在 mapping 中且没有子目录的条目被去掉"""
+    result = []
+    for title, target, children in toc:
+        children = map_toc(children, mapping)
+        if target is not None:
+            path, sep, fragment = target.partition('#')
+            target = mapping.get(path)
+            if target is not None:
+                target += sep + fragment
+        if target is not None or children:
+            result.append((title, target, children))
+    return result
+
+
+def _relative(path, base_dir):
+    # 归档内路径都已规范化，常见的"位于 base_dir 之下"不必走较慢的 relpath
+    if not base_dir:
+        return path
+    if path.startswith(base_dir + '/'):
+        return path[len(base_dir) + 1:]
+    return posixpath.relpath(path, base_dir)
+
+
+def _href(target, base_dir):
+    path, sep, fragment = target.partition('#')
+    return urllib.parse.quote(_relative(path, base_dir)) + sep + fragment
+
+
+def render_nav(toc, nav_dir, title):
+    lines = []
+
+    def walk(nodes, indent):
+        lines.append(f'{indent}<ol>')
+        for label, target, children in nodes:
+            label = escape(label)
+            link = f'<a href={quoteattr(_href(target, nav_dir))}>{label}</a>' if target \
+                else f'<span>{label}</span>'
+            if children:
+                lines.append(f'{indent}    <li>{link}')
+                walk(children, indent + '        ')
+                lines.append(f'{indent}    </li>')
+            else:
+                lines.append(f'{indent}    <li>{link}</li>')
+        lines.append(f'{indent}</ol>')
+
+    walk(toc, ' ' * 8)
+    return NAV_TEMPLATE.format(title=escape(title), toc='\n'.join(lines)).encode('utf-8')
+
+
+def _first_target(toc):
+    for _, target, children in toc:
+        target = target or _first_target(children)
+        if target:
+            return target
+    return None
+
+
+def render_ncx(toc, ncx_dir, title, identifier):
+    lines = []
+    order = 0
+
+    def walk(nodes, indent):
+        nonlocal order
+        for label, target, children in nodes:
+            # NCX 的目录项必须有链接，分组标题指向其第一个子项
+            target = target or _first_target(children)
+            if target is None:
+                continue
+            order += 1
+            lines.append(f'{indent}<navPoint id="navPoint-{order}" playOrder="{order}">')
+            lines.append(f'{indent}    <navLabel><text>{escape(label)}</text></navLabel>')
+            lines.append(f'{indent}    <content src={quoteattr(_href(target, ncx_dir))}/>')
+            walk(children, indent + '    ')
+            lines.append(f'{indent}</navPoint>')
+
+    walk(toc, ' ' * 8)
+    return NCX_TEMPLATE.format(identifier=identifier, title=escape(title),
+                               points='\n'.join(lines)).encode('utf-8')
+
+
+# ---- 写出 ----
+
+def _unique(name, taken, make):
+    n = 1
+    candidate = name
+    while candidate in taken:
+        n += 1
+        candidate = make(n)
+    taken.add(candidate)
+    return candidate
+
+
+def render_opf(metadata, items, spine, opf_dir, ncx_id):
+    manifest = []
+    for item in items:
+        attrs = f'id={quoteattr(item["id"])} href={quoteattr(_href(item["path"], opf_dir))} ' \
+                f'media-type={quoteattr(item["type"])}'
+        if item.get('properties'):
+            attrs += f' properties={quoteattr(item["properties"])}'
+        if item.get('fallback'):
+            attrs += f' fallback={quoteattr(item["fallback"])}'
+        manifest.append(f'<item {attrs}/>')
+    itemrefs = [f'<itemref idref={quoteattr(item_id)}' + (' linear="no"/>' if nonlinear else '/>')
+                for item_id, nonlinear in spine]
+    creator = f'\n        <dc:creator>{escape(metadata["creator"])}</dc:creator>' \
+        if metadata.get('creator') else ''
+    cover = f'\n        <meta name="cover" content={quoteattr(metadata["cover_id"])}/>' \
+        if metadata.get('cover_id') else ''
+    return OPF_TEMPLATE.format(
+        identifier=metadata['identifier'],
+        title=escape(metadata['title'] or 'Untitled'),
+        creator=creator,
+        language=escape(metadata.get('language') or 'zh-CN'),
+        modified=time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        cover=cover,
+        manifest='\n        '.join(manifest),
+        ncx_id=quoteattr(ncx_id),
+        spine='\n        '.join(itemrefs)
+    ).encode('utf-8')
+
+
+def write_book(output_path, opf_path, metadata, items, spine, toc, copies,
+               policy=None, progress=None):
+    """写出一本新书：生成 OPF、nav.xhtml、toc.ncx，copies 中的条目原样复制
+
+    items 为 manifest 条目字典（id、path、type、properties、fallback），spine 为
+    [(id, 是否非线性)]，copies 为 [(源 ZipFile, ZipInfo, 新路径)]。
+    """
+    opf_dir = posixpath.dirname(opf_path)
+    paths = {item['path'] for item in items} | {opf_path}
+    ids = {item['id'] for item in items}
+    nav_path = _unique(posixpath.join(opf_dir, 'nav.xhtml'), paths,
+                       lambda n: posixpath.join(opf_dir, f'nav_{n}.xhtml'))
+    ncx_path = _unique(posixpath.join(opf_dir, 'toc.ncx'), paths,
+                       lambda n: posixpath.join(opf_dir, f'toc_{n}.ncx'))
+    nav_id = _unique('nav', ids, lambda n: f'nav{n}')
+    ncx_id = _unique('ncx', ids, lambda n: f'ncx{n}')
+    items = [{'id': nav_id, 'path': nav_path, 'type': 'application/xhtml+xml', 'properties': 'nav'},
+             {'id': ncx_id, 'path': ncx_path, 'type': NCX_TYPE}] + items
+
+    tmp_path = output_path + '.tmp'
+    try:
+        with zipfile.ZipFile(tmp_path, 'w') as zout:
+            write_data(zout, 'mimetype', b'application/epub+zip', policy)
+            write_data(zout, 'META-INF/container.xml',
+                       CONTAINER_TEMPLATE.format(opf_path=quoteattr(opf_path)).encode('utf-8'), policy)
+            for done, (source, info, name) in enumerate(copies, 1):
+                copy_raw_entry(source, zout, info, name)
+                if progress is not None:
+                    progress(done, len(copies))
+            write_data(zout, opf_path, render_opf(metadata, items, spine, opf_dir, ncx_id), policy)
+            write_data(zout, nav_path, render_nav(toc, posixpath.dirname(nav_path),
+                                                  metadata['title']), policy)
+            write_data(zout, ncx_path, render_ncx(toc, posixpath.dirname(ncx_path),
+                                                  metadata['title'], metadata['identifier']), policy)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, output_path)
+    return output_path
+
+
+def _content_items(archive):
+    """除导航文件外、归档中确实存在的 manifest 条目 {id: 条目}，保持 OPF 中的顺序"""
+    skip = navigation_ids(archive)
+    return {item_id: item for item_id, item in archive.manifest.items()
+            if item_id not in skip and archive.exists(item['path'])}
+
+
+def _properties(item, keep_cover):
+    return ' '.join(p for p in item['properties'].split()
+                    if p != 'nav' and (keep_cover or p != 'cover-image'))
+
+
+# ---- 合并 ----
+
+def merge_epubs(epub_paths, output_path, title=None, creator=None, policy=None, progress=None):
+    """按顺序把多本书合并为一本，返回输出路径
+
+    书名、作者默认取第一本；封面取第一本有封面的书。
+    """
+    if not epub_paths:
+        raise ValueError("没有要合并的书")
+    archives = []
+    try:
+        for path in epub_paths:
+            archives.append(EpubArchive(path))
+        items, spine, toc, copies = [], [], [], []
+        cover_id = None
+        for number, archive in enumerate(archives, 1):
+            prefix = f'v{number:03}'
+            entries = _content_items(archive)
+            paths = [item['path'] for item in entries.values()]
+            root = posixpath.commonpath([posixpath.dirname(path) for path in paths]) if paths else ''
+            mapping = {path: f'{CONTENT_DIR}/{prefix}/{_relative(path, root)}' for path in paths}
+
+            for item_id, item in entries.items():
+                keep_cover = cover_id is None and item['path'] == archive.cover
+                new_id = f'{prefix}-{item_id}'
+                if keep_cover:
+                    cover_id = new_id
+                items.append({
+                    'id': new_id,
+                    'path': mapping[item['path']],
+                    'type': item['type'],
+                    'properties': _properties(item, keep_cover),
+                    'fallback': f'{prefix}-{item["fallback"]}' if item['fallback'] in entries else None
+                })
+                copies.append((archive.zip, archive.zip.getinfo(item['path']), mapping[item['path']]))
+            spine += [(f'{prefix}-{item_id}', item_id in archive.nonlinear)
+                      for item_id in archive.spine if item_id in entries]
+
+            first = next((mapping[path] for path in archive.spine_paths() if path in mapping), None)
+            toc.append((archive.title, first, map_toc(read_toc(archive), mapping)))
+
+        first = archives[0]
+        metadata = {
+            'identifier': uuid.uuid4(),
+            'title': title or first.title,
+            'creator': creator or first.creator,
+            'language': first.language,
+            'cover_id': cover_id
+        }
+        return write_book(output_path, f'{CONTENT_DIR}/package.opf', metadata, items, spine, toc,
+                          copies, policy, progress)
+    finally:
+        for archive in archives:
+            archive.close()
+
+
+# ---- 拆分 ----
+
+def _is_shared(item, cover):
+    """每卷都带上的资源：样式表、字体、封面图片"""
+    media_type = item['type']
+    return (media_type == 'text/css' or media_type.startswith('font/') or 'font' in media_type
+            or 'opentype' in media_type or item['path'] == cover)
+
+
+def _referenced(archive, paths, by_path, entries):
+    """paths 中的文档（递归）引用到的资源 id"""
+    found = set()
+    queue = list(paths)
+    while queue:
+        path = queue.pop()
+        base = posixpath.dirname(path)
+        for match in REFERENCE.finditer(archive.read(path)):
+            href = match.group(1)
+            if href.lower().startswith(SKIP_SCHEMES):
+                continue
+            try:
+                item_id = by_path.get(archive.resolve(href.decode('utf-8'), base))
+            except UnicodeDecodeError:
+                continue
+            if item_id is not None and item_id not in found:
+                found.add(item_id)
+                if entries[item_id]['type'] in SCANNED_TYPES:
+                    queue.append(entries[item_id]['path'])
+    return found
+
+
+def split_epub(epub_path, output_dir, chapters_per_volume, policy=None, progress=None):
+    """按 spine 每 chapters_per_volume 章拆分为多本，返回各卷路径
+
+    输出文件名为 <原文件名>_<卷号>.epub，书名加上"第 n 卷"。
+    """
+    if chapters_per_volume < 1:
+        raise ValueError("每卷章节数必须大于 0")
+    os.makedirs(output_dir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(epub_path))[0]
+    outputs = []
+    with EpubArchive(epub_path) as archive:
+        entries = _content_items(archive)
+        spine_ids = [item_id for item_id in archive.spine if item_id in entries]
+
+        # 非章节的 spine 条目（插图页等）跟随其前面的章节
+        volumes = []
+        current, count = [], 0
+        for item_id in spine_ids:
+            is_chapter = entries[item_id]['type'] in CHAPTER_TYPES
+            if is_chapter and count == chapters_per_volume:
+                volumes.append(current)
+                current, count = [], 0
+            current.append(item_id)
+            count += is_chapter
+        if current:
+            volumes.append(current)
+
+        in_spine = set(spine_ids)
+        resources = {item_id: item for item_id, item in entries.items() if item_id not in in_spine}
+        shared = {item_id for item_id, item in resources.items() if _is_shared(item, archive.cover)}
+        by_path = {item['path']: item_id for item_id, item in resources.items()}
+        toc = read_toc(archive)
+
+        width = len(str(len(volumes)))
+        for number, chunk in enumerate(volumes, 1):
+            chosen = set(chunk) | shared
+            if len(shared) < len(resources):
+                # 只有需要按引用分配的资源时才解压章节查找引用
+                chosen |= _referenced(archive, [entries[item_id]['path'] for item_id in chunk
+                                                if entries[item_id]['type'] in SCANNED_TYPES] +
+                                      [resources[item_id]['path'] for item_id in shared
+                                       if resources[item_id]['type'] in SCANNED_TYPES],
+                                      by_path, entries)
+            items, copies = [], []
+            cover_id = None
+            for item_id, item in entries.items():
+                if item_id not in chosen:
+                    continue
+                if item['path'] == archive.cover:
+                    cover_id = item_id
+                items.append({
+                    'id': item_id,
+                    'path': item['path'],
+                    'type': item['type'],
+                    'properties': _properties(item, True),
+                    'fallback': item['fallback'] if item['fallback'] in chosen else None
+                })
+                copies.append((archive.zip, archive.zip.getinfo(item['path']), item['path']))
+            spine = [(item_id, item_id in archive.nonlinear) for item_id in chunk]
+
+            chapters = [entries[item_id]['path'] for item_id in chunk
+                        if entries[item_id]['type'] in CHAPTER_TYPES]
+            volume_toc = map_toc(toc, {path: path for path in chapters}) or spine_toc(chapters)
+            metadata = {
+                'identifier': uuid.uuid4(),
+                'title': f"{archive.title} 第{number}卷",
+                'creator': archive.creator,
+                'language': archive.language,
+                'cover_id': cover_id
+            }
+            output = os.path.join(output_dir, f'{stem}_{number:0{width}}.epub')
+            outputs.append(write_book(output, archive.opf_path, metadata, items, spine,
+                                      volume_toc, copies, policy))
+            if progress is not None:
+                progress(number, len(volumes))
+    return outputs
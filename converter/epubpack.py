@@ -0,0 +1,244 @@
+"""EPUB 打包：按条目类型选择压缩方式，并行压缩、顺序写入
+
+每个条目按扩展名归入一种类型（text / font / image / media / other），
+压缩策略是 类型 -> DEFLATE 级别 的字典，None 或 0 表示不压缩（STORED）。
+默认策略对文本和字体使用 DEFAULT_LEVEL，JPEG/PNG 等图片和 woff、音视频
+这类本身已压缩的格式直接存储。mimetype 永远排在第一位且不压缩。
+
+读文件、算 CRC 和压缩在线程池中完成（zlib 压缩时会释放 GIL），主线程
+按原顺序把压缩好的数据用 write_raw_entry 写入归档；同时在途的条目数有
+上限，内存占用不随书的大小增长。不小于 STREAM_SIZE 的大文件（插图、音视频）
+不整个读入内存，轮到它时由主线程分块压缩写入。
+"""
+import os
+import posixpath
+import shutil
+import time
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from converter.epubarchive import write_raw_entry, copy_raw_entry
+
+
+DEFAULT_LEVEL = 6
+MIMETYPE = 'mimetype'
+STREAM_SIZE = 4 * 1024 * 1024   # 不小于这个大小的文件分块写入
+STREAM_CHUNK = 1024 * 1024
+
+KINDS = {
+    'text': ('.xhtml', '.html', '.htm', '.css', '.xml', '.opf', '.ncx', '.svg',
+             '.js', '.txt', '.smil'),
+    'font': ('.ttf', '.otf'),
+    'image': ('.jpg', '.jpeg', '.png', '.gif', '.webp'),
+    'media': ('.woff', '.woff2', '.mp3', '.m4a', '.mp4', '.ogg', '.webm'),
+}
+_KIND_BY_EXT = {ext: kind for kind, exts in KINDS.items() for ext in exts}
+
+
+def entry_kind(arcname):
+    """条目类型，mimetype 单独一类"""
+    if arcname == MIMETYPE:
+        return MIMETYPE
+    return _KIND_BY_EXT.get(posixpath.splitext(arcname)[1].lower(), 'other')
+
+
+def make_policy(level=DEFAULT_LEVEL, **levels):
+    """默认压缩策略；level 作用于可压缩的类型，关键字参数单独覆盖某一类型"""
+    policy = {'text': level, 'font': level, 'other': level, 'image': None, 'media': None}
+    policy.update(levels)
+    return policy
+
+
+def policy_signature(policy):
+    """写入构建清单，策略改变后不再复用上一次压缩好的条目"""
+    return ','.join(f'{kind}={policy.get(kind) or 0}' for kind in sorted(policy))
+
+
+def collect_entries(input_path):
+    """收集待打包文件 [(文件路径, 归档内路径)]，mimetype 固定排在第一位"""
+    entries = [(os.path.join(input_path, MIMETYPE), MIMETYPE)]
+    for root_dir, _, files in os.walk(input_path):
+        for file in files:
+            if file == MIMETYPE:
+                continue  # 已单独处理
+            if root_dir == input_path and file.startswith('.'):
+                continue  # 构建缓存
+            file_path = os.path.join(root_dir, file)
+            # 计算相对路径
+            arcname = os.path.relpath(file_path, input_path)
+            arcname = arcname.replace(os.path.sep, '/')
+            entries.append((file_path, arcname))
+    return entries
+
+
+def compress_file(file_path, arcname, level):
+    """线程池任务：读取并压缩一个文件，返回 (ZipInfo, 压缩后数据, 耗时)"""
+    start = time.perf_counter()
+    zinfo = zipfile.ZipInfo.from_file(file_path, arcname)
+    with open(file_path, 'rb') as f:
+        data = f.read()
+    return zinfo, compress_data(zinfo, data, level), time.perf_counter() - start
+
+
+def stream_file(zipf, file_path, arcname, level):
+    """把大文件按块读取、压缩并写入 zipf，返回 (ZipInfo, 耗时)
+
+    内存中只保留一个块；与 compress_data 不同，压缩后没有变小时不会再改为
+    直接存储，默认策略下大文件多是本来就直接存储的图片和音视频。
+    """
+    start = time.perf_counter()
+    zinfo = zipfile.ZipInfo.from_file(file_path, arcname)
+    if level:
+        zinfo.compress_type = zipfile.ZIP_DEFLATED
+        zinfo._compresslevel = level
+    else:
+        zinfo.compress_type = zipfile.ZIP_STORED
+    with open(file_path, 'rb') as src, zipf.open(zinfo, 'w') as dst:
+        shutil.copyfileobj(src, dst, STREAM_CHUNK)
+    return zinfo, time.perf_counter() - start
+
+
+def compress_data(zinfo, data, level):
+    """按 level 压缩 data 并填好 zinfo 的 CRC、大小和压缩方式，返回写入归档的数据"""
+    zinfo.file_size = len(data)
+    zinfo.CRC = zlib.crc32(data)
+    packed = None
+    if level:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+        packed = compressor.compress(data) + compressor.flush()
+    # 压缩后没有变小（图片、乱码等）时改为直接存储
+    if packed is not None and len(packed) < len(data):
+        zinfo.compress_type = zipfile.ZIP_DEFLATED
+        data = packed
+    else:
+        zinfo.compress_type = zipfile.ZIP_STORED
+    zinfo.compress_size = len(data)
+    return data
+
+
+def write_data(zipf, arcname, data, policy=None):
+    """把内存中的数据按策略压缩后写入 zipf，返回 ZipInfo"""
+    if policy is None:
+        policy = make_policy()
+    kind = entry_kind(arcname)
+    level = 0 if kind == MIMETYPE else policy.get(kind, DEFAULT_LEVEL)
+    zinfo = zipfile.ZipInfo(arcname, time.localtime()[:6])
+    zinfo.external_attr = 0o644 << 16
+    write_raw_entry(zipf, zinfo, compress_data(zinfo, data, level))
+    return zinfo
+
+
+class PackStats:
+    """按条目类型统计条目数、原始/压缩后字节数和压缩耗时"""
+
+    def __init__(self):
+        self.kinds = {}
+        self.copied = 0
+        self.elapsed = 0.0
+
+    def add(self, kind, size, compress_size, seconds=0.0):
+        row = self.kinds.setdefault(kind, [0, 0, 0, 0.0])
+        row[0] += 1
+        row[1] += size
+        row[2] += compress_size
+        row[3] += seconds
+
+    def report(self):
+        lines = [f"{'类型':<8}{'条目':>6}{'原始KB':>10}{'压缩后KB':>10}{'比例':>7}{'耗时ms':>9}"]
+        total = [0, 0, 0, 0.0]
+        for kind, row in sorted(self.kinds.items()):
+            lines.append(self._line(kind, row))
+            total = [a + b for a, b in zip(total, row)]
+        lines.append(self._line('合计', total))
+        extra = f"，复用 {self.copied} 个未变化条目" if self.copied else ""
+        lines.append(f"打包耗时 {self.elapsed * 1000:.0f} ms{extra}")
+        return '\n'.join(lines)
+
+    @staticmethod
+    def _line(kind, row):
+        count, size, packed, seconds = row
+        ratio = packed / size if size else 1.0
+        return (f"{kind:<8}{count:>6}{size / 1024:>10.1f}{packed / 1024:>10.1f}"
+                f"{ratio:>7.0%}{seconds * 1000:>9.0f}")
+
+
+def write_entries(zipf, items, policy=None, workers=None, progress=None, stats=None):
+    """按顺序把条目写入 zipf，返回 PackStats
+
+    items 中每一项为 (文件路径, 归档内路径, 复用条目)；复用条目是
+    (源 ZipFile, ZipInfo) 时原样复制，为 None 时按策略压缩文件（不小于
+    STREAM_SIZE 的文件在主线程中分块压缩写入）。
+    """
+    if policy is None:
+        policy = make_policy()
+    if stats is None:
+        stats = PackStats()
+    if workers is None:
+        workers = os.cpu_count() or 1
+    start = time.perf_counter()
+    total = len(items)
+    window = deque()
+    pending = iter(items)
+    # 同时在途的条目数有上限，在途的都是小于 STREAM_SIZE 的文件，
+    # 已压缩数据不会整本书堆在内存里
+    limit = 2 * workers
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='deflate') as pool:
+
+        def submit():
+            for file_path, arcname, reuse in pending:
+                kind = entry_kind(arcname)
+                level = 0 if kind == MIMETYPE else policy.get(kind, DEFAULT_LEVEL)
+                if reuse is not None:
+                    window.append((kind, 'copy', reuse))
+                elif os.path.getsize(file_path) >= STREAM_SIZE:
+                    window.append((kind, 'stream', (file_path, arcname, level)))
+                else:
+                    window.append((kind, 'compress',
+                                   pool.submit(compress_file, file_path, arcname, level)))
+                if len(window) >= limit:
+                    return
+
+        try:
+            submit()
+            done = 0
+            while window:
+                kind, action, task = window.popleft()
+                if action == 'compress':
+                    zinfo, data, seconds = task.result()
+                    write_raw_entry(zipf, zinfo, data)
+                    stats.add(kind, zinfo.file_size, zinfo.compress_size, seconds)
+                elif action == 'copy':
+                    source, info = task
+                    copy_raw_entry(source, zipf, info)
+                    stats.add(kind, info.file_size, info.compress_size)
+                    stats.copied += 1
+                else:
+                    zinfo, seconds = stream_file(zipf, *task)
+                    stats.add(kind, zinfo.file_size, zinfo.compress_size, seconds)
+                submit()
+                done += 1
+                if progress is not None:
+                    progress(done, total)
+        except BaseException:
+            for _, action, task in window:
+                if action == 'compress':
+                    task.cancel()
+            raise
+    stats.elapsed += time.perf_counter() - start
+    return stats
+
+
+def pack_folder(input_path, output_path, policy=None, workers=None, progress=None):
+    """把目录中的全部文件按策略打包为 EPUB，返回 PackStats"""
+    items = [(file_path, arcname, None) for file_path, arcname in collect_entries(input_path)]
+    try:
+        with zipfile.ZipFile(output_path, 'w') as zipf:
+            return write_entries(zipf, items, policy, workers, progress)
+    except BaseException:
+        # 不留下写了一半的 EPUB
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        raise
@@ -1,85 +1,204 @@
 import zipfile,os
-import xml.etree.ElementTree as ET
-from pathlib import Path
-from bs4 import BeautifulSoup
-import shutil
+import io
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from converter import instrument
+from converter.epubarchive import EpubArchive
+from converter.chapterselect import HeadTitle, chapter_paths, parse_selection
+
+
+READ_CHUNK = 64 * 1024
+SKIP_TAGS = {'style', 'script', 'head', 'meta', 'link'}
+
+
+class _ChapterTextTarget:
+    """lxml 解析器 target：一次流式解析同时得到 <title> 和格式化正文
+
+    不修改任何树结构，输出与 BeautifulSoup 路径（_html_to_text）逐字节一致：
+    每个文本节点按行 strip 后丢弃空行，<ul> 内的每个 <li> 前按所在 <ul>
+    的层数插入 "•" 行，最后用空行连接。
+    """
+
+    def __init__(self):
+        self.title = None
+        self.lines = []
+        self._in_title = False
+        self._title_parts = []
+        self._skip = 0
+        self._ul_depth = 0
+        self._buf = []
+
+    def _flush(self):
+        if self._buf:
+            text = ''.join(self._buf)
+            self._buf = []
+            for line in text.splitlines():
+                line = line.strip()
+                if line:
+                    self.lines.append(line)
+
+    def start(self, tag, attrib):
+        self._flush()
+        name = tag.rpartition('}')[2]
+        if name == 'title' and self.title is None and not self._in_title:
+            self._in_title = True
+        if self._skip or name in SKIP_TAGS:
+            self._skip += 1
+            return
+        if name == 'ul':
+            self._ul_depth += 1
+        elif name == 'li' and self._ul_depth:
+            self.lines.extend(['•'] * self._ul_depth)
+
+    def end(self, tag):
+        self._flush()
+        name = tag.rpartition('}')[2]
+        if name == 'title' and self._in_title:
+            self.title = ''.join(self._title_parts).strip()
+            self._in_title = False
+        if self._skip:
+            self._skip -= 1
+            return
+        if name == 'ul' and self._ul_depth:
+            self._ul_depth -= 1
+
+    def data(self, data):
+        if self._in_title:
+            self._title_parts.append(data)
+        if not self._skip:
+            self._buf.append(data)
+
+    def comment(self, text):
+        self._flush()
+
+    def pi(self, target, data=None):
+        self._flush()
+
+    def close(self):
+        self._flush()
+        return self.title or '', '\n\n'.join(self.lines)
+
+
+def extract_chapter(source):
+    """单次流式解析章节文件，返回 (标题, 格式化正文)
+
+    source 可以是文件路径或以二进制方式打开的文件对象。
+    """
+    from lxml import etree
+
+    target = _ChapterTextTarget()
+    parser = etree.XMLParser(target=target, recover=True, huge_tree=True,
+                             strip_cdata=False)
+    if hasattr(source, 'read'):
+        f = source
+    else:
+        f = open(source, 'rb')
+    try:
+        for chunk in iter(lambda: f.read(READ_CHUNK), b''):
+            parser.feed(chunk)
+    finally:
+        if f is not source:
+            f.close()
+    return parser.close()
+
+
+def parse_errors():
+    """单个章节解析失败时可以跳过的异常；缺少 lxml 时在这里抛出 ImportError
+
+    其他异常（导入失败、工作进程崩溃等）不是某一章的问题，直接向上抛出，
+    不能被当成"没有匹配的章节"。
+    """
+    from lxml import etree
+
+    return etree.XMLSyntaxError, UnicodeDecodeError, KeyError
+
+
+_worker_archives = {}
+
+
+def _chapter_to_text(epub_path, name, engine):
+    """进程池任务：返回 (标题, 正文)，bs4 引擎的标题由主进程提供
+
+    每个工作进程只打开一次 EPUB，之后直接从 zip 中读取章节。
+    """
+    zf = _worker_archives.get(epub_path)
+    if zf is None:
+        zf = _worker_archives[epub_path] = zipfile.ZipFile(epub_path, 'r')
+    with zf.open(name) as f:
+        if engine == 'lxml':
+            return extract_chapter(f)
+        text = EpubToTextConverter(None, engine='bs4')._html_to_text(
+            io.TextIOWrapper(f, encoding='utf-8'))
+        return None, text
+
 
 class EpubToTextConverter:
-    def __init__(self, epub_path):
+    ENGINES = ('lxml', 'bs4')
+
+    def __init__(self, epub_path, engine='lxml'):
+        if engine not in self.ENGINES:
+            raise ValueError(f"未知的解析引擎: {engine}")
         self.epub_path = epub_path
-        self.temp_dir = Path(f"temp_epub_{id(self)}")
-        self.opf_path = None
+        self.engine = engine
+        self.archive = None
         self.html_files = []
+        self._progress = None
 
-    def _unzip_epub(self):
-        """解压 EPUB 文件到临时目录"""
-        self.temp_dir.mkdir(exist_ok=True)
-        with zipfile.ZipFile(self.epub_path, 'r') as z:
-            z.extractall(self.temp_dir)
-    
-    def _parse_container(self):
-        """解析 container.xml 获取 OPF 路径"""
-        container_path = self.temp_dir / "META-INF" / "container.xml"
-        tree = ET.parse(container_path)
-        root = tree.getroot()
-        ns = {'n': 'urn:oasis:names:tc:opendocument:xmlns:container'}
-        self.opf_path = root.find('.//n:rootfile', ns).attrib['full-path']
-    
-    def _parse_opf(self):
-        """解析 OPF 文件并按阅读顺序获取带标题的 HTML 文件"""
-        opf_fullpath = self.temp_dir / self.opf_path
-        opf_dir = opf_fullpath.parent
-        
-        tree = ET.parse(opf_fullpath)
-        root = tree.getroot()
-        ns = {'pkg': 'http://www.idpf.org/2007/opf'}
-        
-        # 解析 manifest
-        manifest = root.find('pkg:manifest', ns)
-        items = {}
-        for item in manifest.findall('pkg:item', ns):
-            items[item.attrib['id']] = {
-                'href': opf_dir / item.attrib['href'],
-                'type': item.attrib['media-type']
-            }
-        
-        # 解析 spine 获取阅读顺序
-        spine = root.find('pkg:spine', ns)
-        for itemref in spine.findall('pkg:itemref', ns):
-            item_id = itemref.attrib['idref']
-            item = items.get(item_id)
-            if item and item['type'] == 'application/xhtml+xml':
-                self._add_html_file(item['href'])
-    
-    def _add_html_file(self, file_path):
+    def _report(self, done, total):
+        if self._progress is not None:
+            self._progress(done, total)
+
+    def _parse_opf(self, selection=None):
+        """直接从 EPUB 归档读取 container.xml 与 OPF，按阅读顺序登记选中的 HTML 文件
+
+        章节在这里就按 selection 筛选好，未选中的章节不会被解压。
+        """
+        self.archive = EpubArchive(self.epub_path)
+        for name in chapter_paths(self.archive, selection):
+            self._add_html_file(name)
+
+    def _open_text(self, name):
+        """以 utf-8 文本流打开归档内的章节"""
+        return io.TextIOWrapper(self.archive.open(name), encoding='utf-8')
+
+    def _add_html_file(self, name):
         """解析单个 HTML 文件并记录标题"""
+        if self.engine == 'lxml':
+            # 标题在提取正文的同一次解析中得到
+            self.html_files.append({
+                'path': name,
+                'title': None
+            })
+            return
+        from bs4 import BeautifulSoup
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
+            with self._open_text(name) as f:
                 soup = BeautifulSoup(f, 'html.parser')
                 title = soup.title.string.strip() if soup.title else ''
                 self.html_files.append({
-                    'path': file_path,
+                    'path': name,
                     'title': title
                 })
-        except Exception as e:
-            print(f"解析文件 {file_path} 失败: {e}")
-
-    def _html_to_text(self, html_path):
-        """将 HTML 转换为格式化文本"""
-        with open(html_path, 'r', encoding='utf-8') as f:
-            soup = BeautifulSoup(f, 'lxml-xml')
-            
-            # 移除不需要的元素
-            for elem in soup(['style', 'script', 'head', 'meta', 'link']):
-                elem.decompose()
-            
-            # 处理特殊格式
-            self._process_lists(soup)
-            self._process_headings(soup)
-            
-            # 获取文本内容
-            text = soup.get_text(separator='\n', strip=True)
-            return self._clean_whitespace(text)
+        except (UnicodeDecodeError, KeyError, AttributeError) as e:
+            print(f"解析文件 {name} 失败: {e}")
+
+    def _html_to_text(self, f):
+        """将 HTML 文本流转换为格式化文本"""
+        from bs4 import BeautifulSoup
+        soup = BeautifulSoup(f, 'lxml-xml')
+        
+        # 移除不需要的元素
+        for elem in soup(['style', 'script', 'head', 'meta', 'link']):
+            elem.decompose()
+        
+        # 处理特殊格式
+        self._process_lists(soup)
+        self._process_headings(soup)
+        
+        # 获取文本内容
+        text = soup.get_text(separator='\n', strip=True)
+        return self._clean_whitespace(text)
     
     def _process_lists(self, soup):
         """处理列表格式"""
@@ -105,35 +224,126 @@ class EpubToTextConverter:
                 lines.append(line)
         return '\n\n'.join(lines)
     
-    def convert(self, target_titles=None, output_path="output.txt"):
-        """执行转换主流程"""
-        # 初始化处理
-        self._unzip_epub()
-        self._parse_container()
-        self._parse_opf()
-        
-        # 筛选目标文件
-        target_set = set(target_titles) if target_titles else None
-        matched = [
-            f for f in self.html_files
-            if not target_set or f['title'] in target_set
-        ]
-        
-        if not matched:
+    def _iter_chapters(self):
+        """按阅读顺序产出选中章节的 (标题, 正文)"""
+        total = len(self.html_files)
+        if self.engine == 'lxml':
+            errors = parse_errors()
+        for done, item in enumerate(self.html_files, 1):
+            if self.engine == 'lxml':
+                try:
+                    with self.archive.open(item['path']) as f:
+                        title, text = extract_chapter(f)
+                except errors as e:
+                    print(f"解析文件 {item['path']} 失败: {e}")
+                    title = text = None
+                if title is not None:
+                    yield title, text
+            else:
+                with self._open_text(item['path']) as f:
+                    text = self._html_to_text(f)
+                yield item['title'], text
+            self._report(done, total)
+
+    def _iter_chapters_parallel(self, workers, max_in_flight):
+        """在进程池中并行转换章节，仍按阅读顺序产出 (标题, 正文)
+
+        同时提交的章节数不超过 max_in_flight，已完成但尚未轮到写出的
+        结果也计算在内，因此内存占用有上限。
+        """
+        items = self.html_files
+        if self.engine == 'lxml':
+            errors = parse_errors()
+        pending = deque()
+        queue = iter(items)
+        done = 0
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            while True:
+                while len(pending) < max_in_flight:
+                    item = next(queue, None)
+                    if item is None:
+                        break
+                    future = pool.submit(_chapter_to_text, self.epub_path,
+                                         item['path'], self.engine)
+                    pending.append((item, future))
+                if not pending:
+                    break
+
+                item, future = pending.popleft()
+                if self.engine == 'lxml':
+                    try:
+                        title, text = future.result()
+                    except errors as e:
+                        print(f"解析文件 {item['path']} 失败: {e}")
+                        title = text = None
+                    if title is not None:
+                        yield title, text
+                else:
+                    yield item['title'], future.result()[1]
+                done += 1
+                self._report(done, len(items))
+
+    def convert(self, target_titles=None, output_path="output.txt",
+                workers=None, max_in_flight=None, progress=None, chapters=None):
+        """执行转换主流程
+
+        chapters 为章节选择表达式（见 converter.chapterselect，如 "1,3,5-8"），
+        target_titles 为要转换的章节标题列表（与章节文件的 <title> 比较，
+        不看目录），两者都为空时转换全部章节。
+        先按 spine 和目录确定选中的章节，只有这些章节会被解压和解析。
+
+        workers 大于 1 时用进程池并行转换章节，max_in_flight 限制同时在途的
+        章节数（默认 workers 的 4 倍），输出顺序始终与 spine 一致。
+        progress(已处理章节数, 章节总数) 在每处理完一章后调用。
+        """
+        self._progress = progress
+        with instrument.span('epub2txt', epub=self.epub_path, engine=self.engine,
+                             workers=workers or 1) as op:
+            try:
+                selection = parse_selection(chapters) if chapters else []
+                selection += [HeadTitle(title) for title in target_titles or ()]
+
+                # 初始化处理：只读取 OPF 并筛选章节，选中的章节在转换时才从归档中解压
+                with instrument.span('epub2txt.select') as s:
+                    self._parse_opf(selection or None)
+                    s.add(items=len(self.html_files))
+
+                # 写入输出文件
+                if workers and workers > 1:
+                    texts = self._iter_chapters_parallel(workers, max_in_flight or workers * 4)
+                else:
+                    texts = self._iter_chapters()
+                count = 0
+                f = None
+                try:
+                    with instrument.span('epub2txt.chapters') as s:
+                        if instrument.enabled():
+                            infos = (self.archive.zip.NameToInfo.get(item['path'])
+                                     for item in self.html_files)
+                            s.add(bytes_in=sum(info.file_size for info in infos if info is not None))
+                        for title, text in texts:
+                            with s.timer('write'):
+                                if f is None:
+                                    f = open(output_path, 'w', encoding='utf-8')
+                                f.write(f"=== {title} ===\n\n")
+                                f.write(text)
+                                f.write('\n\n\n')
+                            count += 1
+                        s.add(items=count)
+                        if f is not None:
+                            s.add(bytes_out=f.tell())
+                finally:
+                    if f is not None:
+                        f.close()
+            finally:
+                if self.archive is not None:
+                    self.archive.close()
+            op.add(items=count)
+
+        if not count:
             print("未找到匹配的章节")
             return
-        
-        # 写入输出文件
-        with open(output_path, 'w', encoding='utf-8') as f:
-            for item in matched:
-                text = self._html_to_text(item['path'])
-                f.write(f"=== {item['title']} ===\n\n")
-                f.write(text)
-                f.write('\n\n\n')
-        
-        # 清理临时文件
-        shutil.rmtree(self.temp_dir)
-        print(f"转换完成: 共转换 {len(matched)} 个章节")
+        print(f"转换完成: 共转换 {count} 个章节")
 
 
 def judge_file_name(file_name):
@@ -144,7 +354,7 @@ def judge_file_name(file_name):
         return 
 
 
-def Maindehtml2txt(judge,cypher,name):
+def Maindehtml2txt(judge,cypher,name,workers=None,progress=None):
 
     root, ext = os.path.splitext(name)
     if ext:
@@ -156,21 +366,17 @@ def Maindehtml2txt(judge,cypher,name):
 
     converter = EpubToTextConverter(epub_path)
     if judge == True:
-        if type(cypher) == list:     
-            # 转换特定章节
-            converter.convert(
-                target_titles=cypher,
-                output_path=outpath
-            )    
-        elif type(cypher) == str:
-            converter.convert(
-                target_titles=[cypher],
-                output_path=outpath
-            )
+        # 转换特定章节：cypher 为选择表达式（"1,3,5-8"、标题通配符等）或其各项组成的列表
+        converter.convert(
+            output_path=outpath,
+            workers=workers,
+            progress=progress,
+            chapters=cypher
+        )
         
         
     else:# 转换全部章节
-        converter.convert(output_path=outpath)
+        converter.convert(output_path=outpath, workers=workers, progress=progress)
 
         
 
@@ -0,0 +1,242 @@
+"""转换各阶段的计时与内存统计
+
+各转换函数把自己的阶段包在命名的 span 中：
+
+    with instrument.span('build.pack', items=len(entries)) as s:
+        ...
+        s.add(bytes_out=os.path.getsize(output))
+
+span 结束时输出一条 JSON 记录：名称、所属顶层操作、嵌套深度、墙钟时间
+wall_s、进程 CPU 时间 cpu_s（包含线程池中的工作）、bytes_in / bytes_out /
+items 等计数，启用内存统计时还有该阶段内 tracemalloc 的峰值增量 peak_bytes。
+逐章执行的步骤不单独成 span，用 s.timer('render') 把耗时累加到 render_s。
+
+启用方式（默认关闭，关闭时 span() 只返回一个共享的空对象）：
+    环境变量 EPUBMANAGER_TRACE=<文件>      JSON Lines 追加写入该文件，"-" 为 stderr
+    环境变量 EPUBMANAGER_TRACE_MEMORY=1    同时统计峰值内存（tracemalloc，明显变慢）
+    环境变量 EPUBMANAGER_PROFILE=<目录>    每个顶层操作另存一份 cProfile 结果（需同时启用记录）
+    或在代码中 enable(sink=文件或回调, memory=..., profile_dir=...)
+"""
+import json
+import os
+import sys
+import threading
+import time
+
+
+_sink = None            # None 表示未启用
+_memory = False
+_profile_dir = None
+_lock = threading.Lock()
+_local = threading.local()
+_started_tracemalloc = False
+_profile_seq = 0
+
+
+class _NullSpan:
+    """未启用时所有 span 共用的空对象"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def add(self, **counts):
+        pass
+
+    def set(self, **fields):
+        pass
+
+    def timer(self, key):
+        return self
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Timer:
+    def __init__(self, span, key):
+        self.span = span
+        self.key = key
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        timers = self.span.timers
+        timers[self.key] = timers.get(self.key, 0.0) + time.perf_counter() - self.start
+        return False
+
+
+class Span:
+    """一个已启用的阶段；通过 span() 创建"""
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+        self.counts = {}
+        self.timers = {}
+        self.parent = None
+        self._base = None
+        self._profiler = None
+
+    def add(self, **counts):
+        """累加计数（bytes_in、bytes_out、items 等）"""
+        for key, value in counts.items():
+            self.counts[key] = self.counts.get(key, 0) + value
+
+    def set(self, **fields):
+        """设置记录中的附加字段"""
+        self.fields.update(fields)
+
+    def timer(self, key):
+        """with s.timer('render'): ... 把耗时累加到记录的 render_s"""
+        return _Timer(self, key)
+
+    def __enter__(self):
+        stack = _stack()
+        self.parent = stack[-1] if stack else None
+        self.op = self.parent.op if self.parent is not None else self.name
+        self.depth = len(stack)
+        stack.append(self)
+        if _memory:
+            import tracemalloc
+            current, peak = tracemalloc.get_traced_memory()
+            if self.parent is not None:
+                self.parent._peak = max(self.parent._peak, peak)
+            tracemalloc.reset_peak()
+            self._base = self._peak = current
+        if _profile_dir and self.parent is None:
+            self._start_profile()
+        self.ts = time.time()
+        self._cpu = time.process_time()
+        self._wall = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self._wall
+        cpu = time.process_time() - self._cpu
+        stack = _stack()
+        if stack and stack[-1] is self:
+            stack.pop()
+        record = {
+            'span': self.name,
+            'op': self.op,
+            'depth': self.depth,
+            'pid': os.getpid(),
+            'ts': round(self.ts, 6),
+            'wall_s': round(wall, 6),
+            'cpu_s': round(cpu, 6),
+        }
+        record.update(self.counts)
+        record.update({f'{key}_s': round(value, 6) for key, value in self.timers.items()})
+        if _memory and self._base is not None:
+            import tracemalloc
+            peak = tracemalloc.get_traced_memory()[1]
+            self._peak = max(self._peak, peak)
+            record['peak_bytes'] = self._peak - self._base
+            if self.parent is not None:
+                self.parent._peak = max(self.parent._peak, self._peak)
+            tracemalloc.reset_peak()
+        if self._profiler is not None:
+            record['profile'] = self._stop_profile()
+        if exc_type is not None:
+            record['error'] = exc_type.__name__
+        record.update(self.fields)
+        _emit(record)
+        return False
+
+    def _start_profile(self):
+        import cProfile
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:      # 已有其他分析器在运行
+            return
+        self._profiler = profiler
+
+    def _stop_profile(self):
+        global _profile_seq
+        self._profiler.disable()
+        with _lock:
+            _profile_seq += 1
+            seq = _profile_seq
+        os.makedirs(_profile_dir, exist_ok=True)
+        path = os.path.join(_profile_dir, f'{self.name}-{os.getpid()}-{seq}.prof')
+        self._profiler.dump_stats(path)
+        self._profiler = None
+        return path
+
+
+def _stack():
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def _emit(record):
+    sink = _sink
+    if sink is None:
+        return
+    if callable(sink):
+        sink(record)
+        return
+    line = json.dumps(record, ensure_ascii=False, default=str) + '\n'
+    with _lock:
+        sink.write(line)
+        sink.flush()
+
+
+def span(name, **fields):
+    """返回名为 name 的阶段上下文；fields 原样写入记录（如路径、参数）"""
+    if _sink is None:
+        return _NULL_SPAN
+    return Span(name, fields)
+
+
+def enabled():
+    return _sink is not None
+
+
+def enable(sink='-', memory=False, profile_dir=None):
+    """开始输出记录：sink 为文件路径、"-"（stderr）或以记录 dict 调用的回调"""
+    global _sink, _memory, _profile_dir, _started_tracemalloc
+    disable()
+    if isinstance(sink, str):
+        sink = sys.stderr if sink == '-' else open(sink, 'a', encoding='utf-8')
+    if memory:
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _started_tracemalloc = True
+    _memory = memory
+    _profile_dir = profile_dir
+    _sink = sink
+
+
+def disable():
+    """停止输出记录，关闭 enable 打开的文件"""
+    global _sink, _memory, _profile_dir, _started_tracemalloc
+    sink, _sink = _sink, None
+    if sink is not None and not callable(sink) and sink is not sys.stderr:
+        sink.close()
+    if _started_tracemalloc:
+        import tracemalloc
+        tracemalloc.stop()
+        _started_tracemalloc = False
+    _memory = False
+    _profile_dir = None
+
+
+def _enable_from_env():
+    target = os.environ.get('EPUBMANAGER_TRACE')
+    if target:
+        enable('-' if target in ('-', '1') else target,
+               memory=os.environ.get('EPUBMANAGER_TRACE_MEMORY', '') not in ('', '0'),
+               profile_dir=os.environ.get('EPUBMANAGER_PROFILE') or None)
+
+
+_enable_from_env()
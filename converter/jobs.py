@@ -0,0 +1,181 @@
+"""与界面无关的转换操作，全部使用显式的输入/输出路径
+
+Mainde* 函数依赖当前目录下的固定目录结构，供 GUI 使用；命令行等批处理
+场景调用这里的函数。各函数只在调用时才导入对应的转换模块。
+
+progress 参数是可选的回调 progress(完成量, 总量)；在回调中抛出 Cancelled
+即可中途取消操作。
+"""
+import os
+
+
+DEFAULT_WAREHOUSE = os.path.join('converter', 'HTML2EPUB', 'Interim Warehouse')
+
+
+class Cancelled(Exception):
+    """操作被调用方取消"""
+
+
+def create_framework(name, warehouse=DEFAULT_WAREHOUSE, title="新标题", author="新作者",
+                     cover=None, progress=None):
+    """在 warehouse 下创建名为 name 的 EPUB 框架，返回框架目录"""
+    from converter.HTML2EPUB.GenerateEpubFramework import create_frameworks
+
+    return create_frameworks([(name, title, author, cover)], warehouse, progress=progress)[0]
+
+
+def create_frameworks(specs, warehouse=DEFAULT_WAREHOUSE, link_static=False, progress=None):
+    """批量创建框架，specs 为 [(名称, 书名, 作者, 封面或 None)]，返回框架目录列表
+
+    link_static 为 True 时 mimetype、container.xml 和样式表硬链接到仓库中
+    同一份共享副本（修改某个框架的样式表前需要先断开链接）。
+    """
+    from converter.HTML2EPUB.GenerateEpubFramework import create_frameworks
+
+    return create_frameworks([tuple(spec) for spec in specs], warehouse,
+                             link_static=link_static, progress=progress)
+
+
+def txt_to_html(input_file, framework, progress=None):
+    """把 TXT 手稿转换为章节写入框架的 OEBPS/text，并登记到章节索引"""
+    from converter.txt2html2 import Txt2Html
+    from converter.HTML2EPUB.ChapterIndex import ChapterIndex
+
+    if not os.path.isdir(framework):
+        raise ValueError(f"框架目录不存在: {framework}")
+    text_dir = os.path.join(framework, 'OEBPS', 'text')
+    os.makedirs(text_dir, exist_ok=True)
+    with ChapterIndex(framework) as index:
+        Txt2Html(input_file, text_dir, os.path.basename(input_file),
+                 index=index).parse(progress=progress)
+    return text_dir
+
+
+def build_epub(framework, output, incremental=False, level=None, workers=None, progress=None,
+               report=None):
+    """把框架目录打包为 EPUB
+
+    level 为文本等可压缩条目的 DEFLATE 级别（0 表示全部不压缩，默认
+    converter.epubpack.DEFAULT_LEVEL），图片始终直接存储；report 不为空时
+    以按条目类型统计的 PackStats 调用它。
+    """
+    from converter.HTML2EPUB.GenerateEPUB import folder_to_epub
+    from converter.epubpack import make_policy, DEFAULT_LEVEL
+
+    parent = os.path.dirname(os.path.abspath(output))
+    os.makedirs(parent, exist_ok=True)
+    policy = make_policy(DEFAULT_LEVEL if level is None else level)
+    stats = folder_to_epub(framework, output, incremental=incremental, progress=progress,
+                           policy=policy, workers=workers)
+    if report is not None:
+        report(stats)
+    return output
+
+
+def edit_epub(epub_path, output=None, title=None, creator=None, append=(), remove=(),
+              remove_cover=False, progress=None):
+    """直接修改已有 EPUB，未变化的条目原样复制，返回输出路径（默认覆盖原文件）
+
+    remove 为要删除的章节序号（从 1 开始，按修改前的 spine 顺序）；append 为
+    要追加的 TXT（按 "=== 标题 ===" 分章）或 XHTML 文件。progress 在每删除
+    一章、追加一个文件以及写出之前调用，在写出之前取消时原文件不变。
+    """
+    from converter.epubedit import EpubEditor
+    from converter.txt2html2 import Txt2Html
+    from converter.HTML2EPUB.ChapterIndex import find_first_h1
+
+    remove = sorted(set(remove))
+    append = list(append)
+    total = len(remove) + len(append) + 1      # 最后一步为写出
+    done = 0
+
+    def step():
+        nonlocal done
+        if progress is not None:
+            progress(done, total)
+        done += 1
+
+    with EpubEditor(epub_path) as editor:
+        chapters = editor.chapters()
+        for number in remove:
+            if not 1 <= number <= len(chapters):
+                raise ValueError(f"章节序号超出范围: {number}（共 {len(chapters)} 章）")
+        for number in remove:
+            step()
+            editor.remove_chapter(chapters[number - 1])
+        if remove_cover:
+            editor.remove_cover()
+        editor.set_metadata(title=title, creator=creator)
+        for path in append:
+            step()
+            if path.lower().endswith('.txt'):
+                for chapter_title, html in Txt2Html(path, None, os.path.basename(path)).chapters():
+                    editor.append_chapter(chapter_title, html)
+            else:
+                h1_element = find_first_h1(path)
+                chapter_title = h1_element.text if h1_element is not None else None
+                with open(path, 'rb') as f:
+                    editor.append_chapter(
+                        chapter_title or os.path.splitext(os.path.basename(path))[0],
+                        f.read(), filename=os.path.basename(path))
+        step()
+        output = editor.save(output)
+    if progress is not None:
+        try:
+            progress(total, total)
+        except Cancelled:
+            pass    # 已经写出，来得太晚的取消不再生效
+    return output
+
+
+def merge_epubs(epub_paths, output, title=None, creator=None, level=None, progress=None):
+    """按顺序把多本 EPUB 合并为一本，章节和资源原样复制，返回输出路径"""
+    from converter.epubmerge import merge_epubs as merge
+    from converter.epubpack import make_policy, DEFAULT_LEVEL
+
+    parent = os.path.dirname(os.path.abspath(output))
+    os.makedirs(parent, exist_ok=True)
+    return merge(epub_paths, output, title=title, creator=creator,
+                 policy=make_policy(DEFAULT_LEVEL if level is None else level), progress=progress)
+
+
+def split_epub(epub_path, output_dir, chapters=100, level=None, progress=None):
+    """按 spine 每 chapters 章把 EPUB 拆分为多本，返回各卷路径"""
+    from converter.epubmerge import split_epub as split
+    from converter.epubpack import make_policy, DEFAULT_LEVEL
+
+    return split(epub_path, output_dir, chapters,
+                 policy=make_policy(DEFAULT_LEVEL if level is None else level), progress=progress)
+
+
+def epub_to_txt(epub_path, output, titles=None, workers=None, engine='lxml', progress=None,
+                chapters=None):
+    """把 EPUB 转换为 TXT
+
+    chapters 为章节选择表达式（如 "1,3,5-8"、"第*章"、"re:^番外"，见
+    converter.chapterselect），titles 为章节标题列表；都为空时转换全部章节。
+    """
+    from converter.html2txt import EpubToTextConverter
+
+    parent = os.path.dirname(os.path.abspath(output))
+    os.makedirs(parent, exist_ok=True)
+    EpubToTextConverter(epub_path, engine=engine).convert(
+        target_titles=titles, output_path=output, workers=workers, progress=progress,
+        chapters=chapters)
+    return output
+
+
+def update_search_index(library, workers=None, progress=None):
+    """增量更新书库的全文索引，返回 (重建的书数, 删除的书数)"""
+    from converter.search import SearchIndex
+
+    with SearchIndex(library) as index:
+        return index.update(workers=workers, progress=progress)
+
+
+def scan_catalog(library, workers=None, progress=None):
+    """增量更新书库目录（元数据缓存），返回 (重新读取的书数, 删除的书数)"""
+    from converter.catalog import Catalog
+
+    with Catalog(library) as catalog:
+        return catalog.scan(workers=workers, progress=progress)
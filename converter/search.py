@@ -0,0 +1,377 @@
+"""EPUB 书库全文索引
+
+对书库目录中每本 EPUB 的每个章节建立倒排索引，保存在书库目录下的
+.search.sqlite 中：
+
+- 汉字（及假名、谚文）按相邻两字切分为二元词，每段连续汉字的最后一个字
+  另外单独成词，单字查询因此也能命中；ASCII 字母数字按单词切分并转小写
+- 每个 (词, 书) 一行，倒排表为紧凑的 uint32 数组：
+  [章节序号, 出现次数, 偏移...] 重复，偏移为章节正文（与 EPUB 转 TXT
+  的输出相同）中的字符位置
+- 按书的大小与修改时间增量更新，新增或变化的书在进程池中并行解析
+  （spawn 方式启动工作进程，不继承调用方的线程；界面中以 workers=1 在
+  工作线程内直接解析）
+
+查询语法：空格分隔的词须同时出现在同一章节（AND），OR 连接多组条件，
+引号内为短语；连续的汉字本身即按短语匹配。
+"""
+import os
+import re
+import sqlite3
+import sys
+import time
+import zipfile
+import xml.etree.ElementTree as ET
+from array import array
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+
+from converter.epubarchive import EpubArchive
+
+
+INDEX_NAME = '.search.sqlite'
+DEFAULT_LIBRARY = os.path.join('primary fileSet', 'epub')
+CACHE_KB = 64 * 1024
+COMMIT_INTERVAL = 2.0   # 秒；建立索引时多本书合并为一个事务提交
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS books (
+    id        INTEGER PRIMARY KEY,
+    name      TEXT UNIQUE NOT NULL,  -- 相对书库目录的文件名
+    title     TEXT,
+    size      INTEGER,
+    mtime_ns  INTEGER
+);
+CREATE TABLE IF NOT EXISTS chapters (
+    book_id   INTEGER,
+    seq       INTEGER,               -- spine 中的序号
+    name      TEXT,                  -- 归档内路径
+    title     TEXT,
+    PRIMARY KEY (book_id, seq)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS postings (
+    term      TEXT,
+    book_id   INTEGER,
+    data      BLOB,
+    PRIMARY KEY (term, book_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_book ON postings(book_id);
+'''
+
+CJK_RANGES = ('぀-ヿ㐀-䶿一-鿿가-힯'
+              '豈-﫿\U00020000-\U0003134f')
+TOKEN = re.compile(f'[{CJK_RANGES}]+|[0-9A-Za-z]+')
+QUERY_PART = re.compile(r'"([^"]*)"|(\S+)')
+
+
+def tokenize(text):
+    """产出 (词, 字符偏移)"""
+    for match in TOKEN.finditer(text):
+        run = match.group()
+        start = match.start()
+        if run[0].isascii():
+            yield run.lower(), start
+            continue
+        for i in range(len(run) - 1):
+            yield run[i:i + 2], start + i
+        yield run[-1], start + len(run) - 1
+
+
+def _encode(chapters):
+    data = array('I')
+    for seq, offsets in chapters.items():
+        data.append(seq)
+        data.append(len(offsets))
+        data.extend(offsets)
+    if sys.byteorder == 'big':
+        data.byteswap()
+    return data.tobytes()
+
+
+def _decode(blob):
+    data = array('I')
+    data.frombytes(blob)
+    if sys.byteorder == 'big':
+        data.byteswap()
+    chapters = {}
+    i = 0
+    while i < len(data):
+        seq, count = data[i], data[i + 1]
+        chapters[seq] = data[i + 2:i + 2 + count]
+        i += 2 + count
+    return chapters
+
+
+def index_book(epub_path):
+    """进程池任务：解析一本书，返回 (书名, [(序号, 路径, 章节标题)], {词: 倒排数组})"""
+    from converter.html2txt import extract_chapter, parse_errors
+
+    errors = parse_errors()
+    postings = defaultdict(lambda: defaultdict(list))
+    chapters = []
+    with EpubArchive(epub_path) as archive:
+        title = archive.title
+        for seq, name in enumerate(archive.spine_paths()):
+            try:
+                with archive.open(name) as f:
+                    chapter_title, text = extract_chapter(f)
+            except errors as e:
+                print(f"解析文件 {name} 失败: {e}")
+                continue
+            chapters.append((seq, name, chapter_title))
+            for term, offset in tokenize(text):
+                postings[term][seq].append(offset)
+    return title, chapters, {term: _encode(by_chapter) for term, by_chapter in postings.items()}
+
+
+def is_prefix_term(term):
+    """单个汉字只在汉字段末尾单独成词，查询时按前缀匹配所有以它开头的词"""
+    return len(term) == 1 and not term.isascii()
+
+
+def parse_query(query):
+    """解析为 OR 连接的若干组，每组是须同时满足的短语列表
+
+    短语是 [(词, 相对偏移)]；单个汉字（is_prefix_term）按前缀匹配，因此
+    "中 文" 这类由单字组成的短语中每个字都参与匹配。
+    """
+    groups = [[]]
+    for match in QUERY_PART.finditer(query):
+        phrase, word = match.groups()
+        if word == 'OR':
+            if groups[-1]:
+                groups.append([])
+            continue
+        text = phrase if phrase is not None else word
+        tokens = list(tokenize(text))
+        if not tokens:
+            continue
+        base = tokens[0][1]
+        terms = []
+        for i, (term, offset) in enumerate(tokens):
+            if is_prefix_term(term) and i and tokens[i - 1][1] == offset - 1 \
+                    and not tokens[i - 1][0].isascii():
+                continue    # 汉字段末尾的单字已被前一个二元词覆盖
+            terms.append((term, offset - base))
+        groups[-1].append(terms)
+    return [group for group in groups if group]
+
+
+class SearchIndex:
+    def __init__(self, library=DEFAULT_LIBRARY, db_path=None):
+        self.library = library
+        self.db_path = db_path or os.path.join(library, INDEX_NAME)
+        self.conn = sqlite3.connect(self.db_path)
+        # WAL 下提交不必每次同步写盘，查询也不会被更新阻塞
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute(f'PRAGMA cache_size=-{CACHE_KB}')
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---- 建立与更新 ----
+
+    def _scan(self):
+        books = {}
+        if os.path.isdir(self.library):
+            for entry in os.scandir(self.library):
+                if entry.is_file() and entry.name.lower().endswith('.epub'):
+                    st = entry.stat()
+                    books[entry.name] = (st.st_size, st.st_mtime_ns)
+        return books
+
+    def _delete(self, book_id):
+        self.conn.execute('DELETE FROM postings WHERE book_id = ?', (book_id,))
+        self.conn.execute('DELETE FROM chapters WHERE book_id = ?', (book_id,))
+        self.conn.execute('DELETE FROM books WHERE id = ?', (book_id,))
+
+    def _store(self, name, stat, result):
+        """写入一本书（不提交），同名的旧记录先删除"""
+        title, chapters, postings = result
+        row = self.conn.execute('SELECT id FROM books WHERE name = ?', (name,)).fetchone()
+        if row is not None:
+            self._delete(row[0])
+        book_id = self.conn.execute(
+            'INSERT INTO books (name, title, size, mtime_ns) VALUES (?, ?, ?, ?)',
+            (name, title, stat[0], stat[1])).lastrowid
+        self.conn.executemany(
+            'INSERT INTO chapters (book_id, seq, name, title) VALUES (?, ?, ?, ?)',
+            [(book_id, seq, path, chapter_title) for seq, path, chapter_title in chapters])
+        self.conn.executemany(
+            'INSERT INTO postings (term, book_id, data) VALUES (?, ?, ?)',
+            [(term, book_id, postings[term]) for term in sorted(postings)])
+
+    def update(self, workers=None, progress=None):
+        """增量更新索引，返回 (重建的书数, 删除的书数)
+
+        progress(已完成, 总数) 在每本书入库后调用；取消或出错时已入库的书会提交，
+        下次更新从剩下的书继续。单本书不是有效的 zip 或 OPF 时跳过该书（不计入
+        重建数，下次更新时重试）；工作进程崩溃等其他异常直接抛出。
+        """
+        current = self._scan()
+        indexed = {name: (book_id, (size, mtime_ns)) for book_id, name, size, mtime_ns
+                   in self.conn.execute('SELECT id, name, size, mtime_ns FROM books')}
+        removed = [book_id for name, (book_id, _) in indexed.items() if name not in current]
+        changed = [name for name, stat in current.items()
+                   if name not in indexed or indexed[name][1] != stat]
+        with self.conn:
+            for book_id in removed:
+                self._delete(book_id)
+
+        total = len(changed)
+        if progress is not None:
+            progress(0, total)
+        self._last_commit = time.monotonic()
+        stored = 0
+        try:
+            if workers == 1 or total <= 1:
+                for done, name in enumerate(changed, 1):
+                    stored += self._store_one(name, current[name], index_book,
+                                              os.path.join(self.library, name))
+                    if progress is not None:
+                        progress(done, total)
+            else:
+                with ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn')) as pool:
+                    futures = {pool.submit(index_book, os.path.join(self.library, name)): name
+                               for name in changed}
+                    try:
+                        for done, future in enumerate(as_completed(futures), 1):
+                            name = futures[future]
+                            stored += self._store_one(name, current[name], future.result)
+                            if progress is not None:
+                                progress(done, total)
+                    except BaseException:
+                        # 取消时丢弃尚未开始的书
+                        for future in futures:
+                            future.cancel()
+                        raise
+        finally:
+            self.conn.commit()
+        return stored, len(removed)
+
+    def _store_one(self, name, stat, func, *args):
+        """解析并写入一本书，返回是否已入库"""
+        try:
+            result = func(*args)
+        except (zipfile.BadZipFile, ET.ParseError) as e:
+            print(f"索引 {name} 失败: {e}")
+            return False
+        try:
+            self._store(name, stat, result)
+        except BaseException:
+            # 不提交写了一半的书（同一批次中的其他书下次更新时重建）
+            self.conn.rollback()
+            raise
+        if time.monotonic() - self._last_commit >= COMMIT_INTERVAL:
+            self.conn.commit()
+            self._last_commit = time.monotonic()
+        return True
+
+    # ---- 查询 ----
+
+    def _term_postings(self, term):
+        """{book_id: 原始倒排数据列表}；单字按前缀匹配所有以它开头的词"""
+        if is_prefix_term(term[0]):
+            rows = self.conn.execute(
+                'SELECT book_id, data FROM postings WHERE term >= ? AND term < ?',
+                (term[0], term[0] + '\U0010ffff'))
+        else:
+            rows = self.conn.execute(
+                'SELECT book_id, data FROM postings WHERE term = ?', (term[0],))
+        result = defaultdict(list)
+        for book_id, data in rows:
+            result[book_id].append(data)
+        return result
+
+    @staticmethod
+    def _merge(blobs):
+        if len(blobs) == 1:
+            return _decode(blobs[0])
+        merged = defaultdict(list)
+        for blob in blobs:
+            for seq, offsets in _decode(blob).items():
+                merged[seq].extend(offsets)
+        return merged
+
+    def _phrase(self, phrase, books=None):
+        """{(book_id, 章节序号): 短语起点列表}，books 不为 None 时只考虑这些书"""
+        postings = [self._term_postings(term) for term in phrase]
+        candidates = set.intersection(*(set(p) for p in postings))
+        if books is not None:
+            candidates &= books
+        hits = {}
+        for book_id in candidates:
+            maps = [self._merge(p[book_id]) for p in postings]
+            for seq in set.intersection(*(set(m) for m in maps)):
+                starts = set(maps[0][seq])
+                for (_, delta), m in zip(phrase[1:], maps[1:]):
+                    starts &= {offset - delta for offset in m[seq]}
+                    if not starts:
+                        break
+                if starts:
+                    hits[(book_id, seq)] = sorted(starts)
+        return hits
+
+    def search(self, query, limit=200):
+        """返回命中列表，每项含 path/book/chapter/chapter_title/seq/offset"""
+        found = {}
+        for group in parse_query(query):
+            group_hits = None
+            for phrase in group:
+                books = None if group_hits is None else {key[0] for key in group_hits}
+                hits = self._phrase(phrase, books)
+                if group_hits is None:
+                    group_hits = hits
+                else:
+                    group_hits = {key: offsets for key, offsets in group_hits.items() if key in hits}
+                if not group_hits:
+                    break
+            for key, offsets in (group_hits or {}).items():
+                found.setdefault(key, set()).update(offsets)
+
+        results = []
+        books = {}
+        for (book_id, seq) in sorted(found):
+            if book_id not in books:
+                books[book_id] = self.conn.execute(
+                    'SELECT name, title FROM books WHERE id = ?', (book_id,)).fetchone()
+            name, title = books[book_id]
+            chapter, chapter_title = self.conn.execute(
+                'SELECT name, title FROM chapters WHERE book_id = ? AND seq = ?',
+                (book_id, seq)).fetchone()
+            for offset in sorted(found[(book_id, seq)]):
+                results.append({
+                    'path': os.path.join(self.library, name),
+                    'book': title,
+                    'chapter': chapter,
+                    'chapter_title': chapter_title,
+                    'seq': seq,
+                    'offset': offset
+                })
+                if len(results) >= limit:
+                    return results
+        return results
+
+
+def snippet(hit, width=30, cache=None):
+    """命中位置前后 width 个字符的正文，cache 可在多次调用间复用已解析的章节"""
+    from converter.html2txt import extract_chapter
+
+    key = (hit['path'], hit['chapter'])
+    text = cache.get(key) if cache is not None else None
+    if text is None:
+        with EpubArchive(hit['path']) as archive, archive.open(hit['chapter']) as f:
+            text = extract_chapter(f)[1]
+        if cache is not None:
+            cache[key] = text
+    start = max(0, hit['offset'] - width)
+    return text[start:hit['offset'] + width].replace('\n', ' ')
@@ -1,45 +1,66 @@
 import os
 import re
 
+from converter import instrument
+from converter.HTML2EPUB.ChapterIndex import ChapterIndex
+from converter.encoding import detect_encoding
+
 class Txt2Html:
-    def __init__(self, input_file, output_dir,filename):
+    def __init__(self, input_file, output_dir,filename,index=None):
         self.input_file = input_file
         self.output_dir = output_dir
         self.filename = filename
-        os.makedirs(output_dir, exist_ok=True)
+        # 可选的框架章节索引，写出章节时同步登记
+        self.index = index
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
 
-    def parse(self):
-        with open(self.input_file, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        sections = self._split_sections(content)
-        for title, body in sections:
-            html_content = self._generate_html(title, body)
-            self._write_file(title, html_content)
+    def parse(self, progress=None):
+        """progress(已读字节, 总字节) 在每写出一章后调用"""
+        total = os.path.getsize(self.input_file)
+        with instrument.span('txt2html.parse', input=self.input_file, bytes_in=total) as s:
+            with s.timer('detect'):
+                encoding = detect_encoding(self.input_file)
+            # 逐行读取，每读完一章立即渲染并写出，内存占用只与最大的一章有关
+            with open(self.input_file, 'r', encoding=encoding) as f:
+                for title, body in self._iter_sections(f):
+                    with s.timer('render'):
+                        html_content = self._generate_html(title, body)
+                    with s.timer('write'):
+                        self._write_file(title, html_content)
+                    s.add(items=1, bytes_out=len(html_content.encode('utf-8')))
+                    if progress is not None:
+                        progress(min(f.buffer.tell(), total), total)
 
-    def _split_sections(self, content):
-        pattern = r'^=== (.*?) ===$'
-        sections = []
+    def chapters(self):
+        """逐章产出 (标题, XHTML 文本)，不写文件"""
+        with open(self.input_file, 'r', encoding=detect_encoding(self.input_file)) as f:
+            for title, body in self._iter_sections(f):
+                yield title, self._generate_html(title, body)
+
+    def _iter_sections(self, lines):
+        """按 "=== 标题 ===" 边界逐章产出 (标题, 行列表)"""
+        pattern = re.compile(r'^=== (.*?) ===$')
         current_title = None
         current_body = []
-        
-        for line in content.splitlines():
-            match = re.match(pattern, line)
-            if match:
-                if current_title is not None:
-                    sections.append((current_title, current_body))
-                current_title = match.group(1)
-                current_body = []
-            else:
-                current_body.append(line)
-        
+
+        for raw_line in lines:
+            for line in raw_line.splitlines():
+                match = pattern.match(line)
+                if match:
+                    if current_title is not None:
+                        yield current_title, current_body
+                    current_title = match.group(1)
+                    current_body = []
+                else:
+                    current_body.append(line)
+
         if current_title is not None:
-            sections.append((current_title, current_body))
-    
-        if not sections:
+            yield current_title, current_body
+        else:
+            # 没有任何标题时，整个文件作为一章，以文件名为标题
             title = os.path.splitext(os.path.basename(self.filename))[0]
-            return [(title, content.splitlines())]
-        return sections
+            yield title, current_body
 
     def _generate_html(self, title, body):
         filtered = [line.rstrip('\n') for line in body]
@@ -78,6 +99,7 @@ class Txt2Html:
         if paragraph:
             elements.append(f'<p>{"".join(paragraph)}</p>')
         
+        body_html = "\n        ".join(elements)
         return f'''<?xml version="1.0" encoding="utf-8"?>
 <html xmlns="http://www.w3.org/1999/xhtml">
 <head><title>{title}</title>
@@ -85,7 +107,7 @@ class Txt2Html:
 <body>
     <section class="chapter">
         <h1>{title}</h1>
-        {"\n        ".join(elements)}
+        {body_html}
     </section>
 </body>
 </html>'''
@@ -95,12 +117,17 @@ class Txt2Html:
         path = os.path.join(self.output_dir, filename)
         with open(path, 'w', encoding='utf-8') as f:
             f.write(content)
+        if self.index is not None:
+            self.index.record(path, title)
 
-def MaindeTxt2Html(input_file, output_file):
+def MaindeTxt2Html(input_file, output_file, progress=None):
     inp = os.path.join('primary fileSet','txt',str(input_file))
-    o = os.path.join('converter','HTML2EPUB','Interim Warehouse',str(output_file),'OEBPS','text')
-    converter = Txt2Html(inp,o,str(input_file))
-    converter.parse()
+    framework = os.path.join('converter','HTML2EPUB','Interim Warehouse',str(output_file))
+    o = os.path.join(framework,'OEBPS','text')
+    os.makedirs(o, exist_ok=True)
+    with ChapterIndex(framework) as index:
+        converter = Txt2Html(inp,o,str(input_file),index=index)
+        converter.parse(progress=progress)
 
 
 # 使用示例
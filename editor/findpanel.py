@@ -0,0 +1,339 @@
+"""文本编辑器的查找/替换面板
+
+输入后稍作延迟，在后台线程对全文快照做一次 finditer，得到全部匹配的
+起止位置数组（Qt 文档的 UTF-16 位置，已排序）。之后：
+- 上一个/下一个在数组上二分查找，不再重新扫描
+- 只给可见区域内的匹配加高亮，滚动时按可见范围重新取
+- 全部替换在同一个编辑块内逐个写回，撤销一步即可还原，文档（及自动
+  保存日志）只收到一次变化通知
+文档被编辑后快照作废，面板可见时自动重新搜索。
+"""
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+
+from PyQt6.QtCore import Qt, QObject, QRunnable, QThreadPool, QTimer, QPoint, pyqtSignal
+from PyQt6.QtGui import QColor, QKeySequence, QShortcut, QTextCursor, QTextCharFormat
+from PyQt6.QtWidgets import (
+    QWidget, QLineEdit, QPushButton, QCheckBox, QLabel, QHBoxLayout, QVBoxLayout, QTextEdit
+)
+
+
+SEARCH_DELAY = 150          # 毫秒，输入停顿后才开始搜索
+MAX_HIGHLIGHTS = 2000       # 可见区域内最多高亮的匹配数
+ASTRAL = re.compile('[\U00010000-\U0010ffff]')
+
+
+def _to_utf16(positions, astral):
+    """把字符位置换算为 UTF-16 位置：每个位于其前的辅助平面字符多占一个单位"""
+    if not astral:
+        return positions
+    return array('q', (p + bisect_left(astral, p) for p in positions))
+
+
+class SearchSignals(QObject):
+    finished = pyqtSignal(int, object, object)     # 代号, 起点数组, 终点数组
+
+
+class SearchTask(QRunnable):
+    """在全文快照中查找全部匹配；代号过期时中途放弃"""
+    def __init__(self, generation, text, pattern, current):
+        super().__init__()
+        self.generation = generation
+        self.text = text
+        self.pattern = pattern
+        self.current = current
+        self.signals = SearchSignals()
+
+    def run(self):
+        starts = array('q')
+        ends = array('q')
+        for i, match in enumerate(self.pattern.finditer(self.text)):
+            if not i & 0x3ff and self.current() != self.generation:
+                return
+            start, end = match.span()
+            if start != end:    # 空匹配无法高亮也无法跳转
+                starts.append(start)
+                ends.append(end)
+        if self.current() != self.generation:
+            return
+        astral = [m.start() for m in ASTRAL.finditer(self.text)]
+        self.signals.finished.emit(self.generation, _to_utf16(starts, astral),
+                                   _to_utf16(ends, astral))
+
+
+class FindPanel(QWidget):
+    """附着在一个 QTextEdit/QPlainTextEdit 上的查找替换面板"""
+    status = pyqtSignal(str)
+
+    def __init__(self, editor, parent=None):
+        super().__init__(parent)
+        self.editor = editor
+        self.generation = 0
+        self.starts = array('q')
+        self.ends = array('q')
+        self.current = -1
+        self._text = None           # 全文快照，文档变化后作废
+        self._pending = None        # 结果到达后要执行的跳转：'next' / 'prev' / 'nearest'
+        self._running = False
+        self._task = None
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+
+        self.find_edit = QLineEdit()
+        self.find_edit.setPlaceholderText("查找")
+        self.find_edit.textChanged.connect(lambda: self.schedule('nearest'))
+        self.find_edit.returnPressed.connect(self.find_next)
+        self.regex_box = QCheckBox("正则")
+        self.regex_box.toggled.connect(lambda: self.schedule('nearest'))
+        self.case_box = QCheckBox("区分大小写")
+        self.case_box.setChecked(True)
+        self.case_box.toggled.connect(lambda: self.schedule('nearest'))
+        prev_btn = QPushButton("上一个")
+        prev_btn.clicked.connect(self.find_previous)
+        next_btn = QPushButton("下一个")
+        next_btn.clicked.connect(self.find_next)
+        self.count_label = QLabel()
+        close_btn = QPushButton("关闭")
+        close_btn.clicked.connect(self.hide)
+
+        self.replace_edit = QLineEdit()
+        self.replace_edit.setPlaceholderText(r"替换为（正则模式下可用 \1、\g<name>）")
+        replace_btn = QPushButton("替换")
+        replace_btn.clicked.connect(self.replace_current)
+        replace_all_btn = QPushButton("全部替换")
+        replace_all_btn.clicked.connect(self.replace_all)
+
+        find_row = QHBoxLayout()
+        for widget in (self.find_edit, prev_btn, next_btn, self.regex_box, self.case_box,
+                       self.count_label, close_btn):
+            find_row.addWidget(widget)
+        replace_row = QHBoxLayout()
+        for widget in (self.replace_edit, replace_btn, replace_all_btn):
+            replace_row.addWidget(widget)
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addLayout(find_row)
+        layout.addLayout(replace_row)
+        self.setLayout(layout)
+
+        escape = QShortcut(QKeySequence("Escape"), self)
+        escape.setContext(Qt.ShortcutContext.WidgetWithChildrenShortcut)
+        escape.activated.connect(self.hide)
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.start_search)
+        self.highlight_format = QTextCharFormat()
+        self.highlight_format.setBackground(QColor(255, 230, 120))
+        self.current_format = QTextCharFormat()
+        self.current_format.setBackground(QColor(255, 150, 50))
+
+        editor.document().contentsChanged.connect(self._document_changed)
+        editor.verticalScrollBar().valueChanged.connect(self.update_highlights)
+
+    # ---- 搜索 ----
+
+    def open(self):
+        """显示面板，选中的文本（单行时）作为查找内容"""
+        selected = self.editor.textCursor().selectedText()
+        if selected and ' ' not in selected:
+            self.find_edit.setText(selected)
+        self.show()
+        self.find_edit.setFocus()
+        self.find_edit.selectAll()
+        self.schedule('nearest')
+
+    def hideEvent(self, event):
+        self.generation += 1
+        self.timer.stop()
+        self.pool.clear()
+        self._running = False
+        self._text = None
+        self.starts, self.ends, self.current = array('q'), array('q'), -1
+        self.editor.setExtraSelections([])
+        super().hideEvent(event)
+
+    def pattern(self):
+        """当前查找条件编译出的正则；为空或有语法错误时返回 None"""
+        text = self.find_edit.text()
+        if not text:
+            return None
+        flags = 0 if self.case_box.isChecked() else re.IGNORECASE
+        try:
+            return re.compile(text if self.regex_box.isChecked() else re.escape(text), flags)
+        except re.error as e:
+            self.count_label.setText(f"正则错误: {e}")
+            return None
+
+    def snapshot(self):
+        # toPlainText 把段落分隔符换成 \n，位置与文档一一对应
+        if self._text is None:
+            self._text = self.editor.toPlainText()
+        return self._text
+
+    def schedule(self, pending=None):
+        if not self.isVisible():
+            return
+        if pending is not None:
+            self._pending = pending
+        self.timer.start(SEARCH_DELAY)
+
+    def start_search(self):
+        self.generation += 1
+        self.pool.clear()
+        self.starts, self.ends, self.current = array('q'), array('q'), -1
+        self._running = False
+        pattern = self.pattern()
+        if pattern is None:
+            if not self.find_edit.text():
+                self.count_label.clear()
+            self.editor.setExtraSelections([])
+            return
+        self.count_label.setText("搜索中…")
+        task = SearchTask(self.generation, self.snapshot(), pattern, lambda: self.generation)
+        task.signals.finished.connect(self._search_finished)
+        self._running = True
+        self._task = task       # 保持信号对象存活到结果送达
+        self.pool.start(task)
+
+    def _search_finished(self, generation, starts, ends):
+        if generation != self.generation:
+            return
+        self.starts, self.ends = starts, ends
+        self._running = False
+        pending, self._pending = self._pending, None
+        if pending == 'nearest':
+            self._select(self._index_from(self.editor.textCursor().selectionStart()))
+        elif pending == 'next':
+            self.find_next()
+        elif pending == 'prev':
+            self.find_previous()
+        else:
+            self._update_count()
+            self.update_highlights()
+
+    def _document_changed(self):
+        self._text = None
+        self.schedule()
+
+    def _searching(self):
+        return self.timer.isActive() or self._running
+
+    # ---- 跳转 ----
+
+    def _index_from(self, position):
+        """位置之后（含）的第一个匹配，没有时回到第一个"""
+        if not self.starts:
+            return -1
+        i = bisect_left(self.starts, position)
+        return i if i < len(self.starts) else 0
+
+    def find_next(self):
+        if self._searching():
+            self._pending = 'next'
+            return
+        cursor = self.editor.textCursor()
+        self._select(self._index_from(cursor.selectionStart() + (1 if cursor.hasSelection() else 0)))
+
+    def find_previous(self):
+        if self._searching():
+            self._pending = 'prev'
+            return
+        if not self.starts:
+            self._select(-1)
+            return
+        i = bisect_left(self.starts, self.editor.textCursor().selectionStart()) - 1
+        self._select(i if i >= 0 else len(self.starts) - 1)
+
+    def _select(self, i):
+        self.current = i
+        if i >= 0:
+            cursor = self.editor.textCursor()
+            cursor.setPosition(self.starts[i])
+            cursor.setPosition(self.ends[i], QTextCursor.MoveMode.KeepAnchor)
+            self.editor.setTextCursor(cursor)
+            self.editor.ensureCursorVisible()
+        self._update_count()
+        self.update_highlights()
+
+    def _update_count(self):
+        if not self.starts:
+            self.count_label.setText("无匹配")
+        elif self.current >= 0:
+            self.count_label.setText(f"{self.current + 1}/{len(self.starts)}")
+        else:
+            self.count_label.setText(f"{len(self.starts)} 个匹配")
+
+    def update_highlights(self):
+        """只给可见区域内的匹配加高亮"""
+        if not self.isVisible() or not self.starts:
+            self.editor.setExtraSelections([])
+            return
+        viewport = self.editor.viewport()
+        top = self.editor.cursorForPosition(QPoint(0, 0)).position()
+        bottom = self.editor.cursorForPosition(QPoint(viewport.width(), viewport.height())).position()
+        lo = bisect_right(self.ends, top)
+        hi = min(bisect_right(self.starts, bottom), lo + MAX_HIGHLIGHTS)
+        selections = []
+        for i in range(lo, hi):
+            selection = QTextEdit.ExtraSelection()
+            selection.cursor = QTextCursor(self.editor.document())
+            selection.cursor.setPosition(self.starts[i])
+            selection.cursor.setPosition(self.ends[i], QTextCursor.MoveMode.KeepAnchor)
+            selection.format = self.current_format if i == self.current else self.highlight_format
+            selections.append(selection)
+        self.editor.setExtraSelections(selections)
+
+    # ---- 替换 ----
+
+    def _replacement(self, match):
+        if self.regex_box.isChecked():
+            return match.expand(self.replace_edit.text())
+        return self.replace_edit.text()
+
+    def replace_current(self):
+        """替换当前选中的匹配并跳到下一个"""
+        cursor = self.editor.textCursor()
+        pattern = self.pattern()
+        if pattern is None or not cursor.hasSelection():
+            self.find_next()
+            return
+        match = pattern.fullmatch(cursor.selectedText().replace('\u2029', '\n'))
+        if match is None:
+            self.find_next()
+            return
+        cursor.insertText(self._replacement(match))
+        self._pending = 'next'
+
+    def replace_all(self):
+        """全部替换，作为一个编辑块写回：撤销一步即可还原"""
+        pattern = self.pattern()
+        if pattern is None:
+            return
+        text = self.snapshot()
+        template = self.replace_edit.text()
+        # 替换文本不含转义时不必逐个展开模板
+        expand = self.regex_box.isChecked() and '\\' in template
+        try:
+            edits = [(match.start(), match.end(), match.expand(template) if expand else template)
+                     for match in pattern.finditer(text)]
+        except (re.error, IndexError) as e:
+            self.status.emit(f"替换失败: {e}")
+            return
+        if not edits:
+            self.status.emit("没有可替换的内容")
+            return
+        astral = [m.start() for m in ASTRAL.finditer(text)]
+        cursor = QTextCursor(self.editor.document())
+        cursor.beginEditBlock()
+        # 从后往前替换，前面的位置不受影响；编辑块结束时文档只发出一次变化通知
+        for start, end, replacement in reversed(edits):
+            if astral:
+                start += bisect_left(astral, start)
+                end += bisect_left(astral, end)
+            cursor.setPosition(start)
+            cursor.setPosition(end, QTextCursor.MoveMode.KeepAnchor)
+            cursor.insertText(replacement)
+        cursor.endEditBlock()
+        self.status.emit(f"已替换 {len(edits)} 处")
@@ -0,0 +1,203 @@
+"""文本编辑器的追加式自动保存日志
+
+每次编辑只向日志追加一行 [位置, 删除长度, 插入文本]（位置与长度以 Qt
+文档的 UTF-16 单位计），开销只与编辑大小有关。隔较长时间做一次检查点：
+在后台线程把全文写入临时文件再原子替换原文件，然后用新的基准重写日志。
+
+日志文件（与文本同目录的 .<文件名>.journal）格式为 JSON 行：
+    {"v": 1, "base": [size, mtime_ns], "kind": "text"}   头：操作所基于的文件状态
+    [pos, removed, "text"]                 一次编辑
+    [first, count, ["行", ...]]            大文件模式（kind 为 "lines"）的一次按行替换
+    {"checkpoint": k}                      第 k 次检查点的快照位置
+    {"commit": k, "size": n}               快照即将替换原文件，写入后文件大小为 n
+
+启动时若日志的基准与文件一致，重放全部编辑；若文件已被第 k 次检查点替换
+（大小等于 commit 记录）而日志尚未重写，只重放 checkpoint k 之后的编辑。
+大文件模式不做检查点，日志一直保留到手动保存为止。
+"""
+import json
+import os
+import threading
+import time
+
+
+JOURNAL_VERSION = 1
+CHECKPOINT_INTERVAL = 300           # 秒
+CHECKPOINT_BYTES = 4 * 1024 * 1024  # 日志超过该大小时提前做检查点
+
+
+def journal_path(path):
+    folder, name = os.path.split(os.path.abspath(path))
+    return os.path.join(folder, f'.{name}.journal')
+
+
+def _stat_key(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _open_journal(path, mode):
+    return open(path, mode, encoding='utf-8', errors='surrogatepass', newline='\n')
+
+
+def _dumps(record):
+    return json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+def read_journal(path, kind='text'):
+    """读取 path 的日志，返回需要在当前文件内容上重放的编辑列表；没有可用日志时返回 []
+
+    kind 与日志头不符（文本模式与大文件模式的日志）时同样返回 []。
+    """
+    try:
+        f = _open_journal(journal_path(path), 'r')
+    except FileNotFoundError:
+        return []
+    with f:
+        lines = f.read().split('\n')
+    records = []
+    for line in lines:
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            break   # 崩溃时写了一半的最后一行
+    if not records or not isinstance(records[0], dict) or records[0].get('v') != JOURNAL_VERSION:
+        return []
+    if records[0].get('kind', 'text') != kind:
+        return []
+
+    try:
+        current = _stat_key(path)
+    except FileNotFoundError:
+        return []
+    if records[0]['base'] == current:
+        start = 1
+    else:
+        # 基准不一致：只有检查点已替换文件、日志还没来得及重写时才能恢复
+        commits = [r for r in records if isinstance(r, dict) and 'commit' in r]
+        if not commits or commits[-1]['size'] != current[0]:
+            return []
+        marker = {'checkpoint': commits[-1]['commit']}
+        start = records.index(marker) + 1
+    return [tuple(r) for r in records[start:] if isinstance(r, list)]
+
+
+class EditJournal:
+    """单个文本文件的编辑日志，record/checkpoint 在 GUI 线程调用"""
+
+    def __init__(self, path, encoding='utf-8', kind='text'):
+        self.path = os.path.abspath(path)
+        self.encoding = encoding
+        self.kind = kind
+        self.journal_path = journal_path(path)
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.error = None
+        self._file = None
+        self._pending = None        # 检查点进行中时，快照之后的编辑
+        self._checkpoints = 0
+        self._thread = None
+        self._last_checkpoint = time.monotonic()
+
+    def start(self):
+        """以文件当前内容为基准开始新的日志（打开或手动保存之后调用）"""
+        self.wait()
+        with self.lock:
+            if self._file is not None:
+                self._file.close()
+            self._file = _open_journal(self.journal_path, 'w')
+            self._file.write(_dumps(self._header()))
+            self._file.flush()
+            self.dirty = False
+            self._last_checkpoint = time.monotonic()
+
+    def _header(self):
+        return {'v': JOURNAL_VERSION, 'base': _stat_key(self.path), 'kind': self.kind}
+
+    def record(self, position, removed, text):
+        with self.lock:
+            line = _dumps([position, removed, text])
+            self._file.write(line)
+            self._file.flush()
+            if self._pending is not None:
+                self._pending.append(line)
+            self.dirty = True
+
+    def due(self):
+        """是否应该做检查点：有新编辑，且间隔足够长或日志过大"""
+        if not self.dirty or self.busy():
+            return False
+        return (time.monotonic() - self._last_checkpoint >= CHECKPOINT_INTERVAL
+                or self._file.tell() >= CHECKPOINT_BYTES)
+
+    def busy(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def checkpoint(self, text):
+        """记录快照位置，在后台线程把 text 原子写入文件并压缩日志"""
+        if self.busy():
+            return False
+        with self.lock:
+            self._checkpoints += 1
+            self._file.write(_dumps({'checkpoint': self._checkpoints}))
+            self._file.flush()
+            self._pending = []
+            self.dirty = False
+            self._last_checkpoint = time.monotonic()
+        self._thread = threading.Thread(target=self._write_checkpoint,
+                                        args=(text, self._checkpoints))
+        self._thread.start()
+        return True
+
+    def _write_checkpoint(self, text, number):
+        temp_path = self.path + '.tmp'
+        try:
+            with open(temp_path, 'w', encoding=self.encoding) as f:
+                f.write(text)
+                f.flush()
+                size = os.fstat(f.fileno()).st_size
+                os.fsync(f.fileno())
+            with self.lock:
+                self._file.write(_dumps({'commit': number, 'size': size}))
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                os.replace(temp_path, self.path)
+                # 用新基准重写日志，只保留快照之后的编辑
+                new_journal = self.journal_path + '.tmp'
+                with _open_journal(new_journal, 'w') as f:
+                    f.write(_dumps(self._header()))
+                    f.writelines(self._pending)
+                self._file.close()
+                os.replace(new_journal, self.journal_path)
+                self._file = _open_journal(self.journal_path, 'a')
+                self._pending = None
+        except Exception as e:
+            with self.lock:
+                if self._file.closed:
+                    self._file = _open_journal(self.journal_path, 'a')
+                self._pending = None
+                self.dirty = True
+                self.error = e
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def take_error(self):
+        """取出后台检查点的错误（没有时返回 None）"""
+        with self.lock:
+            error, self.error = self.error, None
+            return error
+
+    def wait(self):
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def close(self, remove=True):
+        """结束日志；remove 为 True 时删除日志文件（内容已保存或放弃）"""
+        self.wait()
+        with self.lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        if remove and os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
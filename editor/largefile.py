@@ -0,0 +1,249 @@
+"""大文件编辑模式的文本模型：内存映射 + 行偏移索引 + 按行的 piece table
+
+文件只映射到内存，不整体解码；行起始偏移按需增量扫描（后台线程同时
+把剩余部分扫描完），读取任意一段行的开销与文件大小无关。编辑以行为
+单位记录在 piece table 中，原文件在保存前保持不变。
+"""
+import mmap
+import os
+import re
+import threading
+from array import array
+from bisect import bisect_right
+
+
+INDEX_CHUNK = 4 * 1024 * 1024
+SAVE_BATCH = 10000      # 保存时每次写出的行数
+NEWLINE = re.compile(b'\n')
+
+
+class LineIndex:
+    """内存映射文件的行起始偏移，按块增量扫描，线程安全"""
+
+    def __init__(self, data):
+        self.data = data
+        self.size = len(data)
+        self.starts = array('q', [0])
+        self.scanned = 0
+        self.complete = self.size == 0
+        self.lock = threading.Lock()
+
+    def _scan_chunk(self):
+        end = min(self.scanned + INDEX_CHUNK, self.size)
+        self.starts.extend(m.end() for m in NEWLINE.finditer(self.data, self.scanned, end))
+        self.scanned = end
+        if end == self.size:
+            self.complete = True
+
+    def ensure(self, line):
+        """扫描到至少包含第 line 行的起点（或文件末尾）"""
+        with self.lock:
+            while not self.complete and len(self.starts) <= line + 1:
+                self._scan_chunk()
+
+    def scan_all(self):
+        while not self.complete:
+            with self.lock:
+                if not self.complete:
+                    self._scan_chunk()
+
+    def count(self):
+        """行数；扫描未完成时按已扫描部分的平均行长估算"""
+        if self.complete:
+            return len(self.starts)
+        if not self.scanned:
+            return 1
+        return max(len(self.starts), len(self.starts) * self.size // self.scanned)
+
+    def span(self, line):
+        """第 line 行的字节范围（不含换行符），超出文件时返回 None"""
+        self.ensure(line)
+        if line >= len(self.starts):
+            return None
+        start = self.starts[line]
+        end = self.starts[line + 1] - 1 if line + 1 < len(self.starts) else self.size
+        return start, end
+
+
+def _position(text, line, column, pos):
+    """text 从 (line, column) 开始时，下标 pos 处的 (行, 列)"""
+    newline = text.rfind('\n', 0, pos)
+    if newline < 0:
+        return line, column + pos
+    return line + text.count('\n', 0, pos), pos - newline - 1
+
+
+class LargeTextModel:
+    """按行访问与编辑的大文件文本"""
+
+    def __init__(self, path, encoding='utf-8'):
+        if not '\n'.encode(encoding).endswith(b'\n'):
+            raise ValueError(f"大文件模式不支持 {encoding} 编码")
+        self._open(path, encoding)
+
+    def _open(self, path, encoding):
+        self.path = path
+        self.encoding = encoding
+        self._file = open(path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        self.data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        self.index = LineIndex(self.data)
+        # 片段 (source, offset, count)：source 为 None 时引用原文件的行，否则是新行的列表
+        self.pieces = None
+        self._starts = None
+        self._total = None
+        self.modified = False
+
+    def start_indexing(self):
+        thread = threading.Thread(target=self.index.scan_all, daemon=True)
+        thread.start()
+        return thread
+
+    def line_count(self):
+        if self.pieces is None:
+            return self.index.count()
+        return self._total
+
+    def _original_line(self, n):
+        span = self.index.span(n)
+        if span is None:
+            return None
+        text = self.data[span[0]:span[1]].decode(self.encoding, errors='replace')
+        return text[:-1] if text.endswith('\r') else text
+
+    def lines(self, first, count):
+        """返回从 first 开始的至多 count 行"""
+        result = []
+        if self.pieces is None:
+            for n in range(first, first + count):
+                line = self._original_line(n)
+                if line is None:
+                    break
+                result.append(line)
+            return result
+        i = bisect_right(self._starts, first) - 1
+        line = first
+        while i < len(self.pieces) and len(result) < count:
+            source, offset, n = self.pieces[i]
+            k = line - self._starts[i]
+            take = min(n - k, count - len(result))
+            if source is None:
+                result.extend(self._original_line(offset + k + j) for j in range(take))
+            else:
+                result.extend(source[offset + k:offset + k + take])
+            line += take
+            i += 1
+        return result
+
+    def _rebuild(self):
+        self._starts = []
+        total = 0
+        for _, _, n in self.pieces:
+            self._starts.append(total)
+            total += n
+        self._total = total
+
+    def _split(self, line):
+        """保证第 line 行处是片段边界，返回从该处开始的片段下标"""
+        if line >= self._total:
+            return len(self.pieces)
+        i = bisect_right(self._starts, line) - 1
+        k = line - self._starts[i]
+        if k == 0:
+            return i
+        source, offset, n = self.pieces[i]
+        self.pieces[i:i + 1] = [(source, offset, k), (source, offset + k, n - k)]
+        self._rebuild()
+        return i + 1
+
+    def replace_lines(self, first, count, new_lines):
+        """用 new_lines 替换从 first 开始的 count 行"""
+        if self.pieces is None:
+            # 第一次编辑前需要完整的行数
+            self.index.scan_all()
+            self.pieces = [(None, 0, len(self.index.starts))]
+            self._rebuild()
+        i = self._split(first)
+        j = self._split(first + count)
+        self.pieces[i:j] = [(list(new_lines), 0, len(new_lines))] if new_lines else []
+        self._rebuild()
+        self.modified = True
+
+    def _original_text(self, first, count):
+        """原文件中连续若干行的文本，整块解码"""
+        start = self.index.starts[first]
+        end = self.index.span(first + count - 1)[1]
+        text = self.data[start:end].decode(self.encoding, errors='replace').replace('\r\n', '\n')
+        return text[:-1] if text.endswith('\r') else text
+
+    def _blocks(self, first=0):
+        """从第 first 行起按顺序产生 (起始行, 文本块)，块内各行以换行连接"""
+        if self.pieces is None:
+            self.index.scan_all()
+            pieces = [(None, 0, len(self.index.starts))]
+            starts = [0]
+        else:
+            pieces, starts = self.pieces, self._starts
+        i = max(0, bisect_right(starts, first) - 1)
+        for (source, offset, n), base in zip(pieces[i:], starts[i:]):
+            k = max(0, first - base)
+            while k < n:
+                take = min(SAVE_BATCH, n - k)
+                if source is None:
+                    yield base + k, self._original_text(offset + k, take)
+                else:
+                    yield base + k, '\n'.join(source[offset + k:offset + k + take])
+                k += take
+
+    def find(self, text, line=0, column=0):
+        """从 (line, column) 向后查找 text，返回 (行, 列) 或 None
+
+        每块都接上前一块末尾的 len(text)-1 个字符一起查找，跨块边界的
+        （多行）匹配也能找到。
+        """
+        keep = len(text) - 1
+        tail = None     # (前一块末尾的文本, 其起始行, 起始列)
+        for start, block in self._blocks(line):
+            if tail is None:
+                joined, base_line, base_column = block, start, 0
+                origin = column if start == line else 0
+            else:
+                tail_text, base_line, base_column = tail
+                joined, origin = tail_text + '\n' + block, 0
+            pos = joined.find(text, origin)
+            if pos >= 0:
+                return _position(joined, base_line, base_column, pos)
+            if keep:
+                cut = max(len(joined) - keep, origin)
+                tail = (joined[cut:],) + _position(joined, base_line, base_column, cut)
+            else:
+                tail = ('', start, 0)
+        return None
+
+    def save(self, path, encoding='utf-8'):
+        """把当前内容写入 path（临时文件 + 替换），之后模型指向新文件"""
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w', encoding=encoding) as f:
+            for start, block in self._blocks():
+                if start:
+                    f.write('\n')
+                f.write(block)
+        state = self.pieces, self._starts, self._total
+        self.close()
+        try:
+            os.replace(temp_path, path)
+        except OSError:
+            # 原文件未被替换，恢复映射与未保存的编辑
+            self._open(self.path, self.encoding)
+            self.pieces, self._starts, self._total = state
+            self.modified = True
+            raise
+        self._open(path, encoding)
+
+    def close(self):
+        # 先停下后台扫描，映射被引用时无法关闭
+        with self.index.lock:
+            self.index.complete = True
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self._file.close()
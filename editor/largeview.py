@@ -0,0 +1,210 @@
+"""大文件编辑视图：QPlainTextEdit 只装载可见区域附近的若干行
+
+外侧的滚动条按整个文件的行数滚动；编辑器内部滚动接近窗口边缘时，
+把窗口中的修改写回 LargeTextModel，再以当前位置为中心重新装载。
+
+第一次写回需要完整的行索引。行索引在后台线程中建立，完成之前窗口中的
+修改暂不写回（也不切换窗口），界面不会因扫描整个文件而卡住。写回时
+每次按行替换都追加到编辑日志（journal），崩溃后可以重放。
+"""
+from PyQt6.QtCore import Qt, QTimer, pyqtSignal
+from PyQt6.QtGui import QTextCursor
+from PyQt6.QtWidgets import QWidget, QPlainTextEdit, QScrollBar, QHBoxLayout
+
+from editor.largefile import LargeTextModel
+
+
+MARGIN = 300    # 可见区域上下各多装载的行数
+
+
+def _utf16_len(text):
+    return len(text.encode('utf-16-le')) // 2
+
+
+def _from_utf16(text, units):
+    """text 前 units 个 UTF-16 单位对应的字符数"""
+    return len(text.encode('utf-16-le')[:units * 2].decode('utf-16-le', errors='ignore'))
+
+
+class LargeTextView(QWidget):
+    modified = pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.model = None
+        self.window_start = 0
+        self.window_count = 0
+        self.journal = None     # 大文件模式的编辑日志（kind 为 "lines"）
+        self._recover = None    # 等行索引完成后重放的日志编辑
+        self._loading = False
+
+        self.editor = QPlainTextEdit()
+        self.editor.setVerticalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.editor.verticalScrollBar().valueChanged.connect(self._editor_scrolled)
+        self.editor.document().modificationChanged.connect(self._modification_changed)
+        self.scrollbar = QScrollBar(Qt.Orientation.Vertical)
+        self.scrollbar.valueChanged.connect(self._scrollbar_moved)
+        layout = QHBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(0)
+        layout.addWidget(self.editor)
+        layout.addWidget(self.scrollbar)
+        self.setLayout(layout)
+
+        # 后台建立行索引期间定时刷新滚动条范围
+        self.index_timer = QTimer(self)
+        self.index_timer.timeout.connect(self._update_range)
+
+    def open(self, path, encoding, journal=None, recover=()):
+        """打开大文件；recover 为日志中未保存的编辑，行索引完成后重放并记入 journal"""
+        self.close_model()
+        self.model = LargeTextModel(path, encoding)
+        self.journal = journal
+        self.model.start_indexing()
+        self.load_window(0)
+        if recover:
+            self._recover = list(recover)
+            self.editor.setReadOnly(True)    # 重放之前的修改会与日志中的编辑冲突
+        self.index_timer.start(200)
+        self._update_range()
+
+    def close_model(self):
+        self.index_timer.stop()
+        self._recover = None
+        self.editor.setReadOnly(False)
+        if self.model is not None:
+            self.model.close()
+            self.model = None
+        self.journal = None
+        self._loading = True
+        self.editor.clear()
+        self._loading = False
+
+    def _update_range(self):
+        self._loading = True
+        self.scrollbar.setMaximum(max(0, self.model.line_count() - 1))
+        self.scrollbar.setPageStep(self._page_lines())
+        self._loading = False
+        if self.model.index.complete and self.index_timer.isActive():
+            self._indexed()
+
+    def _indexed(self):
+        """行索引完成：重放日志中的编辑并写回索引期间暂缓的修改"""
+        self.index_timer.stop()
+        if self._recover is not None:
+            ops, self._recover = self._recover, None
+            for first, count, lines in ops:
+                self._replace(first, count, lines)
+            self.editor.setReadOnly(False)
+            self.load_window(self.scrollbar.value())
+        else:
+            self.commit()
+
+    def wait_indexed(self):
+        """在当前线程把行索引扫描完（查找、保存等本来就要遍历全文的操作）"""
+        if self.model is not None and self.index_timer.isActive():
+            self.model.index.scan_all()
+            self._indexed()
+
+    def _replace(self, first, count, lines):
+        self.model.replace_lines(first, count, lines)
+        if self.journal is not None:
+            self.journal.record(first, count, lines)
+
+    def _page_lines(self):
+        return max(1, self.editor.viewport().height() // self.editor.fontMetrics().lineSpacing())
+
+    def commit(self):
+        """把窗口中的修改写回模型；行索引未完成而暂缓写回时返回 False"""
+        document = self.editor.document()
+        if self.model is None or not document.isModified():
+            return True
+        if not self.model.index.complete or self._recover is not None:
+            return False
+        lines = self.editor.toPlainText().split('\n')
+        self._replace(self.window_start, self.window_count, lines)
+        self.window_count = len(lines)
+        document.setModified(False)
+        self._update_range()
+        return True
+
+    def load_window(self, top):
+        """以第 top 行为首个可见行重新装载窗口，保持光标所在的行列"""
+        if not self.commit():
+            # 修改还不能写回，留在当前窗口
+            self._loading = True
+            self.scrollbar.setValue(self.window_start + self.editor.firstVisibleBlock().blockNumber())
+            self._loading = False
+            return
+        cursor = self.editor.textCursor()
+        cursor_line = self.window_start + cursor.blockNumber()
+        cursor_column = cursor.positionInBlock()
+
+        start = max(0, top - MARGIN)
+        lines = self.model.lines(start, top - start + self._page_lines() + MARGIN * 2)
+        self._loading = True
+        self.editor.setPlainText('\n'.join(lines))
+        self.window_start = start
+        self.window_count = len(lines)
+        document = self.editor.document()
+        if start <= cursor_line < start + len(lines):
+            block = document.findBlockByNumber(cursor_line - start)
+            cursor = QTextCursor(document)
+            cursor.setPosition(block.position() + min(cursor_column, block.length() - 1))
+        else:
+            cursor = QTextCursor(document.findBlockByNumber(min(top - start, len(lines) - 1)))
+        self.editor.setTextCursor(cursor)
+        block = document.findBlockByNumber(min(top - start, len(lines) - 1))
+        self.editor.verticalScrollBar().setValue(block.firstLineNumber())
+        self._update_range()
+        self._loading = True
+        self.scrollbar.setValue(top)
+        self._loading = False
+
+    def _editor_scrolled(self, value):
+        if self._loading or self.model is None:
+            return
+        first = self.editor.firstVisibleBlock().blockNumber()
+        top = self.window_start + first
+        self._loading = True
+        self.scrollbar.setValue(top)
+        self._loading = False
+        near_top = first < MARGIN // 3 and self.window_start > 0
+        near_bottom = (first + self._page_lines() > self.window_count - MARGIN // 3
+                       and self.window_start + self.window_count < self.model.line_count())
+        if near_top or near_bottom:
+            self.load_window(top)
+
+    def _scrollbar_moved(self, value):
+        if not self._loading and self.model is not None:
+            self.load_window(value)
+
+    def _modification_changed(self, changed):
+        if changed and not self._loading:
+            self.modified.emit()
+
+    def find(self, text):
+        """从光标处向后查找，找到时选中并返回 True"""
+        self.wait_indexed()
+        self.commit()
+        cursor = self.editor.textCursor()
+        column = _from_utf16(cursor.block().text(), cursor.positionInBlock())
+        found = self.model.find(text, self.window_start + cursor.blockNumber(), column)
+        if found is None:
+            return False
+        line, column = found
+        self.load_window(max(0, line - self._page_lines() // 2))
+        # 模型中的列以字符计，Qt 文档位置以 UTF-16 单位计
+        content = self.model.lines(line, 1)[0]
+        block = self.editor.document().findBlockByNumber(line - self.window_start)
+        start = block.position() + _utf16_len(content[:column])
+        cursor = QTextCursor(self.editor.document())
+        cursor.setPosition(start)
+        cursor.setPosition(start + _utf16_len(text), QTextCursor.MoveMode.KeepAnchor)
+        self.editor.setTextCursor(cursor)
+        return True
+
+    def save(self, path):
+        self.wait_indexed()
+        self.commit()
+        self.model.save(path)
@@ -0,0 +1,126 @@
+"""阅读器的章节缓存与预取
+
+epub:// 请求由 EpubParser.read 提供数据；解压后的章节和资源放进一个按
+字节数限额的 LRU 缓存。打开某一章后，后台线程把前后相邻的章节连同
+其引用的样式、图片等资源提前解压进缓存，翻页时请求直接命中内存。
+"""
+import posixpath
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+CACHE_BYTES = 64 * 1024 * 1024
+PREFETCH_AHEAD = 2      # 向后预取的章节数（向前一章）
+RESOURCE_REF = re.compile(rb'''(?:src|href)\s*=\s*["']([^"'#?]+)''')
+SKIP_SCHEMES = (b'http:', b'https:', b'data:', b'mailto:', b'javascript:')
+
+
+class ChapterCache:
+    """线程安全的 LRU 缓存，按条目字节数之和限额"""
+
+    def __init__(self, max_bytes=CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        with self._lock:
+            data = self._items.get(name)
+            if data is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(name)
+            self.hits += 1
+            return data
+
+    def __contains__(self, name):
+        with self._lock:
+            return name in self._items
+
+    def put(self, name, data):
+        # 超过限额四分之一的条目（大图片等）不缓存，免得挤掉所有章节
+        if len(data) > self.max_bytes // 4:
+            return
+        with self._lock:
+            old = self._items.pop(name, None)
+            if old is not None:
+                self.size -= len(old)
+            self._items[name] = data
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.size = 0
+
+
+class Prefetcher:
+    """在单个后台线程中把章节及其资源解压进缓存"""
+
+    def __init__(self, archive, cache):
+        self.archive = archive
+        self.cache = cache
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='prefetch')
+        self._queued = set()
+        self._lock = threading.Lock()
+
+    def read(self, name):
+        """从缓存或归档读取条目，读到的数据放入缓存"""
+        data = self.cache.get(name)
+        if data is None:
+            data = self.archive.read(name)
+            self.cache.put(name, data)
+        return data
+
+    def resources(self, chapter, data):
+        """章节中 src/href 引用的归档内资源（不含其他章节）"""
+        base = posixpath.dirname(chapter)
+        names = []
+        for match in RESOURCE_REF.finditer(data):
+            href = match.group(1).strip()
+            if href.lower().startswith(SKIP_SCHEMES):
+                continue
+            try:
+                name = self.archive.resolve(href.decode('utf-8'), base)
+            except UnicodeDecodeError:
+                continue
+            media_type = self.archive.media_type(name) or ''
+            if name not in names and 'html' not in media_type and self.archive.exists(name):
+                names.append(name)
+        return names
+
+    def schedule(self, chapters):
+        """按顺序预取 chapters 中尚未缓存的章节"""
+        for chapter in chapters:
+            with self._lock:
+                if chapter in self._queued or chapter in self.cache:
+                    continue
+                self._queued.add(chapter)
+            try:
+                self._executor.submit(self._prefetch, chapter)
+            except RuntimeError:    # 已关闭
+                return
+
+    def _prefetch(self, chapter):
+        try:
+            data = self.read(chapter)
+            for name in self.resources(chapter, data):
+                if name not in self.cache:
+                    self.read(name)
+        except Exception as e:
+            print(f"预取 {chapter} 失败: {e}")
+        finally:
+            with self._lock:
+                self._queued.discard(chapter)
+
+    def close(self):
+        """丢弃排队的预取并等待正在进行的一个结束（之后才能关闭归档）"""
+        self._executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1 @@
+"""单元测试：在仓库根目录运行 python -m unittest"""
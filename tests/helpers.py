@@ -0,0 +1,118 @@
+"""测试用的最小 EPUB 与读取输出的辅助函数，只依赖标准库"""
+import zipfile
+from xml.sax.saxutils import escape
+
+from converter.epubarchive import EpubArchive, read_navigation
+
+
+CHAPTER_TEMPLATE = '''<?xml version="1.0" encoding="utf-8"?>
+<html xmlns="http://www.w3.org/1999/xhtml">
+<head><title>{title}</title>
+<link rel="stylesheet" href="../styles/style.css"/></head>
+<body><h1>{title}</h1><p>{title}的正文。</p></body>
+</html>'''
+
+NAV_TEMPLATE = '''<?xml version="1.0" encoding="utf-8"?>
+<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops">
+<head><title>目录</title></head>
+<body>
+    <nav epub:type="toc">
+        <ol>
+            {items}
+        </ol>
+    </nav>
+</body>
+</html>'''
+
+NCX_TEMPLATE = '''<?xml version="1.0" encoding="utf-8"?>
+<ncx xmlns="http://www.daisy.org/z3986/2005/ncx/" version="2005-1">
+    <head><meta name="dtb:uid" content="urn:uuid:test"/></head>
+    <docTitle><text>{title}</text></docTitle>
+    <navMap>
+        {points}
+    </navMap>
+</ncx>'''
+
+
+def write_epub(path, titles, book_title='测试', ncx=False, nav_titles=None):
+    """写入一本每章一个 XHTML 的 EPUB 3（nav.xhtml，可选 toc.ncx），返回 path
+
+    nav_titles 为目录中的标签，默认与各章 <title> 相同。
+    """
+    nav_titles = nav_titles or titles
+    names = [f'c{n:03}.xhtml' for n in range(1, len(titles) + 1)]
+    manifest = ['<item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>',
+                '<item id="css" href="styles/style.css" media-type="text/css"/>']
+    manifest += [f'<item id="c{n:03}" href="text/{name}" media-type="application/xhtml+xml"/>'
+                 for n, name in enumerate(names, 1)]
+    if ncx:
+        manifest.append('<item id="ncx" href="toc.ncx" media-type="application/x-dtbncx+xml"/>')
+    spine = ''.join(f'<itemref idref="c{n:03}"/>' for n in range(1, len(names) + 1))
+    with zipfile.ZipFile(path, 'w') as z:
+        z.writestr('mimetype', 'application/epub+zip', compress_type=zipfile.ZIP_STORED)
+        z.writestr('META-INF/container.xml', '''<?xml version="1.0"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+    <rootfiles>
+        <rootfile full-path="OEBPS/package.opf" media-type="application/oebps-package+xml"/>
+    </rootfiles>
+</container>''')
+        z.writestr('OEBPS/package.opf', f'''<?xml version="1.0" encoding="utf-8"?>
+<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="uid">
+    <metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
+        <dc:identifier id="uid">urn:uuid:test</dc:identifier>
+        <dc:title>{escape(book_title)}</dc:title>
+        <dc:creator>作者</dc:creator>
+        <dc:language>zh</dc:language>
+    </metadata>
+    <manifest>
+        {''.join(manifest)}
+    </manifest>
+    <spine{' toc="ncx"' if ncx else ''}>{spine}</spine>
+</package>''', compress_type=zipfile.ZIP_DEFLATED)
+        z.writestr('OEBPS/nav.xhtml', NAV_TEMPLATE.format(items='\n            '.join(
+            f'<li><a href="text/{name}">{escape(title)}</a></li>' for name, title in zip(names, nav_titles))))
+        if ncx:
+            z.writestr('OEBPS/toc.ncx', NCX_TEMPLATE.format(title=escape(book_title), points=''.join(
+                f'<navPoint id="p{n}" playOrder="{n}"><navLabel><text>{escape(title)}</text></navLabel>'
+                f'<content src="text/{name}"/></navPoint>'
+                for n, (name, title) in enumerate(zip(names, nav_titles), 1))))
+        z.writestr('OEBPS/styles/style.css', 'p { text-indent: 2em; }')
+        for name, title in zip(names, titles):
+            z.writestr(f'OEBPS/text/{name}', CHAPTER_TEMPLATE.format(title=escape(title)),
+                       compress_type=zipfile.ZIP_DEFLATED)
+    return path
+
+
+def flatten(toc):
+    """目录树 -> [(标题, 目标路径)]，按先序排列"""
+    entries = []
+    stack = list(reversed(toc))
+    while stack:
+        title, target, children = stack.pop()
+        entries.append((title, target))
+        stack.extend(reversed(children))
+    return entries
+
+
+def read_book(path):
+    """重新打开输出的书：(spine 中的章节路径, 各章的 <title>, 目录条目, 书名)
+
+    同时检查归档的 CRC，目录条目指向的文件必须存在。
+    """
+    with EpubArchive(path) as archive:
+        bad = archive.zip.testzip()
+        if bad is not None:
+            raise AssertionError(f"CRC 校验失败: {bad}")
+        chapters = archive.spine_paths()
+        titles = [_title(archive.read(chapter)) for chapter in chapters]
+        toc = flatten(read_navigation(archive) or [])
+        for _, target in toc:
+            if target is not None and not archive.exists(target.partition('#')[0]):
+                raise AssertionError(f"目录指向不存在的文件: {target}")
+        return chapters, titles, toc, archive.title
+
+
+def _title(data):
+    text = data.decode('utf-8')
+    start = text.index('<title>') + len('<title>')
+    return text[start:text.index('</title>', start)]
@@ -0,0 +1,32 @@
+import os
+import tempfile
+import unittest
+
+from converter.catalog import Catalog
+from tests.helpers import write_epub
+
+
+class CatalogFilterTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        for name, title in (('vol_1.epub', '第一卷'), ('volX1.epub', '第二卷'),
+                            ('100%.epub', '满分'), ('slash.epub', '甲\\乙')):
+            write_epub(os.path.join(self.tmp.name, name), ['第一章'], book_title=title)
+        self.catalog = Catalog(self.tmp.name)
+        self.addCleanup(self.catalog.close)
+        self.catalog.scan(workers=1)
+
+    def _names(self, text):
+        return sorted(book['name'] for book in self.catalog.books(text))
+
+    def test_wildcards_are_literal(self):
+        self.assertEqual(self._names('vol_'), ['vol_1.epub'])
+        self.assertEqual(self._names('%'), ['100%.epub'])
+        self.assertEqual(self._names('\\'), ['slash.epub'])
+        self.assertEqual(self._names('卷'), ['volX1.epub', 'vol_1.epub'])
+        self.assertEqual(len(self._names('')), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import os
+import tempfile
+import unittest
+import zipfile
+
+from converter.chapterselect import HeadTitle, SpineIndex
+from converter.epubarchive import EpubArchive
+from converter.html2txt import EpubToTextConverter
+from tests.helpers import write_epub
+
+
+TITLES = ['第一章 开端', '第二章 发展', '番外']
+NAV_TITLES = ['开端', '发展', '番外篇']
+
+
+class SpineIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = write_epub(os.path.join(self.tmp.name, 'book.epub'), TITLES, nav_titles=NAV_TITLES)
+
+    def _select(self, path, selection):
+        with EpubArchive(path) as archive:
+            return SpineIndex(archive).select(selection)
+
+    def test_expression_uses_toc_labels(self):
+        self.assertEqual(self._select(self.path, '2-3'), [1, 2])
+        self.assertEqual(self._select(self.path, '发展'), [1])
+        self.assertEqual(self._select(self.path, '第二章 发展'), [])
+        self.assertEqual(self._select(self.path, '1, re:篇$'), [0, 2])
+
+    def test_head_title_uses_title_element(self):
+        self.assertEqual(self._select(self.path, [HeadTitle('第二章 发展')]), [1])
+        self.assertEqual(self._select(self.path, [HeadTitle('发展')]), [])
+
+    def test_target_titles_match_output_headers(self):
+        output = os.path.join(self.tmp.name, 'book.txt')
+        EpubToTextConverter(self.path).convert(target_titles=['番外'], output_path=output)
+        with open(output, encoding='utf-8') as f:
+            self.assertTrue(f.read().startswith('=== 番外 ===\n'))
+
+    def test_malformed_toc_falls_back_to_title(self):
+        broken = os.path.join(self.tmp.name, 'broken.epub')
+        with zipfile.ZipFile(self.path) as src, zipfile.ZipFile(broken, 'w') as out:
+            for info in src.infolist():
+                data = b'<html><nav' if info.filename == 'OEBPS/nav.xhtml' else src.read(info)
+                out.writestr(info, data)
+        with EpubArchive(broken) as archive:
+            self.assertEqual(SpineIndex(archive).titles(), TITLES)
+        self.assertEqual(self._select(broken, '第*'), [0, 1])
+
+
+if __name__ == '__main__':
+    unittest.main()
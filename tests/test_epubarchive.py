@@ -0,0 +1,96 @@
+import io
+import os
+import tempfile
+import unittest
+import zipfile
+
+from converter.epubarchive import EpubArchive, copy_raw_entry
+from tests.helpers import write_epub
+
+
+class _Unseekable(io.BytesIO):
+    """不可定位的输出流：ZipFile 写入时改用数据描述符（flag 0x08）"""
+
+    def seek(self, *args):
+        raise OSError("不可定位")
+
+
+ENTRIES = [
+    ('stored.txt', b'stored ' * 200, zipfile.ZIP_STORED),
+    ('OEBPS/text/deflated.xhtml', '<p>压缩的正文</p>'.encode('utf-8') * 500, zipfile.ZIP_DEFLATED),
+    ('OEBPS/文本/第一章.xhtml', '<p>非 ASCII 文件名</p>'.encode('utf-8') * 50, zipfile.ZIP_DEFLATED),
+    ('empty/', b'', zipfile.ZIP_STORED),
+]
+
+
+class CopyRawEntryTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def _copy(self, source_bytes, rename=None):
+        """把 source_bytes 中的全部条目原样复制到新文件，返回重新打开的 ZipFile"""
+        output = os.path.join(self.tmp.name, 'copy.zip')
+        with zipfile.ZipFile(io.BytesIO(source_bytes)) as src, \
+                zipfile.ZipFile(output, 'w') as zout:
+            for info in src.infolist():
+                copy_raw_entry(src, zout, info, (rename or {}).get(info.filename))
+        result = zipfile.ZipFile(output)
+        self.addCleanup(result.close)
+        return result
+
+    def _check(self, result, expected):
+        self.assertIsNone(result.testzip())
+        self.assertEqual(result.namelist(), [name for name, _, _ in expected])
+        for name, data, compress_type in expected:
+            info = result.getinfo(name)
+            self.assertEqual(info.compress_type, compress_type, name)
+            self.assertEqual(result.read(name), data, name)
+
+    def test_seekable_source(self):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as z:
+            for name, data, compress_type in ENTRIES:
+                z.writestr(name, data, compress_type=compress_type)
+        self._check(self._copy(buffer.getvalue()), ENTRIES)
+
+    def test_data_descriptor_source(self):
+        buffer = _Unseekable()
+        with zipfile.ZipFile(buffer, 'w') as z:
+            for name, data, compress_type in ENTRIES:
+                zinfo = zipfile.ZipInfo(name, (2024, 1, 1, 0, 0, 0))
+                zinfo.compress_type = compress_type
+                with z.open(zinfo, 'w') as f:
+                    f.write(data)
+        source = buffer.getvalue()
+        with zipfile.ZipFile(io.BytesIO(source)) as src:
+            self.assertTrue(all(info.flag_bits & 0x08 for info in src.infolist()))
+        # 复制后本地文件头中已经带有 CRC 与大小，不再需要数据描述符
+        result = self._copy(source)
+        self.assertFalse(any(info.flag_bits & 0x08 for info in result.infolist()))
+        self._check(result, ENTRIES)
+
+    def test_rename(self):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as z:
+            for name, data, compress_type in ENTRIES:
+                z.writestr(name, data, compress_type=compress_type)
+        result = self._copy(buffer.getvalue(), {'stored.txt': '改名/stored.txt'})
+        self._check(result, [('改名/stored.txt',) + ENTRIES[0][1:]] + ENTRIES[1:])
+        self.assertTrue(result.getinfo('改名/stored.txt').flag_bits & 0x800)
+
+
+class EpubArchiveTest(unittest.TestCase):
+    def test_spine_and_resolve(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = write_epub(os.path.join(tmp, 'book.epub'), ['第一章', '第二章'])
+            with EpubArchive(path) as archive:
+                self.assertEqual(archive.title, '测试')
+                self.assertEqual(archive.spine_paths(),
+                                 ['OEBPS/text/c001.xhtml', 'OEBPS/text/c002.xhtml'])
+                self.assertEqual(archive.resolve('../styles/style.css', 'OEBPS/text'),
+                                 'OEBPS/styles/style.css')
+
+
+if __name__ == '__main__':
+    unittest.main()
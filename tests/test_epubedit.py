@@ -0,0 +1,108 @@
+import os
+import re
+import tempfile
+import unittest
+import zipfile
+
+from converter import jobs
+from converter.epubedit import EpubEditor
+from tests.helpers import write_epub, read_book, CHAPTER_TEMPLATE
+
+
+MODIFIED = re.compile(r'<meta property="dcterms:modified">\d{4}-\d\d-\d\dT\d\d:\d\d:\d\dZ</meta>')
+
+
+class EpubEditorTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.source = write_epub(os.path.join(self.tmp.name, 'book.epub'),
+                                 ['第一章', '第二章', '第三章'], ncx=True)
+        self.output = os.path.join(self.tmp.name, 'out.epub')
+
+    def test_append_and_remove(self):
+        with EpubEditor(self.source) as editor:
+            added = editor.append_chapter('第四章', CHAPTER_TEMPLATE.format(title='第四章'))
+            self.assertEqual(editor.remove_chapter(1), 'OEBPS/text/c002.xhtml')
+            editor.save(self.output)
+
+        chapters, titles, toc, _ = read_book(self.output)
+        self.assertEqual(chapters, ['OEBPS/text/c001.xhtml', 'OEBPS/text/c003.xhtml', added])
+        self.assertEqual(titles, ['第一章', '第三章', '第四章'])
+        self.assertEqual(toc, list(zip(titles, chapters)))
+        with zipfile.ZipFile(self.output) as z:
+            self.assertNotIn('OEBPS/text/c002.xhtml', z.namelist())
+            ncx = z.read('OEBPS/toc.ncx').decode('utf-8')
+            opf = z.read('OEBPS/package.opf').decode('utf-8')
+        self.assertNotIn('c002.xhtml', ncx)
+        self.assertIn('第四章', ncx)
+        self.assertEqual(re.findall(r'playOrder="(\d+)"', ncx), ['1', '2', '3'])
+        self.assertRegex(opf, MODIFIED)
+
+    def test_set_metadata_overwrites_in_place(self):
+        with EpubEditor(self.source) as editor:
+            editor.set_metadata(title='新书名', creator='新作者')
+            editor.save()
+
+        chapters, titles, toc, title = read_book(self.source)
+        self.assertEqual(title, '新书名')
+        self.assertEqual(titles, ['第一章', '第二章', '第三章'])
+        self.assertEqual(toc, list(zip(titles, chapters)))
+        self.assertFalse(os.path.exists(self.source + '.tmp'))
+        with zipfile.ZipFile(self.source) as z:
+            opf = z.read('OEBPS/package.opf').decode('utf-8')
+        self.assertIn('<dc:creator>新作者</dc:creator>', opf)
+        self.assertEqual(len(MODIFIED.findall(opf)), 1)
+
+    def test_untouched_entries_are_copied(self):
+        with EpubEditor(self.source) as editor:
+            editor.set_metadata(title='新书名')
+            editor.save(self.output)
+        with zipfile.ZipFile(self.source) as src, zipfile.ZipFile(self.output) as out:
+            self.assertEqual(out.namelist(), src.namelist())
+            for name in ('mimetype', 'OEBPS/nav.xhtml', 'OEBPS/text/c001.xhtml'):
+                self.assertEqual(out.getinfo(name).CRC, src.getinfo(name).CRC)
+                self.assertEqual(out.getinfo(name).compress_size, src.getinfo(name).compress_size)
+
+    def test_remove_out_of_range(self):
+        with EpubEditor(self.source) as editor:
+            with self.assertRaises(ValueError):
+                editor.remove_chapter(3)
+
+
+
+class EditJobTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.source = write_epub(os.path.join(self.tmp.name, 'book.epub'), ['第一章', '第二章', '第三章'])
+        with open(self.source, 'rb') as f:
+            self.original = f.read()
+
+    def _cancel_at(self, step):
+        calls = []
+
+        def progress(done, total):
+            calls.append((done, total))
+            if len(calls) == step:
+                raise jobs.Cancelled()
+        return calls, progress
+
+    def test_cancel_before_save(self):
+        # 删除两章：进度依次为 (0, 3) (1, 3) (2, 3)，第三次调用在写出之前
+        calls, progress = self._cancel_at(3)
+        with self.assertRaises(jobs.Cancelled):
+            jobs.edit_epub(self.source, remove=[1, 3], progress=progress)
+        self.assertEqual(calls, [(0, 3), (1, 3), (2, 3)])
+        with open(self.source, 'rb') as f:
+            self.assertEqual(f.read(), self.original)
+
+    def test_cancel_after_save_is_ignored(self):
+        calls, progress = self._cancel_at(4)
+        self.assertEqual(jobs.edit_epub(self.source, remove=[1, 3], progress=progress), self.source)
+        self.assertEqual(calls[-1], (3, 3))
+        self.assertEqual(read_book(self.source)[1], ['第二章'])
+
+
+if __name__ == '__main__':
+    unittest.main()
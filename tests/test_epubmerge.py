@@ -0,0 +1,67 @@
+import os
+import tempfile
+import unittest
+import zipfile
+
+from converter.epubmerge import merge_epubs, split_epub
+from tests.helpers import write_epub, read_book
+
+
+class MergeTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_merge(self):
+        first = write_epub(os.path.join(self.tmp.name, 'a.epub'), ['甲一', '甲二'], book_title='甲')
+        second = write_epub(os.path.join(self.tmp.name, 'b.epub'), ['乙一'], book_title='乙', ncx=True)
+        output = os.path.join(self.tmp.name, 'merged.epub')
+        merge_epubs([first, second], output, title='合集')
+
+        chapters, titles, toc, title = read_book(output)
+        self.assertEqual(title, '合集')
+        self.assertEqual(titles, ['甲一', '甲二', '乙一'])
+        self.assertEqual(len(set(chapters)), 3)
+        # 每本书一个顶层条目，指向该书第一章，其下是原目录
+        self.assertEqual(toc, [('甲', chapters[0]), ('甲一', chapters[0]), ('甲二', chapters[1]),
+                               ('乙', chapters[2]), ('乙一', chapters[2])])
+        with zipfile.ZipFile(output) as z:
+            self.assertEqual(z.namelist()[0], 'mimetype')
+            self.assertEqual(z.getinfo('mimetype').compress_type, zipfile.ZIP_STORED)
+            ncx = z.read('OEBPS/toc.ncx').decode('utf-8')
+        for chapter_title in titles:
+            self.assertIn(chapter_title, ncx)
+
+    def test_merge_nothing(self):
+        with self.assertRaises(ValueError):
+            merge_epubs([], os.path.join(self.tmp.name, 'merged.epub'))
+
+
+class SplitTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.titles = [f'第{n}章' for n in range(1, 6)]
+        self.source = write_epub(os.path.join(self.tmp.name, 'book.epub'), self.titles)
+
+    def test_split(self):
+        outputs = split_epub(self.source, os.path.join(self.tmp.name, 'out'), 2)
+        self.assertEqual([os.path.basename(path) for path in outputs],
+                         ['book_1.epub', 'book_2.epub', 'book_3.epub'])
+        seen = []
+        for path in outputs:
+            chapters, titles, toc, _ = read_book(path)
+            self.assertEqual(toc, list(zip(titles, chapters)))
+            with zipfile.ZipFile(path) as z:
+                # 样式表每卷都带上
+                self.assertTrue(any(name.endswith('style.css') for name in z.namelist()))
+            seen += titles
+        self.assertEqual(seen, self.titles)
+
+    def test_split_invalid(self):
+        with self.assertRaises(ValueError):
+            split_epub(self.source, os.path.join(self.tmp.name, 'out'), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import os
+import tempfile
+import unittest
+import zipfile
+from unittest import mock
+
+from converter import epubpack
+from converter.epubarchive import copy_raw_entry
+
+
+class PackFolderTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.folder = os.path.join(self.tmp.name, 'book')
+        self.files = {
+            'mimetype': b'application/epub+zip',
+            'OEBPS/text/c001.xhtml': '<p>正文</p>'.encode('utf-8') * 100,
+            'OEBPS/text/c002.xhtml': '<p>很长的一章</p>'.encode('utf-8') * 20000,
+            'OEBPS/images/big.jpg': os.urandom(300 * 1024),
+        }
+        for name, data in self.files.items():
+            path = os.path.join(self.folder, *name.split('/'))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(data)
+
+    def _check(self, path):
+        with zipfile.ZipFile(path) as z:
+            self.assertIsNone(z.testzip())
+            self.assertEqual(z.namelist()[0], 'mimetype')
+            self.assertEqual(sorted(z.namelist()), sorted(self.files))
+            for name, data in self.files.items():
+                self.assertEqual(z.read(name), data, name)
+                self.assertFalse(z.getinfo(name).flag_bits & 0x08, name)
+            return {info.filename: info.compress_type for info in z.infolist()}
+
+    def test_streamed_entries(self):
+        output = os.path.join(self.tmp.name, 'book.epub')
+        # c002 与图片超过阈值，按块写入
+        with mock.patch.object(epubpack, 'STREAM_SIZE', 64 * 1024), \
+                mock.patch.object(epubpack, 'compress_file', wraps=epubpack.compress_file) as compress:
+            stats = epubpack.pack_folder(self.folder, output, workers=2)
+        self.assertEqual(sorted(call.args[1] for call in compress.call_args_list),
+                         ['OEBPS/text/c001.xhtml', 'mimetype'])
+        types = self._check(output)
+        self.assertEqual(types['OEBPS/text/c002.xhtml'], zipfile.ZIP_DEFLATED)
+        self.assertEqual(types['OEBPS/images/big.jpg'], zipfile.ZIP_STORED)
+        self.assertEqual(types['mimetype'], zipfile.ZIP_STORED)
+        self.assertEqual(sum(row[0] for row in stats.kinds.values()), len(self.files))
+
+        # 分块写入的条目同样可以原样复制
+        copied = os.path.join(self.tmp.name, 'copy.epub')
+        with zipfile.ZipFile(output) as src, zipfile.ZipFile(copied, 'w') as zout:
+            for info in src.infolist():
+                copy_raw_entry(src, zout, info)
+        self.assertEqual(self._check(copied), types)
+
+    def test_matches_in_memory_compression(self):
+        streamed = os.path.join(self.tmp.name, 'streamed.epub')
+        buffered = os.path.join(self.tmp.name, 'buffered.epub')
+        with mock.patch.object(epubpack, 'STREAM_SIZE', 1):
+            epubpack.pack_folder(self.folder, streamed, workers=1)
+        epubpack.pack_folder(self.folder, buffered, workers=1)
+        self.assertEqual(self._check(streamed), self._check(buffered))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import os
+import stat
+import tempfile
+import unittest
+
+from converter import jobs
+from converter.HTML2EPUB.GenerateEpubFramework import SHARED_DIR, STATIC_FILES
+
+
+class LinkedFrameworksTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.warehouse = self.tmp.name
+        self.specs = [('甲', '书甲', '作者', None), ('乙', '书乙', '作者', None)]
+
+    def _paths(self, root):
+        return [os.path.join(root, *name.split('/')) for name in STATIC_FILES]
+
+    def _check(self):
+        shared = self._paths(os.path.join(self.warehouse, SHARED_DIR))
+        for framework in ('甲', '乙'):
+            for source, path in zip(shared, self._paths(os.path.join(self.warehouse, framework))):
+                if os.stat(path).st_nlink > 1:
+                    self.assertTrue(os.path.samefile(source, path))
+                # 保持可写，Windows 上才能替换和删除
+                self.assertTrue(os.stat(path).st_mode & stat.S_IWRITE, path)
+
+    def test_recreate(self):
+        jobs.create_frameworks(self.specs, self.warehouse, link_static=True)
+        self._check()
+        jobs.create_frameworks(self.specs, self.warehouse, link_static=True)
+        self._check()
+
+    def test_old_read_only_copies(self):
+        jobs.create_frameworks(self.specs, self.warehouse, link_static=True)
+        for path in self._paths(os.path.join(self.warehouse, SHARED_DIR)):
+            os.chmod(path, 0o444)
+        jobs.create_frameworks(self.specs, self.warehouse, link_static=True)
+        self._check()
+        jobs.create_frameworks(self.specs, self.warehouse)
+        self._check()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import os
+import tempfile
+import unittest
+import zipfile
+
+from converter import jobs
+
+
+MANUSCRIPT = '\n'.join(f'=== 第{n}章 ===\n\n第{n}章的第一段。\n第{n}章的第二段。\n' for n in range(1, 6))
+
+
+class IncrementalBuildTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.framework = jobs.create_framework('书', warehouse=self.tmp.name)
+        manuscript = os.path.join(self.tmp.name, '书.txt')
+        with open(manuscript, 'w', encoding='utf-8') as f:
+            f.write(MANUSCRIPT)
+        self.text_dir = jobs.txt_to_html(manuscript, self.framework)
+
+    def _entries(self, path):
+        with zipfile.ZipFile(path) as z:
+            self.assertIsNone(z.testzip())
+            return [(info.filename, info.compress_type, z.read(info)) for info in z.infolist()]
+
+    def test_matches_full_build(self):
+        output = os.path.join(self.tmp.name, 'out', '书.epub')
+        jobs.build_epub(self.framework, output, incremental=True)
+        self.assertTrue(os.path.exists(output + '.build.json'))
+
+        # 修改一章、删除一章后增量重建
+        chapters = sorted(name for name in os.listdir(self.text_dir) if name.startswith('第'))
+        self.assertEqual(len(chapters), 5)
+        edited = os.path.join(self.text_dir, chapters[1])
+        with open(edited, 'r', encoding='utf-8') as f:
+            content = f.read()
+        with open(edited, 'w', encoding='utf-8') as f:
+            f.write(content.replace('第二段', '改写后的第二段'))
+        os.remove(os.path.join(self.text_dir, chapters[3]))
+
+        copied = []
+        jobs.build_epub(self.framework, output, incremental=True,
+                        report=lambda stats: copied.append(stats.copied))
+        full = os.path.join(self.tmp.name, 'out', '完整.epub')
+        jobs.build_epub(self.framework, full)
+
+        self.assertGreater(copied[0], 0)
+        incremental_entries = self._entries(output)
+        self.assertEqual(incremental_entries, self._entries(full))
+        contents = {name: data for name, _, data in incremental_entries}
+        self.assertEqual(incremental_entries[0][0], 'mimetype')
+        self.assertNotIn(f'OEBPS/text/{chapters[3]}', contents)
+        self.assertIn('改写后的第二段'.encode('utf-8'), contents[f'OEBPS/text/{chapters[1]}'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from converter.search import SearchIndex, INDEX_NAME
+from tests.helpers import write_epub
+
+
+class SearchIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.library = self.tmp.name
+        write_epub(os.path.join(self.library, '甲.epub'), ['中 文', '文字'])
+        write_epub(os.path.join(self.library, '乙.epub'), ['中文'])
+        with open(os.path.join(self.library, '坏.epub'), 'wb') as f:
+            f.write(b'not a zip')
+
+    def _update(self, workers):
+        with mock.patch('builtins.print'), SearchIndex(self.library) as index:
+            result = index.update(workers=workers)
+            hits = index.search('"中 文"')
+        return result, hits
+
+    def test_bad_book_skipped(self):
+        for workers in (1, 2):
+            with self.subTest(workers=workers):
+                for name in os.listdir(self.library):
+                    if name.startswith(INDEX_NAME):
+                        os.remove(os.path.join(self.library, name))
+                result, hits = self._update(workers)
+                # 坏书不计入重建数，下次更新时重试
+                self.assertEqual(result, (2, 0))
+                self.assertEqual({(hit['book'], hit['chapter_title']) for hit in hits}, {('测试', '中 文')})
+                self.assertEqual(self._update(workers)[0], (0, 0))
+
+    def test_errors_propagate(self):
+        with mock.patch('converter.search.index_book', side_effect=RuntimeError('broken')), \
+                SearchIndex(self.library) as index:
+            with self.assertRaises(RuntimeError):
+                index.update(workers=1)
+
+
+if __name__ == '__main__':
+    unittest.main()